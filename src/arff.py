@@ -0,0 +1,163 @@
+'''
+Helper module for reading and writing ARFF files, like the ones of the ASlib
+scenarios.
+
+The data rows are read one at a time. The numeric values are converted to
+float and the missing values (?) to None, while the string, nominal and date
+values are kept as strings. Quoted values (in single or double quotes) are
+unquoted. Sparse data is not supported.
+'''
+
+import re
+
+# A (possibly quoted) value, followed by a comma or by the end of the line.
+VALUE = re.compile(
+  r'''\s*('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|[^,'"]*?)\s*(,|$)'''
+)
+# The name (possibly quoted) and the type of an attribute.
+ATTRIBUTE = re.compile(
+  r'''@attribute\s+('(?:[^'\\]|\\.)*'|"(?:[^"\\]|\\.)*"|\S+)\s+(.*)$''', re.I
+)
+# Characters that must be quoted when writing a value.
+SPECIAL = re.compile(r'''[\s,'"%{}\\]''')
+
+class ArffReader(object):
+  '''
+  Reader of the ARFF file arff_file. The header of the file is parsed when the
+  object is created:
+
+    relation    name of the relation
+    attributes  list of the pairs (name, type) of the attributes, where type is
+                'numeric', 'string', 'date' or the list of the values of a
+                nominal attribute
+    header      list of the lines of the header, up to the @DATA line
+
+  Iterating over the reader yields its data rows (only once). If typed is False,
+  all the values (including the missing ones, i.e., '?') are kept as strings.
+  '''
+
+  def __init__(self, arff_file, typed = True):
+    self.typed = typed
+    self.relation = None
+    self.attributes = []
+    self.header = []
+    self.infile = open(arff_file)
+    self.line_num = 0
+    for line in self.infile:
+      self.line_num += 1
+      self.header.append(line)
+      line = line.strip()
+      keyword = line.split(None, 1)[0].upper() if line else ''
+      if keyword == '@RELATION':
+        self.relation = unquote(line.split(None, 1)[1].strip())
+      elif keyword == '@ATTRIBUTE':
+        match = ATTRIBUTE.match(line)
+        if not match:
+          raise self.error('Invalid attribute')
+        self.attributes.append(
+          (unquote(match.group(1)), parse_type(match.group(2)))
+        )
+      elif keyword == '@DATA':
+        break
+
+  def __iter__(self):
+    numeric = [
+      i for (i, (name, t)) in enumerate(self.attributes) if t == 'numeric'
+    ]
+    for line in self.infile:
+      self.line_num += 1
+      line = line.strip()
+      if not line or line[0] == '%':
+        continue
+      if line[0] == '{':
+        raise self.error('Sparse data not supported')
+      row = split_values(line)
+      if len(row) != len(self.attributes):
+        raise self.error('Wrong number of values')
+      if self.typed:
+        for i in range(0, len(row)):
+          if row[i] == '?':
+            row[i] = None
+        for i in numeric:
+          if row[i] is not None:
+            row[i] = float(row[i])
+      yield row
+    self.infile.close()
+
+  def error(self, msg):
+    '''
+    Returns the exception for the error msg at the current line.
+    '''
+    return ValueError(
+      self.infile.name + ', line ' + str(self.line_num) + ': ' + msg
+    )
+
+
+def split_values(line):
+  '''
+  Returns the list of the (unquoted) comma-separated values of line.
+  '''
+  if '"' not in line and "'" not in line:
+    return [x.strip() for x in line.split(',')]
+  values = []
+  pos = 0
+  while True:
+    match = VALUE.match(line, pos)
+    if not match:
+      raise ValueError('Invalid line ' + line)
+    values.append(unquote(match.group(1)))
+    if not match.group(2):
+      return values
+    pos = match.end()
+
+def unquote(value):
+  '''
+  Removes the quotes (if any) from value.
+  '''
+  if len(value) > 1 and value[0] == value[-1] and value[0] in '\'"':
+    return re.sub(r'\\(.)', r'\1', value[1 : -1])
+  return value
+
+def parse_type(spec):
+  '''
+  Returns the type of an attribute (see ArffReader) from its specification.
+  '''
+  spec = spec.strip()
+  if spec.startswith('{') and spec.endswith('}'):
+    return split_values(spec[1 : -1])
+  t = spec.split()[0].upper()
+  if t in ['NUMERIC', 'REAL', 'INTEGER']:
+    return 'numeric'
+  elif t == 'STRING':
+    return 'string'
+  elif t == 'DATE':
+    return 'date'
+  raise ValueError('Unsupported attribute type ' + spec)
+
+def format_value(value):
+  '''
+  Returns the string representing value in an ARFF file.
+  '''
+  if value is None:
+    return '?'
+  if isinstance(value, float):
+    return repr(value)
+  if value == '' or SPECIAL.search(value):
+    return "'" + value.replace('\\', '\\\\').replace("'", "\\'") + "'"
+  return value
+
+def format_attribute(name, t):
+  '''
+  Returns the @ATTRIBUTE line (without newline) of the attribute (name, t).
+  '''
+  if isinstance(t, list):
+    t = '{' + ','.join(format_value(v) for v in t) + '}'
+  else:
+    t = t.upper()
+  return '@ATTRIBUTE ' + format_value(name) + ' ' + t
+
+def format_row(row):
+  '''
+  Returns the line (without newline) of the data row.
+  '''
+  return ','.join(format_value(v) for v in row)
@@ -0,0 +1,404 @@
+#! /usr/bin/env python
+
+'''
+benchmark_scenarios [OPTIONS] <PATH> [<PATH> ...]
+
+Benchmarks SUNNY on the cross-fold validation of the ASlib scenarios in the
+given paths, where a path is either a scenario folder or a folder containing
+scenarios (e.g., data/aslib_1.0.1). The scenario folders without some of the
+files needed by the cross-fold validation (see SCENARIO_FILES) are skipped. Each
+scenario is benchmarked in a new process, which parses the scenario and then 
+trains, pre-processes and tests every fold as evaluate_scenarios does. For each
+scenario, it measures:
+
+  - the elapsed time of the parsing and of the train, pre-processing and test
+    phases (summed over the folds), and of the whole benchmark;
+  - the peak memory, i.e., the maximum resident set size (in KB) of the process
+    benchmarking the scenario;
+  - the latency percentiles of the prediction of a single instance (see the
+    --profile option of test_scenario);
+  - the quality of the predictions, i.e., the PAR10 and the FSI of SUNNY and a
+    digest (SHA-1) of all the predicted schedules.
+
+The results are printed on standard output and can be written in a JSON file
+with --output. If a baseline (i.e., the JSON file of a previous benchmark) is
+given with --baseline, the results are compared with it: a time, a latency or
+the memory is a regression if it exceeds the baseline by more than a threshold,
+while the quality must be exactly the same (so that, e.g., an optimization can
+be shown to leave the predictions bit-identical). The exit status is 1 if some
+regression is found or some scenario fails (the failure of a scenario is 
+reported, and the other scenarios are benchmarked anyway), and 0 otherwise.
+
+Options
+=======
+  --cv-path <PATH>
+   Creates at the specified path the folder cv_<SCENARIO>, which contains the
+   knowledge base kb_fold_i_j and the predictions of each fold i_j in the
+   folder fold_i_j. By default, it is created in the scenario folder.
+  --train-options "<OPTIONS>"
+   Options passed to train_scenario, as in evaluate_scenarios.
+  --pre-options "<OPTIONS>"
+   Options passed to pre_process, as in evaluate_scenarios.
+  --test-options "<OPTIONS>"
+   Options passed to test_scenario, as in evaluate_scenarios.
+  --repeat <N>
+   Benchmarks every scenario N times, and keeps the minimum of each time and of
+   the memory. The quality must be the same in all the repetitions. By
+   default, it is set to 1.
+  --output <FILE>
+   Writes the results in the JSON file <FILE>, which can be later used as a
+   baseline.
+  --baseline <FILE>
+   Compares the results with the ones in the JSON file <FILE>. The scenarios
+   not in the baseline are not compared, and the baseline must have the same
+   options of the phases.
+  --time-threshold <R>
+   Maximum relative increase of a time or a latency with respect to the
+   baseline. By default, it is set to 0.2 (i.e., 20% slower).
+  --memory-threshold <R>
+   Maximum relative increase of the peak memory with respect to the baseline.
+   By default, it is set to 0.1.
+  --help
+   Prints this message.
+'''
+
+import os
+import sys
+import json
+import time
+import shlex
+import getopt
+import hashlib
+import resource
+import traceback
+import multiprocessing
+from profiling import Profile
+from scenario import Scenario
+from evaluate_scenarios import TRAIN_OPTIONS, PRE_OPTIONS, TEST_OPTIONS, \
+  get_runtimes, run_fold
+
+# Phases whose elapsed time is measured.
+PHASES = ['parse', 'train', 'pre_process', 'test', 'total']
+
+# Files that a scenario folder must contain to be benchmarked.
+SCENARIO_FILES = [
+  'description.txt', 'algorithm_runs.arff', 'feature_values.arff', 'cv.arff'
+]
+
+# Latency percentiles compared with the baseline.
+LATENCIES = ['p50', 'p90', 'p99']
+
+# Absolute differences below which a time (in seconds), a latency (in seconds)
+# or the memory (in KB) is never a regression, since they are just noise.
+TIME_SLACK = 0.1
+LATENCY_SLACK = 0.001
+MEMORY_SLACK = 4096
+
+def parse_arguments(args):
+  '''
+  Parse the options specified by the user and returns the corresponding
+  arguments properly set.
+  '''
+  try:
+    long_options = [
+      'help', 'cv-path=', 'train-options=', 'pre-options=', 'test-options=',
+      'repeat=', 'output=', 'baseline=', 'time-threshold=', 'memory-threshold='
+    ]
+    opts, args = getopt.getopt(args, None, long_options)
+  except getopt.GetoptError as msg:
+    print >> sys.stderr, msg
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  if not args:
+    if not opts:
+      print >> sys.stderr, 'Error! No arguments given.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    else:
+      print __doc__
+      sys.exit(0)
+
+  paths = []
+  for path in args:
+    if path[-1] != '/':
+      path += '/'
+    if not os.path.exists(path):
+      print >> sys.stderr, 'Error: Directory ' + path + ' does not exists.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    paths += get_scenarios(path)
+  if not paths:
+    print >> sys.stderr, 'Error! No scenario found.'
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  # Initialize variables with default values.
+  cv_path = None
+  repeat = 1
+  out_file = None
+  baseline = None
+  thresholds = {
+    'time': 0.2,
+    'memory': 0.1,
+  }
+  options = {
+    'train': TRAIN_OPTIONS,
+    'pre': PRE_OPTIONS,
+    'test': TEST_OPTIONS,
+  }
+
+  # Options parsing.
+  for o, a in opts:
+    if o == '--help':
+      print __doc__
+      sys.exit(0)
+    elif o == '--cv-path':
+      if not os.path.exists(a):
+        print >> sys.stderr, 'Error! Directory ' + a + ' not exists.'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      cv_path = a
+    elif o == '--train-options':
+      options['train'] = a
+    elif o == '--pre-options':
+      options['pre'] = a
+    elif o == '--test-options':
+      options['test'] = a
+    elif o == '--repeat':
+      repeat = int(a)
+      if repeat < 1:
+        print >> sys.stderr, 'Error! Not acceptable number of repetitions'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+    elif o == '--output':
+      out_file = a
+    elif o == '--baseline':
+      if not os.path.exists(a):
+        print >> sys.stderr, 'Error! File ' + a + ' not exists.'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      with open(a) as infile:
+        baseline = json.load(infile)
+    elif o in ['--time-threshold', '--memory-threshold']:
+      threshold = float(a)
+      if threshold < 0:
+        print >> sys.stderr, 'Error! Not acceptable negative threshold'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      thresholds[o[2 : -len('-threshold')]] = threshold
+
+  if baseline is not None and baseline['options'] != options:
+    print >> sys.stderr, 'Error! The baseline has different options:', \
+      baseline['options']
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+  return paths, cv_path, options, repeat, out_file, baseline, thresholds
+
+def get_scenarios(path):
+  '''
+  Returns the list containing path if it is a scenario folder, or the sorted
+  list of the scenario folders in path otherwise. The scenario folders missing
+  some of the SCENARIO_FILES are skipped with a warning.
+  '''
+  if os.path.exists(path + 'description.txt'):
+    paths = [path]
+  else:
+    paths = [
+      path + name + '/' for name in sorted(os.listdir(path))
+      if os.path.exists(path + name + '/description.txt')
+    ]
+  scenarios = []
+  for path in paths:
+    missing = [f for f in SCENARIO_FILES if not os.path.exists(path + f)]
+    if missing:
+      print >> sys.stderr, 'Warning! Skipping scenario ' + path + \
+        ' (missing ' + ', '.join(missing) + ')'
+    else:
+      scenarios.append(path)
+  return scenarios
+
+def benchmark_scenario(path, cv_path, options):
+  '''
+  Benchmarks the scenario in path and returns its results (see print_results).
+  '''
+  name = path.split('/')[-2]
+  if cv_path:
+    cv_dir = cv_path.rstrip('/') + '/cv_' + name + '/'
+  else:
+    cv_dir = path + 'cv_' + name + '/'
+  split_options = dict(
+    (phase, shlex.split(opt)) for (phase, opt) in options.items()
+  )
+  profile = Profile()
+  start = time.time()
+  scenario = Scenario(path)
+  runtimes = get_runtimes(scenario)
+  profile.add_time('parse', start)
+  totals = {}
+  digest = hashlib.sha1()
+  for (i, j, train, test) in scenario.folds():
+    stats, predictions = run_fold(
+      scenario, runtimes, cv_dir, i, j, train, test, split_options, profile
+    )
+    for (key, value) in stats.items():
+      totals[key] = totals.get(key, 0) + value
+    for row in predictions:
+      digest.update(','.join(row) + '\n')
+  profile.add_time('total', start)
+  n = float(totals['n'])
+  return {
+    'instances': totals['n'],
+    'time': dict((phase, profile.stages[phase]) for phase in PHASES),
+    'stages': profile.stages,
+    'memory': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'latency': profile.get_latency(),
+    'quality': {
+      'par10': totals['par10'] / n,
+      'fsi': totals['fsi'] / n,
+      'par10_vbs': totals['par10_vbs'] / n,
+      'fsi_vbs': totals['fsi_vbs'] / n,
+      'digest': digest.hexdigest(),
+    },
+  }
+
+def run_process(function, *args):
+  '''
+  Returns function(*args), evaluated in a new (forked) process. Unlike a
+  process pool, the process can start its own worker processes (e.g., with the
+  --jobs option of test_scenario).
+  '''
+  receiver, sender = multiprocessing.Pipe(False)
+  def target():
+    try:
+      sender.send((True, function(*args)))
+    except BaseException:
+      sender.send((False, traceback.format_exc()))
+  process = multiprocessing.Process(target = target)
+  process.start()
+  ok, result = receiver.recv()
+  process.join()
+  if not ok:
+    raise RuntimeError(result)
+  return result
+
+def merge_results(results, new_results):
+  '''
+  Merges the results of a repetition into results, keeping the minimum of the
+  times and of the memory. Returns False if the quality is not the same.
+  '''
+  for key in ['time', 'stages', 'latency']:
+    for (name, value) in new_results[key].items():
+      results[key][name] = min(results[key].get(name, value), value)
+  results['memory'] = min(results['memory'], new_results['memory'])
+  return results['quality'] == new_results['quality']
+
+def compare_results(results, baseline, thresholds):
+  '''
+  Returns the list of the comparisons (metric, baseline value, value, status)
+  between the results of a scenario and its baseline, where status is OK or
+  REGRESSION.
+  '''
+  checks = []
+  for phase in PHASES:
+    checks.append((
+      'time.' + phase, baseline['time'][phase], results['time'][phase],
+      thresholds['time'], TIME_SLACK
+    ))
+  for p in LATENCIES:
+    if p in baseline['latency'] and p in results['latency']:
+      checks.append((
+        'latency.' + p, baseline['latency'][p], results['latency'][p],
+        thresholds['time'], LATENCY_SLACK
+      ))
+  checks.append((
+    'memory', baseline['memory'], results['memory'], thresholds['memory'],
+    MEMORY_SLACK
+  ))
+  comparisons = []
+  for (metric, old, new, threshold, slack) in checks:
+    if new > old * (1 + threshold) and new - old > slack:
+      status = 'REGRESSION'
+    else:
+      status = 'OK'
+    comparisons.append((metric, old, new, status))
+  for (metric, old) in sorted(baseline['quality'].items()):
+    new = results['quality'].get(metric)
+    # The quality must be exactly the same.
+    status = 'OK' if new == old else 'REGRESSION'
+    comparisons.append(('quality.' + metric, old, new, status))
+  return comparisons
+
+def print_results(name, results):
+  '''
+  Prints the results of the scenario name.
+  '''
+  print '\n==========================================='
+  print 'Scenario:', name
+  print 'No. of instances:', results['instances']
+  print 'Time (sec.):', ' '.join(
+    phase + ' ' + str(round(results['time'][phase], 3)) for phase in PHASES
+  )
+  print 'Peak memory (KB):', results['memory']
+  print 'Latency (ms):', ' '.join(
+    p + ' ' + str(round(1000 * t, 4))
+    for (p, t) in sorted(results['latency'].items())
+  )
+  print 'PAR 10 SUNNY:', results['quality']['par10']
+  print 'FSI SUNNY:', results['quality']['fsi']
+  print 'Digest:', results['quality']['digest']
+  print '===========================================\n'
+
+def print_comparisons(name, comparisons):
+  '''
+  Prints the comparisons of the scenario name with the baseline.
+  '''
+  print 'Comparison with the baseline of', name
+  for (metric, old, new, status) in comparisons:
+    print '  ' + '\t'.join([metric, repr(old), repr(new), status])
+
+def main(args):
+  paths, cv_path, options, repeat, out_file, baseline, thresholds = \
+    parse_arguments(args)
+  benchmark = {'options': options, 'scenarios': {}}
+  regressions = 0
+  failures = []
+  for path in paths:
+    name = path.split('/')[-2]
+    print 'Benchmarking scenario', path
+    results = None
+    try:
+      for r in range(0, repeat):
+        new_results = run_process(benchmark_scenario, path, cv_path, options)
+        if results is None:
+          results = new_results
+        elif not merge_results(results, new_results):
+          raise RuntimeError(
+            'The quality of ' + name + ' differs between repetitions.'
+          )
+    except RuntimeError as e:
+      # The other scenarios are benchmarked anyway.
+      print >> sys.stderr, 'Error! Benchmark of scenario', name, 'failed:'
+      print >> sys.stderr, str(e)
+      failures.append(name)
+      continue
+    benchmark['scenarios'][name] = results
+    print_results(name, results)
+    if baseline is not None and name in baseline['scenarios']:
+      comparisons = compare_results(
+        results, baseline['scenarios'][name], thresholds
+      )
+      print_comparisons(name, comparisons)
+      regressions += len([c for c in comparisons if c[3] != 'OK'])
+  if out_file:
+    with open(out_file, 'w') as outfile:
+      json.dump(benchmark, outfile, indent = 1, sort_keys = True)
+  if baseline is not None:
+    print 'Regressions:', regressions
+  if failures:
+    print 'Failed scenarios:', ' '.join(failures)
+  if regressions or failures:
+    sys.exit(1)
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -59,6 +59,34 @@ def get_subset(h, k, elements):
     ans[i] = elements[(n - 1) - ans[i]];
   return ans
 
+def get_subsets(n, k):
+  """
+  Generates all the subsets of {0, ..., n - 1} having cardinality k, in the 
+  same lexicographic order of get_subset. Each subset is yielded as a pair 
+  (c, p) where c is the sorted list of its elements and p is the leftmost 
+  position of c changed w.r.t. the previous subset. Note that c is updated in 
+  place, so it must be copied if it has to be kept.
+  
+  Moving from a subset to the next one changes O(1) elements on average, so 
+  the callers can keep the (partial) results of the positions before p.
+  """
+  if k < 0 or n < k:
+    return
+  c = range(0, k)
+  p = 0
+  while True:
+    yield c, p
+    # Find the rightmost element that can be increased.
+    i = k - 1
+    while i >= 0 and c[i] == n - k + i:
+      i -= 1
+    if i < 0:
+      return
+    c[i] += 1
+    for j in range(i + 1, k):
+      c[j] = c[j - 1] + 1
+    p = i
+
 '''
 # Dummy testing.
 from time import clock
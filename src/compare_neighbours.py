@@ -0,0 +1,228 @@
+#! /usr/bin/env python
+
+'''
+compare_neighbours [OPTIONS] <SCENARIO_PATH> [<SCENARIO_PATH> ...]
+
+Measures the accuracy of an approximate neighbours search method (see
+neighbours module) against the exact search, on the cross-fold validation of
+the given ASlib scenarios. For each fold, the training set is trained and
+pre-processed as in evaluate_scenarios, and then the neighbourhoods and the
+schedules of the test instances are computed with both the methods. For each
+fold and for each scenario, it prints:
+
+  - the recall, i.e., the average fraction of the exact neighbours found by
+    the approximate search;
+  - the average time of the exact and of the approximate search, per instance;
+  - the PAR10 and the FSI of SUNNY with the exact and the approximate search.
+
+Options
+=======
+  --neighbours <METHOD>
+   The approximate search method, e.g., "lsh:32,4". By default, it is set to
+   lsh (i.e., with the default parameters).
+  -k <NEIGH.SIZE>
+   The neighbourhood size. By default, the one of each knowledge base is used.
+  --cv-path <PATH>
+   Creates at the specified path the folder cv_<SCENARIO>, which contains the
+   knowledge base kb_fold_i_j of each fold i_j in the folder fold_i_j. By
+   default, it is created in the scenario folder.
+  --train-options "<OPTIONS>"
+   Options passed to train_scenario. By default, "--discard --feat-timeout +inf"
+  --pre-options "<OPTIONS>"
+   Options passed to pre_process. By default, no option is passed (i.e., all
+   the features are used).
+  --help
+   Prints this message.
+'''
+
+import os
+import sys
+import time
+import shlex
+import getopt
+import train_scenario
+import pre_process
+import test_scenario
+from scenario import Scenario, select_rows
+from sunny import normalize, get_sunny_schedules
+from neighbours import get_neighbours, parse_method
+from evaluate_scenarios import TRAIN_OPTIONS, get_runtimes, run, \
+  evaluate_predictions
+
+def parse_arguments(args):
+  '''
+  Parse the options specified by the user and returns the corresponding
+  arguments properly set.
+  '''
+  try:
+    long_options = [
+      'help', 'neighbours=', 'cv-path=', 'train-options=', 'pre-options='
+    ]
+    opts, args = getopt.getopt(args, 'k:', long_options)
+  except getopt.GetoptError as msg:
+    print >> sys.stderr, msg
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  if not args:
+    if not opts:
+      print >> sys.stderr, 'Error! No arguments given.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    else:
+      print __doc__
+      sys.exit(0)
+
+  paths = []
+  for path in args:
+    if path[-1] != '/':
+      path += '/'
+    if not os.path.exists(path):
+      print >> sys.stderr, 'Error: Directory ' + path + ' does not exists.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    paths.append(path)
+
+  # Initialize variables with default values.
+  neigh_search = 'lsh'
+  k = None
+  cv_path = None
+  options = {
+    'train': TRAIN_OPTIONS,
+    'pre': '',
+  }
+
+  # Options parsing.
+  for o, a in opts:
+    if o == '--help':
+      print __doc__
+      sys.exit(0)
+    elif o == '--neighbours':
+      neigh_search = a
+    elif o == '-k':
+      k = int(a)
+    elif o == '--cv-path':
+      if not os.path.exists(a):
+        print >> sys.stderr, 'Error! Directory ' + a + ' not exists.'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      cv_path = a
+    elif o == '--train-options':
+      options['train'] = a
+    elif o == '--pre-options':
+      options['pre'] = a
+
+  try:
+    parse_method(neigh_search)
+  except ValueError as msg:
+    print >> sys.stderr, 'Error! ' + str(msg)
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+  options = dict((phase, shlex.split(opt)) for (phase, opt) in options.items())
+  return paths, neigh_search, k, cv_path, options
+
+def compare_fold(
+  scenario, runtimes, cv_dir, i, j, train, test, neigh_search, k, options
+):
+  '''
+  Trains and pre-processes the fold i_j of the scenario (a Scenario object),
+  where train and test are the sets of its training and test instances, and
+  returns the statistics of the exact and approximate neighbours searches of
+  its test instances (see print_comparison).
+  '''
+  path = scenario.path
+  fold = str(i) + '_' + str(j)
+  fold_dir = cv_dir + 'fold_' + fold + '/'
+  kb_name = 'kb_fold_' + fold
+  kb_dir = fold_dir + kb_name + '/'
+  _, lb, ub, feat_def, feat_timeout, discard, _, _ = run(
+    train_scenario.parse_arguments, options['train'] + [path]
+  )
+  train_scenario.train(
+    scenario, train, lb, ub, feat_def, feat_timeout, discard, fold_dir[:-1],
+    kb_name
+  )
+  run(pre_process.main, options['pre'] + ['--kb-path', kb_dir, path])
+  k_kb, lb, ub, feat_def, kb, static_schedule, timeout, portfolio, backup, _, \
+    _, _, selected_features, feature_steps, max_size, search, _, _, _, _, _, \
+      _ = run(test_scenario.parse_arguments, ['-K', kb_dir, path])
+  if k is None:
+    k = k_kb
+
+  feature_costs = test_scenario.get_feature_costs(scenario, feature_steps)
+  instances = []
+  feat_vectors = []
+  feat_costs = []
+  for row in select_rows(scenario.feature_values, test):
+    instances.append(row[0])
+    feat_vectors.append(row[2:])
+    feat_costs.append(feature_costs.get(row[0], 0))
+  features = sorted(selected_features.values())
+  norm_vectors = normalize(
+    feat_vectors, features, kb.lims, lb, ub, feat_def
+  )
+  stats = {'n': len(instances), 'found': 0, 'total': 0}
+  neighbourhoods = {}
+  for method in ['exact', neigh_search]:
+    # The index of the approximate search (if any) is built before timing.
+    get_neighbours([], features, kb, k, method)
+    start = time.time()
+    neighbourhoods[method] = get_neighbours(
+      norm_vectors, features, kb, k, method
+    )
+    stats[method + '_time'] = time.time() - start
+    schedules = get_sunny_schedules(
+      lb, ub, feat_def, kb, static_schedule, timeout, k, portfolio, backup,
+      selected_features, feat_vectors, feat_costs, max_size, search, None,
+      None, method
+    )
+    predictions = test_scenario.get_rows(
+      instances, schedules, static_schedule, True
+    )
+    result = evaluate_predictions(predictions, runtimes, feature_costs, timeout)
+    stats[method + '_par10'] = result['par10']
+    stats[method + '_fsi'] = result['fsi']
+  for (exact, approx) in zip(neighbourhoods['exact'],
+                             neighbourhoods[neigh_search]):
+    stats['found'] += len(set(exact).intersection(approx))
+    stats['total'] += len(exact)
+  return stats
+
+def print_comparison(name, stats, neigh_search):
+  '''
+  Prints the comparison between the exact and the neigh_search methods.
+  '''
+  n = float(stats['n'])
+  recall = stats['found'] / float(stats['total']) if stats['total'] else 1.0
+  print name + ':', 'recall', round(recall, 4), '|', 'time (ms/instance)', \
+    'exact', round(1000 * stats['exact_time'] / n, 4), neigh_search, \
+      round(1000 * stats[neigh_search + '_time'] / n, 4), '|', 'PAR10', \
+        'exact', stats['exact_par10'] / n, neigh_search, \
+          stats[neigh_search + '_par10'] / n, '|', 'FSI', 'exact', \
+            stats['exact_fsi'] / n, neigh_search, \
+              stats[neigh_search + '_fsi'] / n
+
+def main(args):
+  paths, neigh_search, k, cv_path, options = parse_arguments(args)
+  for path in paths:
+    scenario = Scenario(path)
+    runtimes = get_runtimes(scenario)
+    name = path.split('/')[-2]
+    if cv_path:
+      cv_dir = cv_path.rstrip('/') + '/cv_' + name + '/'
+    else:
+      cv_dir = path + 'cv_' + name + '/'
+    totals = {}
+    for (i, j, train, test) in scenario.folds():
+      stats = compare_fold(
+        scenario, runtimes, cv_dir, i, j, train, test, neigh_search, k, options
+      )
+      print_comparison(
+        'Fold ' + name + ' ' + str(i) + '_' + str(j), stats, neigh_search
+      )
+      for (key, value) in stats.items():
+        totals[key] = totals.get(key, 0) + value
+    print_comparison('Scenario ' + name, totals, neigh_search)
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,216 @@
+#! /usr/bin/env python
+
+'''
+compare_selection [OPTIONS] <SCENARIO_PATH> [<SCENARIO_PATH> ...]
+
+Checks the native feature selection (see feature_selection module) against
+WEKA on the cross-fold validation of the given ASlib scenarios. For each fold,
+the training set is trained as in evaluate_scenarios and then its features are
+selected both by WEKA (i.e., by running weka.jar, which must be in the folder
+of sunny-as, as for pre_process) and natively. For each fold it prints whether
+the two selections agree or, otherwise, the features selected only by WEKA and
+the ones selected only natively. For each scenario, it prints the number of
+folds where the two selections agree.
+
+The exit status is 1 if the selections of any fold differ, 0 otherwise.
+
+Options
+=======
+  -E "<EVALUATOR>"
+   The attribute/subset evaluator (see pre_process). It must be natively
+   supported (see feature_selection module). By default, both the evaluators
+   of the following -E/-S pairs are compared:
+     "weka.attributeSelection.InfoGainAttributeEval"
+     "weka.attributeSelection.Ranker -N 5"
+   and:
+     "weka.attributeSelection.CfsSubsetEval"
+     "weka.attributeSelection.BestFirst -D 1 -N 5"
+  -S "<SEARCH>"
+   The search method (see pre_process). This option is allowed only in
+   conjunction with -E option.
+  --filter-portfolio
+   Removes from the portfolio the solvers that are never the best solver for
+   any instance of the fold before selecting the features (see pre_process).
+   Unset by default.
+  --cv-path <PATH>
+   Creates at the specified path the folder cv_<SCENARIO>, which contains the
+   knowledge base kb_fold_i_j of each fold i_j in the folder fold_i_j. By
+   default, it is created in the scenario folder.
+  --train-options "<OPTIONS>"
+   Options passed to train_scenario. By default, "--discard --feat-timeout +inf"
+  --help
+   Prints this message.
+'''
+
+import os
+import sys
+import copy
+import shlex
+import getopt
+import train_scenario
+from distutils.spawn import find_executable
+from scenario import Scenario
+from knowledge_base import KnowledgeBase
+from feature_selection import get_method
+from pre_process import CLASSPATH, select_features
+from evaluate_scenarios import TRAIN_OPTIONS, run
+
+# Pairs (evaluator, search) compared by default.
+METHODS = [
+  (
+    'weka.attributeSelection.InfoGainAttributeEval',
+    'weka.attributeSelection.Ranker -N 5'
+  ),
+  (
+    'weka.attributeSelection.CfsSubsetEval',
+    'weka.attributeSelection.BestFirst -D 1 -N 5'
+  ),
+]
+
+def parse_arguments(args):
+  '''
+  Parse the options specified by the user and returns the corresponding
+  arguments properly set.
+  '''
+  try:
+    long_options = [
+      'help', 'filter-portfolio', 'cv-path=', 'train-options='
+    ]
+    opts, args = getopt.getopt(args, 'E:S:', long_options)
+  except getopt.GetoptError as msg:
+    print >> sys.stderr, msg
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  if not args:
+    if not opts:
+      print >> sys.stderr, 'Error! No arguments given.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    else:
+      print __doc__
+      sys.exit(0)
+
+  paths = []
+  for path in args:
+    if path[-1] != '/':
+      path += '/'
+    if not os.path.exists(path):
+      print >> sys.stderr, 'Error: Directory ' + path + ' does not exists.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    paths.append(path)
+
+  # Initialize variables with default values.
+  evaluator = None
+  search = None
+  filter_portfolio = False
+  cv_path = None
+  train_options = TRAIN_OPTIONS
+
+  # Options parsing.
+  for o, a in opts:
+    if o == '--help':
+      print __doc__
+      sys.exit(0)
+    elif o == '-E':
+      evaluator = a
+    elif o == '-S':
+      search = a
+    elif o == '--filter-portfolio':
+      filter_portfolio = True
+    elif o == '--cv-path':
+      if not os.path.exists(a):
+        print >> sys.stderr, 'Error! Directory ' + a + ' not exists.'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      cv_path = a
+    elif o == '--train-options':
+      train_options = a
+
+  if bool(evaluator) != bool(search):
+    print >> sys.stderr, 'Error! Options -E and -S must be set together.'
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+  methods = METHODS if evaluator is None else [(evaluator, search)]
+  for (evaluator, search) in methods:
+    if get_method(evaluator, search) is None:
+      print >> sys.stderr, 'Error! ' + evaluator + ' with ' + search + \
+        ' is not natively supported.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+  if not os.path.exists(CLASSPATH):
+    print >> sys.stderr, 'Error! File ' + CLASSPATH + ' not exists.'
+    sys.exit(2)
+  if find_executable('java') is None:
+    print >> sys.stderr, 'Error! Command java not found.'
+    sys.exit(2)
+  return paths, methods, filter_portfolio, cv_path, shlex.split(train_options)
+
+def compare_fold(scenario, cv_dir, i, j, train, methods, filter_pf, options):
+  '''
+  Trains the fold i_j of the scenario (a Scenario object), where train is the
+  set of its training instances, and returns the list of the pairs (weka,
+  native) of the sets of the features selected by WEKA and natively with each
+  pair (evaluator, search) of methods.
+  '''
+  path = scenario.path
+  fold = str(i) + '_' + str(j)
+  fold_dir = cv_dir + 'fold_' + fold + '/'
+  kb_name = 'kb_fold_' + fold
+  kb_dir = fold_dir + kb_name + '/'
+  _, lb, ub, feat_def, feat_timeout, discard, _, _ = run(
+    train_scenario.parse_arguments, options + [path]
+  )
+  train_scenario.train(
+    scenario, train, lb, ub, feat_def, feat_timeout, discard, fold_dir[:-1],
+    kb_name
+  )
+  kb = KnowledgeBase(kb_dir, kb_name)
+  selections = []
+  for (evaluator, search) in methods:
+    features = []
+    for native in [False, True]:
+      # The arguments are changed by select_features.
+      selected, _ = select_features(
+        copy.deepcopy(kb.args), kb, kb_dir, path, evaluator, search, filter_pf,
+        native
+      )
+      features.append(set(selected.keys()))
+    selections.append(tuple(features))
+  return selections
+
+def main(args):
+  paths, methods, filter_portfolio, cv_path, options = parse_arguments(args)
+  differ = False
+  for path in paths:
+    scenario = Scenario(path)
+    name = path.split('/')[-2]
+    if cv_path:
+      cv_dir = cv_path.rstrip('/') + '/cv_' + name + '/'
+    else:
+      cv_dir = path + 'cv_' + name + '/'
+    agree = [0] * len(methods)
+    num_folds = 0
+    for (i, j, train, test) in scenario.folds():
+      selections = compare_fold(
+        scenario, cv_dir, i, j, train, methods, filter_portfolio, options
+      )
+      num_folds += 1
+      for (m, (weka, native)) in enumerate(selections):
+        method = methods[m][0].split('.')[-1]
+        prefix = 'Fold ' + name + ' ' + str(i) + '_' + str(j) + ' ' + method
+        if weka == native:
+          agree[m] += 1
+          print prefix + ': agree'
+        else:
+          differ = True
+          print prefix + ': WEKA only', sorted(weka - native), '| native only', \
+            sorted(native - weka)
+    for (m, (evaluator, search)) in enumerate(methods):
+      print 'Scenario ' + name + ' ' + evaluator.split('.')[-1] + ':', \
+        agree[m], '/', num_folds, 'folds agree'
+  sys.exit(1 if differ else 0)
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -1,55 +1,273 @@
+#! /usr/bin/env python
+
 '''
-Evaluate different ASlib scenarios.
+evaluate_scenarios [OPTIONS] <SCENARIO_PATH> [<SCENARIO_PATH> ...]
+
+Evaluates SUNNY on the given ASlib scenarios according to the cross-fold
+validation of each scenario (see file cv.arff). For each fold, the training set
+is trained and pre-processed, and then the test set is tested. The Fraction of
+Solved Instances (FSI) and the Penalized Average Runtime (PAR10) of SUNNY and of
+the Virtual Best Solver (VBS) are printed for each fold and for each scenario.
+
+Each scenario is parsed only once, and the training and test sets of its folds
+are selected in memory (i.e., no train_i_j/test_i_j folder is created). The
+train, pre-processing and test phases are called in-process (i.e., without
+starting a new interpreter) and the folds of all the scenarios are evaluated by
+a pool of worker processes.
+
+Options
+=======
+  --jobs <N>
+   Number of worker processes evaluating the folds. By default, it is set to 1.
+   If N > 1, the --jobs option of test_scenario is ignored, since the worker 
+   processes cannot start other processes (i.e., each fold is tested by its
+   worker process only).
+  --cv-path <PATH>
+   Creates at the specified path the folder cv_<SCENARIO>, which contains the
+   knowledge base kb_fold_i_j and the predictions of each fold i_j in the
+   folder fold_i_j. By default, it is created in the scenario folder.
+  --train-options "<OPTIONS>"
+   Options passed to train_scenario. By default, "--discard --feat-timeout +inf"
+  --pre-options "<OPTIONS>"
+   Options passed to pre_process. By default:
+     -E "weka.attributeSelection.InfoGainAttributeEval"
+     -S "weka.attributeSelection.Ranker -N 5"
+     --static-schedule --filter-portfolio
+  --test-options "<OPTIONS>"
+   Options passed to test_scenario. The static schedule is always included in
+   the predictions, and the profile of each fold (see the --profile option of
+   test_scenario) is written in the fold folder. By default, no option is 
+   passed.
+  --csv <FILE>
+   Writes the results of each fold in the CSV file <FILE>.
+  --help
+   Prints this message.
 '''
 
 import os
 import csv
-import json
-from subprocess import Popen
-
-in_path = os.path.realpath(__file__).split('/')[:-2]
-# List of the scenarios to test.
-scenarios = [
-  #'ASP-POTASSCO',
-  #'CSP-2010',
-  #'MAXSAT12-PMS',
-  #'PREMARSHALLING-ASTAR-2013',
-  #'PROTEUS-2014',
-  #'QBF-2011',
-  'SAT11-HAND',
-  'SAT11-INDU',
-  'SAT11-RAND',
-  #'SAT12-ALL',
-  #'SAT12-HAND',
-  #'SAT12-INDU',
-  #'SAT12-RAND',
-]  
-
-for scenario in scenarios:
-  print 'Evaluating scenario',scenario
-  src_path = '/'.join(in_path) + '/src/'
-  path = '/'.join(in_path) + '/data/aslib_1.0.1/' + scenario
-  
-  print 'Extracting runtimes'
-  reader = csv.reader(open(path + '/algorithm_runs.arff'), delimiter = ',')
+import sys
+import time
+import shlex
+import getopt
+import multiprocessing
+import train_scenario
+import pre_process
+import test_scenario
+from scenario import Scenario
+
+# Default options of the train, pre-processing and test phases.
+TRAIN_OPTIONS = '--discard --feat-timeout +inf'
+PRE_OPTIONS = '-E "weka.attributeSelection.InfoGainAttributeEval" ' \
+  '-S "weka.attributeSelection.Ranker -N 5" ' \
+  '--static-schedule --filter-portfolio'
+TEST_OPTIONS = ''
+
+# Statistics computed for each fold.
+STATS = ['n', 'm', 'p', 'fsi', 'fsi_vbs', 'par10', 'par10_vbs']
+
+# Scenarios, runtimes of each scenario and options of the phases, inherited by
+# the forked worker processes.
+scenarios = {}
+scenario_runtimes = {}
+phase_options = {}
+
+def parse_arguments(args):
+  '''
+  Parse the options specified by the user and returns the corresponding
+  arguments properly set.
+  '''
+  try:
+    long_options = [
+      'help', 'jobs=', 'cv-path=', 'train-options=', 'pre-options=',
+      'test-options=', 'csv='
+    ]
+    opts, args = getopt.getopt(args, None, long_options)
+  except getopt.GetoptError as msg:
+    print >> sys.stderr, msg
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  if not args:
+    if not opts:
+      print >> sys.stderr, 'Error! No arguments given.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    else:
+      print __doc__
+      sys.exit(0)
+
+  paths = []
+  for path in args:
+    if path[-1] != '/':
+      path += '/'
+    if not os.path.exists(path):
+      print >> sys.stderr, 'Error: Directory ' + path + ' does not exists.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    paths.append(path)
+
+  # Initialize variables with default values.
+  jobs = 1
+  cv_path = None
+  csv_file = None
+  options = {
+    'train': TRAIN_OPTIONS,
+    'pre': PRE_OPTIONS,
+    'test': TEST_OPTIONS,
+  }
+
+  # Options parsing.
+  for o, a in opts:
+    if o == '--help':
+      print __doc__
+      sys.exit(0)
+    elif o == '--jobs':
+      jobs = int(a)
+      if jobs < 1:
+        print >> sys.stderr, 'Error! Not acceptable number of jobs'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+    elif o == '--cv-path':
+      if not os.path.exists(a):
+        print >> sys.stderr, 'Error! Directory ' + a + ' not exists.'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      cv_path = a
+    elif o == '--train-options':
+      options['train'] = a
+    elif o == '--pre-options':
+      options['pre'] = a
+    elif o == '--test-options':
+      options['test'] = a
+    elif o == '--csv':
+      csv_file = a
+
+  options = dict((phase, shlex.split(opt)) for (phase, opt) in options.items())
+  return paths, jobs, cv_path, options, csv_file
+
+def get_runtimes(scenario):
+  '''
+  Returns a dict containing, for each instance and solver of the scenario (a
+  Scenario object), the pair [info, time] of the corresponding run.
+  '''
   runtimes = {}
-  for row in reader:
-    if row and row[0].strip().upper() == '@DATA':
-      # Iterates until preamble ends.
-      break
-  for row in reader:
+  for row in scenario.algorithm_runs:
     inst = row[0]
     solv = row[2]
-    time = float(row[3])
+    time = row[3]
     info = row[4]
     if inst not in runtimes.keys():
       runtimes[inst] = {}
     runtimes[inst][solv] = [info, time]
-  
-  print 'Splitting scenario',scenario
-  cmd = 'python ' + src_path + 'split_scenario.py ' + path
-  proc = Popen(cmd.split())
-  proc.communicate()
+  return runtimes
+
+def run(function, *args):
+  '''
+  Returns function(*args), raising an exception if the function exits with an 
+  error (a worker process exiting would hang the process pool).
+  '''
+  try:
+    return function(*args)
+  except SystemExit as e:
+    if e.code:
+      raise RuntimeError(function.__module__ + '.' + function.__name__ + 
+        str(args) + ' exited with status ' + str(e.code))
+
+def evaluate_fold(task):
+  '''
+  Trains, pre-processes and tests the fold task = (path, cv_dir, i, j, train,
+  test) of the scenario in path, where train and test are the sets of its
+  training and test instances, and returns the statistics of its predictions.
+  '''
+  path, cv_dir, i, j, train, test = task
+  stats, _ = run_fold(
+    scenarios[path], scenario_runtimes[path], cv_dir, i, j, train, test, 
+    phase_options
+  )
+  return stats
+
+def run_fold(
+  scenario, runtimes, cv_dir, i, j, train, test, options, profile = None
+):
+  '''
+  Trains, pre-processes and tests the fold i_j of the scenario (a Scenario 
+  object) with the options of each phase, where runtimes is the dict returned by
+  get_runtimes and train and test are the sets of the training and test 
+  instances. Returns the pair (stats, predictions), where predictions is the 
+  list of the predicted rows [instanceID, runID, solver, timeLimit] and stats 
+  are their statistics (see evaluate_predictions). If profile is a Profile 
+  object, the time of the train, pre_process and test phases (and the stages of
+  the prediction) are added to it, in place of the profile of the test options.
+  '''
+  path = scenario.path
+  fold = str(i) + '_' + str(j)
+  fold_dir = cv_dir + 'fold_' + fold + '/'
+  kb_name = 'kb_fold_' + fold
+  kb_dir = fold_dir + kb_name + '/'
+
+  start = time.time()
+  _, lb, ub, feat_def, feat_timeout, discard, _, _ = run(
+    train_scenario.parse_arguments, options['train'] + [path]
+  )
+  train_scenario.train(
+    scenario, train, lb, ub, feat_def, feat_timeout, discard, fold_dir[:-1],
+    kb_name
+  )
+  if profile is not None:
+    start = profile.add_time('train', start)
+  # The pre-processing only reads the training instances of the scenario (i.e.,
+  # the ones of the knowledge base).
+  run(pre_process.main, options['pre'] + ['--kb-path', kb_dir, path])
+  if profile is not None:
+    start = profile.add_time('pre_process', start)
+  test_args = options['test'] + ['-K', kb_dir, path]
+  k, lb, ub, feat_def, kb, static_schedule, timeout, portfolio, backup, _, _, \
+    _, selected_features, feature_steps, max_size, search, stats, cache,      \
+      jobs, neigh_search, test_profile, profile_file =                        \
+        run(test_scenario.parse_arguments, test_args)
+  if profile is None:
+    profile = test_profile
+  if multiprocessing.current_process().daemon:
+    # A worker process of the pool cannot start its own worker processes.
+    jobs = 1
+  # The feature costs are used by both the prediction and the evaluation.
+  feature_costs = test_scenario.get_feature_costs(scenario, feature_steps)
+  instances, schedules = test_scenario.test(
+    scenario, test, lb, ub, feat_def, kb, static_schedule, timeout, k, 
+    portfolio, backup, selected_features, feature_steps, max_size, search, 
+    stats, cache, jobs, neigh_search, profile, feature_costs
+  )
+  if profile is not None:
+    profile.add_time('test', start)
+  if test_profile is not None and profile is test_profile:
+    # Each fold has its own profile, in its folder.
+    profile.write(fold_dir + os.path.basename(profile_file))
+  predictions = test_scenario.get_rows(
+    instances, schedules, static_schedule, True
+  )
+  writer = csv.writer(open(fold_dir + 'predictions.csv', 'w'), delimiter = ',')
+  writer.writerow(['instanceID', 'runID', 'solver', 'timeLimit'])
+  writer.writerows(predictions)
+
+  return evaluate_predictions(
+    predictions, runtimes, feature_costs, kb.args['timeout']
+  ), predictions
+
+def evaluate_predictions(predictions, runtimes, feature_costs, timeout):
+  '''
+  Returns the statistics of the predicted schedules, where predictions is the
+  list of the rows [instanceID, runID, solver, timeLimit] and runtimes is the
+  dict returned by get_runtimes. The statistics are a dict containing:
+
+    n          the number of the instances
+    m          the number of the instances solvable by some solver
+    p          the number of the instances not solved by SUNNY
+    fsi        the number of the instances solved by SUNNY
+    fsi_vbs    the number of the instances solved by the VBS
+    par10      the sum of the PAR10 scores of SUNNY
+    par10_vbs  the sum of the PAR10 scores of the VBS
+  '''
   fsi = 0.0
   fsi_vbs = 0.0
   par10 = 0.0
@@ -57,151 +275,123 @@ for scenario in scenarios:
   n = 0
   m = 0
   p = 0
-  for subdir, dirs, files in os.walk(path + '/cv_' + scenario):
-    if 'train_' in subdir:
-      
-      print 'Training',subdir
-      options = ' --discard --feat-timeout +inf '
-      cmd = 'python ' + src_path + 'train_scenario.py ' + options + subdir
-      proc = Popen(cmd.split())
-      proc.communicate()
-      test_dir = subdir.replace('train_', 'test_')
-      kb_name = subdir.split('/')[-1]
-      pred_file = test_dir + '/predictions.csv'
-      
-      print 'Pre-processing',test_dir
-      options = [
-	'--kb-path', subdir + '/kb_' + kb_name,
-	'-E', 'weka.attributeSelection.InfoGainAttributeEval',
-	#'-E', 'weka.attributeSelection.GainRatioAttributeEval',
-	#'-E', 'weka.attributeSelection.SymmetricalUncertAttributeEval',
-	#'-E', 'weka.attributeSelection.ReliefFAttributeEval',
-	'-S', 'weka.attributeSelection.Ranker -N 5', 
-	'--static-schedule', 
-	'--filter-portfolio'
-      ]
-      cmd = ['python', src_path + 'pre_process.py'] + options + subdir.split()
-      proc = Popen(cmd)
-      proc.communicate()
-      
-      print 'Testing',test_dir
-      options = ' ' #-f container-density,group-same-mean,stacks,group-same-stdev,tiers '
-      #
-      # InfoGain Selected Features (5 features).
-      #
-      # ASP: Running_Avg_LBD-4,Learnt_from_Loop-1,Frac_Learnt_from_Loop-1,Literals_in_Conflict_Nogoods-1,Literals_in_Loop_Nogoods-1
-      # CSP: stats_Local_Variance,stats_tightness_75,normalised_width_of_graph,normalised_median_degree,stats_cts_per_var_mean
-      # MAX-SAT: horn,vcg_var_spread,vcg_var_min,vcg_var_max,vcg_cls_mean
-      # PREMARSHALLING: container-density,group-same-mean,stacks,group-same-stdev,tiers
-      # PROTEUS: csp_perten_avg_predshape,csp_perten_avg_predsize,csp_sqrt_max_domsize,csp_sqrt_avg_domsize,directorder_reducedVars
-      # QBF: FORALL_POS_LITS_PER_CLAUSE,EXIST_VARS_PER_SET,LITN_LIT,OCCP_OCCN,NEG_HORN_CLAUSE
-      # SAT11-HAND: BINARYp,horn_clauses_fraction,SP_bias_q25,VCG_CLAUSE_coeff_variation,lobjois_mean_depth_over_vars
-      # SAT11-INDU: saps_BestAvgImprovement_Mean,VG_min,VG_coeff_variation,VG_max,CG_coeff_variation
-      # SAT11-RAND: VCG_CLAUSE_min,saps_FirstLocalMinStep_Q10,gsat_BestSolution_Mean,cl_size_mean,nclauses
-      # SAT12-ALL: SP_unconstraint_q25,vars_clauses_ratio,SP_unconstraint_mean,SP_unconstraint_q75,POSNEG_RATIO_CLAUSE_entropy
-      # SAT12-HAND: reducedClauses,SP_bias_coeff_variation,horn_clauses_fraction,SP_unconstraint_max,POSNEG_RATIO_CLAUSE_min
-      # SAT12-INDU: POSNEG_RATIO_VAR_entropy,VCG_VAR_coeff_variation,VCG_VAR_entropy,reducedVars,POSNEG_RATIO_VAR_stdev
-      # SAT12-RAND: VCG_VAR_mean,VCG_CLAUSE_mean,saps_BestSolution_Mean,VCG_CLAUSE_min,VCG_CLAUSE_max
-      
-      cmd = 'python ' + src_path + 'test_scenario.py ' + options + ' -o ' + pred_file \
-	  + ' --print-static -K ' + subdir + '/kb_' + kb_name + ' ' + test_dir
-      proc = Popen(cmd.split())
-      proc.communicate()
-      
-      if os.path.exists(path + '/feature_costs.arff'):
-	print 'Extracting feature costs'
-	args_file = subdir + '/kb_' + kb_name + '/kb_' + kb_name + '.args'
-	with open(args_file) as infile:
-	  args = json.load(infile)
-	feature_steps = args['feature_steps']
-	feature_cost = {}
-	reader = csv.reader(open(path + '/feature_costs.arff'), delimiter = ',')
-	for row in reader:
-	  steps = set([])
-	  i = 2
-	  if row and '@ATTRIBUTE' in row[0] \
-	  and 'instance_id' not in row[0] and 'repetition' not in row[0]:
-	    if row[0].strip().split(' ')[1] in feature_steps:
-	      steps.add(i)
-	    i += 1
-	  elif row and row[0].strip().upper() == '@DATA':
-	    # Iterates until preamble ends.
-	    break
-	for row in reader:
-	  feature_cost[row[0]] = sum(float(x) for x in row[2:] if x != '?')
-	  feature_cost[row[0]] = 0
-	  for i in steps:
-	    if row[i] != '?':
-	      feature_cost[row[0]] += float(row[i])
-      
-      print 'Computing fold statistics'
-      reader = csv.reader(open(pred_file), delimiter = ',')
-      old_inst = ''
-      par = True
-      args_file = subdir + '/kb_' + kb_name + '/kb_' + kb_name + '.args'
-      with open(args_file) as infile:
-        timeout = json.load(infile)['timeout']
-      first = True
-      for row in reader:
-	if first:
-	  first = False
-	  continue
-        inst = row[0]
-        if inst == old_inst:
-          if par:
-            continue
-        else:
-	  if not par:
-	    par10 += timeout * 10
-	    par = True
-	    p += 1
-	  n += 1
-	  if os.path.exists(path + '/feature_costs.arff'):
-            time = feature_cost[inst]
-          else:
-            time = 0.0
-          times = [x[1] for x in runtimes[inst].values() if x[0] == 'ok']
-	  if times:
-	    m += 1
-	    fsi_vbs += 1
-	    par10_vbs += min(times)
-	  else:
-	    par10_vbs += 10 * timeout
-        old_inst = inst
-        solver = row[2]
-        solver_time = float(row[3])
-        if  runtimes[inst][solver][0] == 'ok' \
-	and runtimes[inst][solver][1] <= solver_time:
-	  par = True
-	  if time + runtimes[inst][solver][1] >= timeout:
-	    par10 += 10 * timeout
-	    p += 1
-	  else:
-	    fsi += 1
-	    par10 += time + runtimes[inst][solver][1]
-        elif time + min([solver_time, runtimes[inst][solver][1]]) < timeout:
-	  time += min([solver_time, runtimes[inst][solver][1]])
-          par = False
-        else:
-	  par10 += 10 * timeout
-	  par = True
-	  p += 1
-	  
+  old_inst = ''
+  par = True
+  for row in predictions:
+    inst = row[0]
+    if inst == old_inst:
+      if par:
+        continue
+    else:
       if not par:
         par10 += timeout * 10
         par = True
         p += 1
-        
+      n += 1
+      time = feature_costs.get(inst, 0.0)
+      times = [x[1] for x in runtimes[inst].values() if x[0] == 'ok']
+      if times:
+        m += 1
+        fsi_vbs += 1
+        par10_vbs += min(times)
+      else:
+        par10_vbs += 10 * timeout
+    old_inst = inst
+    solver = row[2]
+    solver_time = float(row[3])
+    if runtimes[inst][solver][0] == 'ok' \
+    and runtimes[inst][solver][1] <= solver_time:
+      par = True
+      if time + runtimes[inst][solver][1] >= timeout:
+        par10 += 10 * timeout
+        p += 1
+      else:
+        fsi += 1
+        par10 += time + runtimes[inst][solver][1]
+    elif time + min([solver_time, runtimes[inst][solver][1]]) < timeout:
+      time += min([solver_time, runtimes[inst][solver][1]])
+      par = False
+    else:
+      par10 += 10 * timeout
+      par = True
+      p += 1
+  if not par:
+    par10 += timeout * 10
+    par = True
+    p += 1
   assert p + fsi == n
+  return {
+    'n': n, 'm': m, 'p': p, 'fsi': fsi, 'fsi_vbs': fsi_vbs, 'par10': par10,
+    'par10_vbs': par10_vbs
+  }
+
+def print_results(path, stats):
+  '''
+  Prints the FSI and PAR10 scores of SUNNY and VBS for the given statistics.
+  '''
+  n = stats['n']
   print '\n==========================================='
-  print 'Scenario:',scenario
-  print 'No. of instances:',n,'(',m,'solvable )'
-  print 'FSI SUNNY:', fsi / n
-  print 'FSI VBS:', fsi_vbs / n
-  print 'PAR 10 SUNNY:', par10 / n
-  print 'PAR 10 VBS:', par10_vbs / n
+  print 'Scenario:', path.split('/')[-2]
+  print 'No. of instances:', n, '(', stats['m'], 'solvable )'
+  print 'FSI SUNNY:', stats['fsi'] / n
+  print 'FSI VBS:', stats['fsi_vbs'] / n
+  print 'PAR 10 SUNNY:', stats['par10'] / n
+  print 'PAR 10 VBS:', stats['par10_vbs'] / n
   print '===========================================\n'
 
+def main(args):
+  global phase_options
+  paths, jobs, cv_path, phase_options, csv_file = parse_arguments(args)
+  tasks = []
+  for path in paths:
+    print 'Loading scenario', path
+    scenario = Scenario(path)
+    scenarios[path] = scenario
+    scenario_runtimes[path] = get_runtimes(scenario)
+    if cv_path:
+      cv_dir = cv_path.rstrip('/') + '/cv_' + path.split('/')[-2] + '/'
+    else:
+      cv_dir = path + 'cv_' + path.split('/')[-2] + '/'
+    tasks += [
+      (path, cv_dir, i, j, train, test)
+      for (i, j, train, test) in scenario.folds()
+    ]
+
+  if jobs > 1:
+    pool = multiprocessing.Pool(jobs)
+    results = pool.imap(evaluate_fold, tasks)
+  else:
+    pool = None
+    results = (evaluate_fold(task) for task in tasks)
+  if csv_file:
+    writer = csv.writer(open(csv_file, 'w'), delimiter = ',')
+    writer.writerow(['scenario', 'fold'] + STATS)
+  totals = dict((path, dict.fromkeys(STATS, 0)) for path in paths)
+  # Results are yielded in the same order of the tasks.
+  for ((path, cv_dir, i, j, train, test), stats) in zip(tasks, results):
+    n = stats['n']
+    fold = str(i) + '_' + str(j)
+    print 'Fold', path.split('/')[-2], fold + ':', \
+      'FSI SUNNY:', stats['fsi'] / n, 'PAR 10 SUNNY:', stats['par10'] / n
+    if csv_file:
+      writer.writerow([path, fold] + [stats[s] for s in STATS])
+    for s in STATS:
+      totals[path][s] += stats[s]
+  if pool:
+    pool.close()
+    pool.join()
+
+  for path in paths:
+    print_results(path, totals[path])
+  print 'Scenario\tPAR10\tFSI'
+  for path in paths:
+    n = totals[path]['n']
+    print path.split('/')[-2] + '\t' + str(totals[path]['par10'] / n) + '\t' \
+      + str(totals[path]['fsi'] / n)
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
+
 # Results with --discard, --static-schedule, -f f1,...,f5
 #		PAR10	FSI
 #ASP 		600.0	0.905
@@ -218,3 +408,18 @@ for scenario in scenarios:
 #SAT12-INDU 	2854.8	0.770
 #SAT12-RAND 	3291.9	0.729
 
+# InfoGain Selected Features (5 features).
+#
+# ASP: Running_Avg_LBD-4,Learnt_from_Loop-1,Frac_Learnt_from_Loop-1,Literals_in_Conflict_Nogoods-1,Literals_in_Loop_Nogoods-1
+# CSP: stats_Local_Variance,stats_tightness_75,normalised_width_of_graph,normalised_median_degree,stats_cts_per_var_mean
+# MAX-SAT: horn,vcg_var_spread,vcg_var_min,vcg_var_max,vcg_cls_mean
+# PREMARSHALLING: container-density,group-same-mean,stacks,group-same-stdev,tiers
+# PROTEUS: csp_perten_avg_predshape,csp_perten_avg_predsize,csp_sqrt_max_domsize,csp_sqrt_avg_domsize,directorder_reducedVars
+# QBF: FORALL_POS_LITS_PER_CLAUSE,EXIST_VARS_PER_SET,LITN_LIT,OCCP_OCCN,NEG_HORN_CLAUSE
+# SAT11-HAND: BINARYp,horn_clauses_fraction,SP_bias_q25,VCG_CLAUSE_coeff_variation,lobjois_mean_depth_over_vars
+# SAT11-INDU: saps_BestAvgImprovement_Mean,VG_min,VG_coeff_variation,VG_max,CG_coeff_variation
+# SAT11-RAND: VCG_CLAUSE_min,saps_FirstLocalMinStep_Q10,gsat_BestSolution_Mean,cl_size_mean,nclauses
+# SAT12-ALL: SP_unconstraint_q25,vars_clauses_ratio,SP_unconstraint_mean,SP_unconstraint_q75,POSNEG_RATIO_CLAUSE_entropy
+# SAT12-HAND: reducedClauses,SP_bias_coeff_variation,horn_clauses_fraction,SP_unconstraint_max,POSNEG_RATIO_CLAUSE_min
+# SAT12-INDU: POSNEG_RATIO_VAR_entropy,VCG_VAR_coeff_variation,VCG_VAR_entropy,reducedVars,POSNEG_RATIO_VAR_stdev
+# SAT12-RAND: VCG_VAR_mean,VCG_CLAUSE_mean,saps_BestSolution_Mean,VCG_CLAUSE_min,VCG_CLAUSE_max
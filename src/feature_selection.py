@@ -0,0 +1,516 @@
+'''
+Module for selecting the features of a knowledge base without running WEKA (see
+the --native option of pre_process).
+
+The following combinations of WEKA evaluators and search methods (see the -E and
+-S options of pre_process) are computed natively, following the corresponding 
+WEKA classes:
+
+  weka.attributeSelection.InfoGainAttributeEval
+  weka.attributeSelection.Ranker [-N <NUM>] [-T <THRESHOLD>]
+    Each feature is discretized with the supervised MDL method of Fayyad and
+    Irani (as weka.filters.supervised.attribute.Discretize does) and then ranked
+    by its information gain with respect to the best solver, where the missing
+    values are distributed among the other values. The NUM best features (or
+    the ones having a gain greater than THRESHOLD) are selected, and the ties 
+    are broken with the same sorting of WEKA.
+
+  weka.attributeSelection.CfsSubsetEval
+  weka.attributeSelection.BestFirst [-D 1] [-N <NUM>]
+    Correlation-based feature subset selection, with the default options of 
+    CfsSubsetEval: the merit of a subset is the sum of the correlations between
+    its features and the best solver, divided by the square root of the total
+    correlation between its features, where the correlation is the symmetrical
+    uncertainty of the discretized features (the missing values are 
+    distributed among the other values). The subsets are searched best-first,
+    adding one feature at a time, until NUM expansions (5 by default) do not 
+    improve the best subset. Then, the locally predictive features are added,
+    i.e., the features that are not more correlated with any selected feature
+    than with the best solver.
+
+The selected features are not guaranteed to be the same of WEKA, so WEKA is 
+still used by default: the two selections can be compared on the cross-fold
+validation of the scenarios with compare_selection.
+
+The class names can also be given without package (e.g., "Ranker -N 5"). Any
+other evaluator, search method or option is not supported (see get_method).
+'''
+
+import shlex
+import numpy
+from math import log, sqrt
+
+LOG2 = log(2)
+
+# Values considered equal to 0 by WEKA.
+SMALL = 1e-6
+
+# Minimum improvement of the merit of a subset in the best-first search.
+MIN_IMPROVEMENT = 1e-5
+
+def get_method(evaluator, search):
+  '''
+  Returns the function computing the feature selection given by the WEKA
+  evaluator and search strings, or None if it is not natively supported. The
+  function takes the matrix of the feature values (instances x features, NaN
+  for missing values) and the array of the classes (i.e., the indexes of the
+  best solvers) and returns the list of the indexes of the selected features.
+  '''
+  evaluator, eval_options = parse_class(evaluator)
+  search, search_options = parse_class(search)
+  if eval_options is None or search_options is None or eval_options:
+    return None
+  if evaluator == 'InfoGainAttributeEval' and search == 'Ranker':
+    num_to_select = -1
+    threshold = None
+    for (o, a) in search_options:
+      if o == '-N':
+        num_to_select = int(a)
+      elif o == '-T':
+        threshold = float(a)
+      else:
+        return None
+    return lambda values, classes: rank_features(
+      info_gains(values, classes), num_to_select, threshold
+    )
+  if evaluator == 'CfsSubsetEval' and search == 'BestFirst':
+    max_stale = 5
+    for (o, a) in search_options:
+      if o == '-N':
+        max_stale = int(a)
+      elif o != '-D' or a != '1':
+        return None
+    return lambda values, classes: best_first_cfs(values, classes, max_stale)
+  return None
+
+def parse_class(spec):
+  '''
+  Returns the pair (name, options) of a WEKA class specification, where name is
+  the class name (without package) and options is the list of the pairs
+  (option, value), or (name, None) if the options cannot be parsed.
+  '''
+  tokens = shlex.split(spec)
+  if not tokens:
+    return None, None
+  name = tokens[0].split('.')[-1]
+  if len(tokens) % 2 == 0:
+    return name, None
+  options = []
+  for i in range(1, len(tokens), 2):
+    try:
+      float(tokens[i + 1])
+    except ValueError:
+      return name, None
+    options.append((tokens[i], tokens[i + 1]))
+  return name, options
+
+
+def ln_func(x):
+  '''
+  Returns x * ln(x), or 0 if x < SMALL (element-wise).
+  '''
+  with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+    return numpy.where(x < SMALL, 0.0, x * numpy.log(x))
+
+def entropy(counts):
+  '''
+  Returns the entropy (in bits) of the class counts, as computed by WEKA.
+  '''
+  value = 0.0
+  total = 0.0
+  for c in counts:
+    value -= 0.0 if c < SMALL else c * log(c)
+    total += c
+  if abs(total) < SMALL:
+    return 0.0
+  return (value + (0.0 if total < SMALL else total * log(total))) / \
+    (total * LOG2)
+
+def split_entropies(left, right):
+  '''
+  Returns the array of the class entropies conditioned on the split of a set of
+  instances in two parts, where the rows of the matrices left and right are the
+  class counts of the two parts of each split (as computed by WEKA).
+  '''
+  value = numpy.zeros(len(left))
+  total = numpy.zeros(len(left))
+  for part in [left, right]:
+    part_sum = numpy.zeros(len(left))
+    for j in range(0, part.shape[1]):
+      value = value + ln_func(part[:, j])
+      part_sum += part[:, j]
+    value = value - ln_func(part_sum)
+    total += part_sum
+  return -value / (total * LOG2)
+
+def table_gain(table):
+  '''
+  Returns the information gain of the contingency table (values x classes), as
+  computed by WEKA.
+  '''
+  num_values = len(table)
+  num_classes = len(table[0])
+  # Entropy of the classes.
+  value = 0.0
+  total = 0.0
+  for j in range(0, num_classes):
+    column_sum = 0.0
+    for i in range(0, num_values):
+      column_sum += table[i][j]
+    value -= 0.0 if column_sum < SMALL else column_sum * log(column_sum)
+    total += column_sum
+  if abs(total) < SMALL:
+    return 0.0
+  class_entropy = (value + total * log(total)) / (total * LOG2)
+  # Entropy of the classes conditioned on the values.
+  value = 0.0
+  total = 0.0
+  for i in range(0, num_values):
+    row_sum = 0.0
+    for j in range(0, num_classes):
+      value += 0.0 if table[i][j] < SMALL else table[i][j] * log(table[i][j])
+      row_sum += table[i][j]
+    value -= 0.0 if row_sum < SMALL else row_sum * log(row_sum)
+    total += row_sum
+  return class_entropy - (-value / (total * LOG2))
+
+
+def get_cut_points(values, classes, num_classes):
+  '''
+  Returns the sorted list of the cut points of the values (without missing
+  values) of a feature, computed with the MDL method of Fayyad and Irani.
+  '''
+  order = numpy.argsort(values, kind = 'mergesort')
+  onehot = numpy.zeros((len(values), num_classes))
+  onehot[numpy.arange(len(values)), classes[order]] = 1.0
+  cut_points = []
+  mdl_split(values[order], onehot, 0, len(values), cut_points)
+  return sorted(cut_points)
+
+def mdl_split(values, onehot, first, last, cut_points):
+  '''
+  Adds to cut_points the cut points of the sorted values[first : last], whose
+  classes are the rows of onehot.
+  '''
+  n = last - first
+  if n < 2:
+    return
+  left = numpy.cumsum(onehot[first : last - 1], axis = 0)
+  prior = onehot[first : last].sum(axis = 0)
+  right = prior - left
+  # A cut point lies between two different consecutive values.
+  candidates = numpy.flatnonzero(
+    values[first : last - 1] < values[first + 1 : last]
+  )
+  if len(candidates) == 0:
+    return
+  entropies = split_entropies(left[candidates], right[candidates])
+  prior_entropy = entropy(prior)
+  best = numpy.argmin(entropies)
+  if not entropies[best] < prior_entropy:
+    return
+  i = candidates[best]
+  if not accept_split(
+    prior, left[i], right[i], prior_entropy, entropies[best], n,
+    len(candidates)
+  ):
+    return
+  mdl_split(values, onehot, first, first + i + 1, cut_points)
+  cut_points.append((values[first + i] + values[first + i + 1]) / 2.0)
+  mdl_split(values, onehot, first + i + 1, last, cut_points)
+
+def accept_split(prior, left, right, prior_entropy, split_entropy, n, num_cuts):
+  '''
+  Returns True if the split of n instances, whose class counts are prior, into
+  two parts with class counts left and right satisfies the MDL criterion of
+  Fayyad and Irani, where num_cuts is the number of possible cut points.
+  '''
+  gain = prior_entropy - split_entropy
+  k = sum(1 for c in prior if c > 0)
+  k_left = sum(1 for c in left if c > 0)
+  k_right = sum(1 for c in right if c > 0)
+  delta = log(3.0 ** k - 2) / LOG2 - (
+    k * prior_entropy - k_right * entropy(right) - k_left * entropy(left)
+  )
+  return gain > (log(num_cuts) / LOG2 + delta) / n
+
+def discretize(values, classes, num_classes):
+  '''
+  Returns the pair (bins, num_bins) where bins is the array of the intervals of
+  the values of a feature (discretized with the MDL method), with -1 for the
+  missing values, and num_bins is the number of the intervals.
+  '''
+  known = ~numpy.isnan(values)
+  cut_points = get_cut_points(values[known], classes[known], num_classes)
+  bins = numpy.full(len(values), -1, dtype = int)
+  # A value belongs to the first interval whose cut point is not smaller.
+  bins[known] = numpy.searchsorted(cut_points, values[known], side = 'left')
+  return bins, len(cut_points) + 1
+
+
+def info_gains(values, classes):
+  '''
+  Returns the array of the information gains of the features (columns) of the
+  matrix values with respect to the classes, as InfoGainAttributeEval does.
+  '''
+  num_classes = int(classes.max()) + 1 if len(classes) else 1
+  gains = numpy.zeros(values.shape[1])
+  for f in range(0, values.shape[1]):
+    bins, num_bins = discretize(values[:, f], classes, num_classes)
+    counts = numpy.bincount(
+      (bins + 1) * num_classes + classes, minlength = (num_bins + 1) * num_classes
+    ).reshape((num_bins + 1, num_classes)).astype(float).tolist()
+    # The first row counts the missing values.
+    missing = counts[0]
+    counts = counts[1:]
+    row_sums = [0.0] * num_bins
+    total = 0.0
+    for i in range(0, num_bins):
+      for j in range(0, num_classes):
+        row_sums[i] += counts[i][j]
+      total += row_sums[i]
+    if total > SMALL:
+      # The missing values are distributed proportionally to the row sums.
+      table = [
+        [counts[i][j] + (row_sums[i] / total) * missing[j]
+         for j in range(0, num_classes)]
+        for i in range(0, num_bins)
+      ]
+    else:
+      table = [missing]
+    gains[f] = table_gain(table)
+  return gains
+
+def weka_sort(array):
+  '''
+  Returns the indexes of the array sorted by increasing value, with the same
+  quicksort of WEKA (so that the ties are broken in the same way).
+  '''
+  index = range(0, len(array))
+  if len(array) > 1:
+    quick_sort(array, index, 0, len(array) - 1)
+  return index
+
+def quick_sort(array, index, left, right):
+  '''
+  Sorts index[left : right + 1] by the corresponding values of array.
+  '''
+  def conditional_swap(l, r):
+    if array[index[l]] > array[index[r]]:
+      index[l], index[r] = index[r], index[l]
+
+  # Explicit stack, instead of recursion.
+  stack = [(left, right)]
+  while stack:
+    (left, right) = stack.pop()
+    diff = right - left
+    if diff <= 0:
+      continue
+    if diff == 1:
+      conditional_swap(left, right)
+      continue
+    if diff == 2:
+      conditional_swap(left, left + 1)
+      conditional_swap(left, right)
+      conditional_swap(left + 1, right)
+      continue
+    # Median of three.
+    center = (left + right) // 2
+    conditional_swap(left, center)
+    conditional_swap(left, right)
+    conditional_swap(center, right)
+    index[center], index[right - 1] = index[right - 1], index[center]
+    pivot = array[index[right - 1]]
+    l = left
+    r = right - 1
+    while True:
+      l += 1
+      while array[index[l]] < pivot:
+        l += 1
+      r -= 1
+      while array[index[r]] > pivot:
+        r -= 1
+      if l >= r:
+        break
+      index[l], index[r] = index[r], index[l]
+    index[l], index[right - 1] = index[right - 1], index[l]
+    # The left part is sorted first, as in the recursive version.
+    stack.append((l + 1, right))
+    stack.append((left, l - 1))
+
+def rank_features(merits, num_to_select = -1, threshold = None):
+  '''
+  Returns the indexes of the features sorted by decreasing merit, as Ranker
+  does: only the first num_to_select (all if negative) are returned or, if
+  threshold is not None, the ones having a merit greater than threshold.
+  '''
+  ranking = weka_sort(list(merits))[::-1]
+  if num_to_select < 0 and threshold is not None:
+    num_to_select = len([f for f in ranking if merits[f] > threshold])
+  if num_to_select < 0 or num_to_select > len(ranking):
+    num_to_select = len(ranking)
+  return ranking[0 : num_to_select]
+
+
+def symmetrical_uncertainty(table):
+  '''
+  Returns the symmetrical uncertainty of the contingency table, as computed by
+  WEKA (i.e., 0 if the entropy of the rows or of the columns is 0).
+  '''
+  num_rows = len(table)
+  num_columns = len(table[0])
+  total = 0.0
+  column_entropy = 0.0
+  for j in range(0, num_columns):
+    column_sum = 0.0
+    for i in range(0, num_rows):
+      column_sum += table[i][j]
+    column_entropy += 0.0 if column_sum < SMALL else column_sum * log(column_sum)
+    total += column_sum
+  column_entropy -= 0.0 if total < SMALL else total * log(total)
+  row_entropy = 0.0
+  conditioned_entropy = 0.0
+  for i in range(0, num_rows):
+    row_sum = 0.0
+    for j in range(0, num_columns):
+      row_sum += table[i][j]
+      conditioned_entropy += \
+        0.0 if table[i][j] < SMALL else table[i][j] * log(table[i][j])
+    row_entropy += 0.0 if row_sum < SMALL else row_sum * log(row_sum)
+  conditioned_entropy -= row_entropy
+  row_entropy -= 0.0 if total < SMALL else total * log(total)
+  if abs(column_entropy) < SMALL or abs(row_entropy) < SMALL:
+    return 0.0
+  return 2.0 * ((column_entropy - conditioned_entropy) / 
+    (column_entropy + row_entropy))
+
+def cfs_correlation(x, num_x, y, num_y, with_class = False):
+  '''
+  Returns the correlation between the discrete arrays x and y (whose values are
+  in range(0, num_x) and range(0, num_y), -1 for the missing values) as 
+  CfsSubsetEval computes it: the symmetrical uncertainty of their contingency 
+  table, where the missing values are distributed among the other values. A 
+  correlation equal to 0 is returned as 1 unless y is the class, and the result 
+  is rounded to single precision (as WEKA stores it).
+  '''
+  n = len(x)
+  x = numpy.where(x < 0, num_x, x)
+  y = numpy.where(y < 0, num_y, y)
+  # The last row and column count the missing values.
+  counts = numpy.bincount(
+    x * (num_y + 1) + y, minlength = (num_x + 1) * (num_y + 1)
+  ).reshape((num_x + 1, num_y + 1)).astype(float)
+  sum_x = counts.sum(axis = 1)
+  sum_y = counts.sum(axis = 0)
+  total = float(n)
+  if sum_x[-1] < n and sum_y[-1] < n:
+    copy = counts.copy()
+    total_missing = sum_x[-1] + sum_y[-1] - counts[-1, -1]
+    if sum_x[-1] > 0:
+      counts[:-1, :-1] += (sum_x[:-1] / (total - sum_x[-1]))[:, numpy.newaxis] \
+        * counts[-1, :-1]
+      counts[-1, :-1] = 0.0
+    if sum_y[-1] > 0:
+      counts[:-1, :-1] += (sum_y[:-1] / (total - sum_y[-1])) \
+        * counts[:-1, -1][:, numpy.newaxis]
+      counts[:-1, -1] = 0.0
+    if counts[-1, -1] > 0 and total_missing != total:
+      counts[:-1, :-1] += \
+        (copy[:-1, :-1] / (total - total_missing)) * copy[-1, -1]
+      counts[-1, -1] = 0.0
+  corr = symmetrical_uncertainty(counts.tolist())
+  if abs(corr) < SMALL:
+    corr = 0.0 if with_class else 1.0
+  return float(numpy.float32(corr))
+
+def cfs_merit(subset, class_corr, get_corr):
+  '''
+  Returns the CFS merit of the sorted tuple subset of features, where
+  class_corr[f] is the correlation between f and the class and get_corr(f, g)
+  the one between f and g (the sums follow the order of WEKA).
+  '''
+  num = 0.0
+  for f in subset:
+    num += class_corr[f]
+  denom = 0.0
+  for (i, f) in enumerate(subset):
+    denom += 1.0
+    for g in subset[0 : i]:
+      denom += 2.0 * get_corr(f, g)
+  if denom < 0:
+    denom = -denom
+  if denom == 0:
+    return 0.0
+  return abs(num / sqrt(denom))
+
+def add_to_list(queue, subset, merit, max_size):
+  '''
+  Inserts the subset with the given merit in the list queue of the pairs 
+  (merit, subset) sorted by decreasing merit, after the ones with the same 
+  merit, keeping at most max_size pairs (as the BestFirst list of WEKA does).
+  '''
+  if queue and len(queue) == max_size and merit <= queue[-1][0]:
+    return
+  i = 0
+  while i < len(queue) and not merit > queue[i][0]:
+    i += 1
+  if i < len(queue) and len(queue) == max_size:
+    queue.pop()
+  queue.insert(i, (merit, subset))
+
+def best_first_cfs(values, classes, max_stale = 5):
+  '''
+  Returns the sorted list of the indexes of the features selected by the best
+  first search of the subset having the maximum CFS merit, plus the locally 
+  predictive features (see the module documentation).
+  '''
+  num_features = values.shape[1]
+  num_classes = int(classes.max()) + 1 if len(classes) else 1
+  features = [
+    discretize(values[:, f], classes, num_classes)
+    for f in range(0, num_features)
+  ]
+  class_corr = [
+    cfs_correlation(bins, n, classes, num_classes, True)
+    for (bins, n) in features
+  ]
+  corr = {}
+  def get_corr(f, g):
+    key = (min(f, g), max(f, g))
+    if key not in corr:
+      corr[key] = cfs_correlation(
+        features[f][0], features[f][1], features[g][0], features[g][1]
+      )
+    return corr[key]
+
+  # Best first search, forward from the empty subset.
+  best_subset = ()
+  best_merit = 0.0
+  queue = [(best_merit, best_subset)]
+  merits = {best_subset: best_merit}
+  stale = 0
+  while queue and stale < max_stale:
+    (_, subset) = queue.pop(0)
+    improved = False
+    for f in range(0, num_features):
+      if f in subset:
+        continue
+      new_subset = tuple(sorted(subset + (f,)))
+      if new_subset not in merits:
+        merits[new_subset] = cfs_merit(new_subset, class_corr, get_corr)
+      merit = merits[new_subset]
+      add_to_list(queue, new_subset, merit, max_stale)
+      if merit - best_merit > MIN_IMPROVEMENT:
+        best_merit = merit
+        best_subset = new_subset
+        improved = True
+    stale = 0 if improved else stale + 1
+
+  # Locally predictive features, by decreasing correlation with the class: a
+  # feature is added if it is not more correlated with any selected feature.
+  selected = list(best_subset)
+  candidates = [f for f in range(0, num_features) if f not in best_subset]
+  for f in sorted(candidates, key = lambda f: (-class_corr[f], f)):
+    if all(get_corr(g, f) <= class_corr[f] for g in sorted(selected)):
+      selected.append(f)
+  return sorted(selected)
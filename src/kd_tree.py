@@ -0,0 +1,207 @@
+'''
+Module for searching the neighbours of a feature vector with a k-d tree built
+on the selected features of a knowledge base.
+
+The tree is only used for skipping the instances that cannot be neighbours: the
+distances of the remaining ones are computed (and the ties broken) as in the
+brute-force search of the neighbours module, so the neighbourhoods are exactly
+the same. The lower bounds of the nodes are computed with the same operations
+(in the same order) of the distances and they are not greater than them, since
+the floating point operations are monotone.
+
+A tree is worth its overhead only for big knowledge bases with few features,
+so it is built only if the knowledge base has at least MIN_SIZE instances and
+the selected features are at most MAX_DIM (otherwise, the brute-force search is
+used). The tree of <KB> is stored in the NumPy (npz) file <KB>.tree.
+'''
+
+import os
+import numpy
+from math import sqrt
+from neighbours import euclidean_distances, nearest
+
+# Minimum number of instances and maximum number of features for building a
+# tree, and maximum number of instances of a leaf. Big leaves are better, since
+# the distances of a leaf are computed at once, as array operations.
+MIN_SIZE = 4096
+MAX_DIM = 10
+LEAF_SIZE = 512
+
+class KDTree(object):
+  '''
+  K-d tree of the instances of a knowledge base, restricted to the columns
+  selected_features of its features. The node 0 is the root and node i has the
+  following attributes:
+
+    start[i], end[i]  the instances of the node are perm[start[i] : end[i]]
+    left[i], right[i] the children of the node (-1 for leaves)
+    lo[i], hi[i]      the bounding box of the instances of the node
+  '''
+
+  def __init__(
+    self, selected_features, perm, start, end, left, right, lo, hi, points
+  ):
+    self.selected_features = list(selected_features)
+    self.perm = perm
+    self.start = start.tolist()
+    self.end = end.tolist()
+    self.left = left.tolist()
+    self.right = right.tolist()
+    self.lo = lo.tolist()
+    self.hi = hi.tolist()
+    # points[i] is the feature vector of the instance perm[i], so that the
+    # instances of a node are contiguous.
+    self.points = points
+
+  def query(self, query, k):
+    '''
+    Returns the list of the indexes of the k instances closer to the query
+    vector, sorted by increasing distance. Ties are broken in favour of the
+    smallest index.
+    '''
+    if k <= 0:
+      return []
+    q = query.tolist()
+    row = query.reshape((1, len(q)))
+    columns = range(0, len(q))
+    # Nodes are visited depth-first, the closer child first. A node is skipped
+    # if its lower bound is greater than the k-th smallest distance found.
+    kth = float('+inf')
+    indexes = []
+    distances = []
+    num_candidates = 0
+    stack = [(0.0, 0)]
+    while stack:
+      (bound, node) = stack.pop()
+      if bound > kth:
+        continue
+      if self.left[node] < 0:
+        (s, e) = (self.start[node], self.end[node])
+        indexes.append(self.perm[s : e])
+        distances.append(
+          euclidean_distances(row, self.points[s : e], columns)[0]
+        )
+        num_candidates += e - s
+        if num_candidates >= k:
+          d = numpy.concatenate(distances)
+          kth = d[numpy.argpartition(d, k - 1)[k - 1]]
+          # Only the candidates not farther than the k-th are kept.
+          keep = d <= kth
+          indexes = [numpy.concatenate(indexes)[keep]]
+          distances = [d[keep]]
+          num_candidates = len(distances[0])
+        continue
+      children = [
+        (self.lower_bound(q, child), child)
+        for child in [self.left[node], self.right[node]]
+      ]
+      children.sort(reverse = True)
+      stack += [(b, child) for (b, child) in children if b <= kth]
+    indexes = numpy.concatenate(indexes)
+    distances = numpy.concatenate(distances)
+    # The candidates are sorted by index, so that nearest breaks ties in the
+    # same way of the brute-force search.
+    order = numpy.argsort(indexes)
+    return indexes[order][nearest(distances[order], k)].tolist()
+
+  def lower_bound(self, q, node):
+    '''
+    Returns the distance between the vector q and the bounding box of node.
+    '''
+    squares = 0.0
+    for (x, lo, hi) in zip(q, self.lo[node], self.hi[node]):
+      if x < lo:
+        d = lo - x
+      elif x > hi:
+        d = x - hi
+      else:
+        continue
+      squares += d * d
+    return sqrt(squares)
+
+
+def use_tree(num_instances, num_features):
+  '''
+  Returns True if a tree is worth building for a knowledge base of
+  num_instances instances and num_features selected features.
+  '''
+  return num_instances >= MIN_SIZE and 0 < num_features <= MAX_DIM
+
+def build_tree(features, selected_features):
+  '''
+  Returns the KDTree of the matrix features (instances x features) restricted
+  to the columns selected_features. Each node is split at the median of its
+  widest feature.
+  '''
+  selected_features = sorted(selected_features)
+  points = numpy.array(features[:, selected_features], dtype = numpy.float64)
+  perm = numpy.arange(len(points))
+  start = [0]
+  end = [len(points)]
+  left = [-1]
+  right = [-1]
+  lo = []
+  hi = []
+  node = 0
+  # Nodes are created in breadth-first order.
+  while node < len(start):
+    (s, e) = (start[node], end[node])
+    block = points[perm[s : e]]
+    lo.append(block.min(axis = 0) if e > s else numpy.zeros(points.shape[1]))
+    hi.append(block.max(axis = 0) if e > s else numpy.zeros(points.shape[1]))
+    spread = hi[node] - lo[node]
+    if e - s > LEAF_SIZE and spread.max() > 0:
+      j = spread.argmax()
+      # Stable sort, so that the tree only depends on the knowledge base.
+      order = numpy.argsort(block[:, j], kind = 'mergesort')
+      perm[s : e] = perm[s : e][order]
+      m = s + (e - s) // 2
+      left[node] = len(start)
+      right[node] = len(start) + 1
+      start += [s, m]
+      end += [m, e]
+      left += [-1, -1]
+      right += [-1, -1]
+    node += 1
+  return KDTree(
+    selected_features, perm, numpy.array(start), numpy.array(end),
+    numpy.array(left), numpy.array(right), numpy.array(lo), numpy.array(hi),
+    points[perm]
+  )
+
+def write_tree(path, features, selected_features):
+  '''
+  Builds the tree of the matrix features restricted to selected_features and
+  stores it in path, if worth it (see use_tree). Otherwise, the file path is
+  removed (if it exists).
+  '''
+  if not use_tree(len(features), len(selected_features)):
+    if os.path.exists(path):
+      os.remove(path)
+    return
+  tree = build_tree(features, selected_features)
+  with open(path, 'wb') as outfile:
+    numpy.savez(
+      outfile, selected_features = tree.selected_features, perm = tree.perm,
+      start = tree.start, end = tree.end, left = tree.left,
+      right = tree.right, lo = tree.lo, hi = tree.hi
+    )
+
+def read_tree(path, features):
+  '''
+  Returns the KDTree stored in path for the matrix features, or None if the
+  file does not exist or does not match features.
+  '''
+  if not os.path.exists(path):
+    return None
+  with open(path, 'rb') as infile:
+    tree = numpy.load(infile)
+    perm = tree['perm']
+    if len(perm) != len(features):
+      return None
+    selected_features = tree['selected_features'].tolist()
+    return KDTree(
+      selected_features, perm, tree['start'], tree['end'], tree['left'],
+      tree['right'], tree['lo'], tree['hi'],
+      numpy.array(features[:, selected_features][perm], dtype = numpy.float64)
+    )
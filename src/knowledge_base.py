@@ -0,0 +1,264 @@
+'''
+Helper module for loading a SUNNY knowledge base in memory.
+
+Besides the text files, a knowledge base <KB> can be stored in the binary file
+<KB>.bin, which can be memory-mapped (so that concurrent processes share the 
+same copy of it) and loaded without any parsing. Its layout is:
+
+  - the magic string BIN_MAGIC;
+  - the length of the header (8 bytes, unsigned little-endian integer);
+  - the header, i.e., a JSON dict containing the format version, the tables of
+    the instances, features, solvers and feature steps having a cost, the 
+    feature bounds (as in <KB>.lims), the training information (see 
+    KnowledgeBase) and, for each array, its dtype, shape, order and offset in
+    the file;
+  - the arrays, each one aligned to BIN_ALIGN bytes.
+
+The arrays are the scaled features, the runtimes, the status, the actual 
+runtimes (see KnowledgeBase), the features before scaling, which are needed for updating the knowledge base (see update_kb
+module), and the feature costs of each feature step (which are summed by
+get_feature_costs without parsing the scenario again).
+'''
+
+import os
+import csv
+import json
+import numpy
+import struct
+from kd_tree import read_tree
+from scenario import get_step_costs
+
+BIN_MAGIC = 'SUNNYKB\n'
+BIN_VERSION = 4
+BIN_ALIGN = 64
+
+class KnowledgeBase(object):
+  '''
+  In-memory copy of a SUNNY knowledge base <KB>. The files <KB>.info, <KB>.runs,
+  <KB>.lims and <KB>.args are parsed only once, when the object is created. If 
+  the binary file <KB>.bin exists, it is memory-mapped and used instead of the 
+  first three files:
+
+    instances   list of the instance names of the knowledge base
+    features    matrix (instances x features) of the scaled feature vectors
+    feature_names  list of the feature names (None if <KB>.bin does not exist)
+    solvers     list of the solvers, runtimes[:, j] refers to solvers[j]
+    runtimes    matrix (instances x solvers) of the solving times, where the
+                unsuccessful runs take the timeout
+    status      boolean matrix (instances x solvers) of the successful runs
+    raw_runtimes  matrix (instances x solvers) of the actual runtimes, i.e., 
+                  the unsuccessful runs keep the time they have taken (as in 
+                  the evaluation of evaluate_scenarios module)
+    lims        dict containing the lower/upper bounds for each feature
+    args        dict containing the arguments needed by SUNNY algorithm
+
+  If the file <KB>.tree exists, the attribute tree is the KDTree used for
+  searching the neighbours (see kd_tree module), otherwise it is None. The
+  indexes built by the approximate neighbours searches are kept in the dict
+  indexes (see neighbours module).
+
+  A ValueError is raised if the knowledge base has been created by an old
+  version of train_scenario (e.g., the runs are in <KB>.info and <KB>.runs does
+  not exist), since it has to be created again.
+
+  The following attributes are None if <KB>.bin does not exist:
+
+    raw_features  matrix (instances x features) of the feature vectors before
+                  scaling (NaN for missing values)
+    cost_names    list of the feature steps having a cost (empty if the 
+                  scenario has no feature costs)
+    costs         matrix (instances x cost_names) of the feature costs (NaN for
+                  missing costs)
+    training      dict containing the information of the training needed for
+                  updating the knowledge base, i.e., the feature timeout, the 
+                  feature steps (and whether the scenario has feature costs), 
+                  the discarded instances (None if --discard was not set) and
+                  the number of solved instances and total time of each solver
+  '''
+
+  def __init__(self, kb_path, kb_name):
+    kb = kb_path + kb_name
+    self.indexes = {}
+    with open(kb + '.args') as infile:
+      self.args = json.load(infile)
+    if read_binary_kb(kb + '.bin', self):
+      self.tree = read_tree(kb + '.tree', self.features)
+      return
+    with open(kb + '.lims') as infile:
+      self.lims = json.load(infile)
+
+    self.feature_names = None
+    self.raw_features = None
+    self.cost_names = None
+    self.costs = None
+    self.training = None
+    if not os.path.exists(kb + '.runs'):
+      raise_old_format(kb_path)
+    self.instances = []
+    features = []
+    reader = csv.reader(open(kb + '.info'), delimiter = '|')
+    for row in reader:
+      if len(row) != 2:
+        raise_old_format(kb_path)
+      self.instances.append(row[0])
+      features.append(map(float, row[1][1 : -1].split(',')))
+    # Column-major order, since neighbours are searched feature by feature.
+    self.features = numpy.array(features, dtype = numpy.float64, order = 'F')
+
+    with open(kb + '.runs', 'rb') as infile:
+      runs = numpy.load(infile)
+      if 'raw_runtimes' not in runs.files:
+        raise_old_format(kb_path)
+      self.solvers = runs['solvers'].tolist()
+      self.runtimes = runs['runtimes']
+      self.status = numpy.unpackbits(runs['status'], axis = 1).astype(bool)
+      self.raw_runtimes = runs['raw_runtimes']
+    self.status = self.status[:, 0 : len(self.solvers)]
+    self.solver_index = dict((s, j) for (j, s) in enumerate(self.solvers))
+    self.tree = read_tree(kb + '.tree', self.features)
+
+  def get_best_solvers(self):
+    '''
+    Returns the list of the pairs (instance, solver) where solver is the fastest
+    solver successfully solving instance (ties are broken by solver name). The 
+    instances not solved by any solver are skipped.
+    '''
+    best = []
+    for i in range(0, len(self.instances)):
+      best_solvers = [
+        (self.runtimes[i, j], self.solvers[j]) 
+        for j in numpy.flatnonzero(self.status[i])
+      ]
+      if best_solvers:
+        best.append((self.instances[i], min(best_solvers)[1]))
+    return best
+
+  def get_feature_costs(self, feature_steps):
+    '''
+    Returns the array of the total cost of the feature steps in feature_steps
+    for each instance of the knowledge base (0 if the costs are not known).
+    '''
+    if not self.cost_names:
+      return numpy.zeros(len(self.instances))
+    return get_step_costs(self.costs, self.cost_names, feature_steps)
+
+  def get_runtimes(self, neighbours, portfolio):
+    '''
+    Returns the matrix (neighbours x portfolio) of the runtimes of the solvers
+    of portfolio on the instances of the knowledge base indexed by neighbours.
+    '''
+    columns = [self.solver_index[s] for s in portfolio]
+    return self.runtimes[numpy.ix_(neighbours, columns)]
+
+
+def raise_old_format(kb_path):
+  """
+  Raises the ValueError of a knowledge base kb_path having an old format.
+  """
+  raise ValueError(
+    'The format of the knowledge base ' + kb_path + ' has changed, re-run '
+    'train_scenario to create it again.'
+  )
+
+def write_binary_kb(
+  path, instances, feature_names, features, solvers, runtimes, status, 
+  raw_runtimes, lims, raw_features, training, costs, cost_names
+):
+  """
+  Writes the binary knowledge base file path (see the module documentation).
+  """
+  arrays = [
+    # Column-major order, since neighbours are searched feature by feature.
+    ('features', numpy.asfortranarray(features, dtype = numpy.float64)),
+    ('runtimes', numpy.ascontiguousarray(runtimes, dtype = numpy.float64)),
+    ('status', numpy.ascontiguousarray(status, dtype = bool)),
+    (
+      'raw_runtimes', 
+      numpy.ascontiguousarray(raw_runtimes, dtype = numpy.float64)
+    ),
+    ('raw_features', numpy.asfortranarray(raw_features, dtype = numpy.float64)),
+    ('costs', numpy.ascontiguousarray(costs, dtype = numpy.float64)),
+  ]
+  header = {
+    'version': BIN_VERSION,
+    'instances': instances,
+    'feature_names': feature_names,
+    'solvers': solvers,
+    'lims': lims,
+    'cost_names': cost_names,
+    'training': training,
+    'arrays': {},
+  }
+  # Offsets are relative to the end of the header, whose length is not known
+  # until the header is serialized.
+  offset = 0
+  for (name, array) in arrays:
+    offset = align(offset)
+    header['arrays'][name] = {
+      'dtype': array.dtype.str,
+      'shape': array.shape,
+      'fortran_order': name in ['features', 'raw_features'],
+      'offset': offset,
+    }
+    offset += array.nbytes
+  data = json.dumps(header)
+  start = align(len(BIN_MAGIC) + 8 + len(data))
+  # The file is renamed only when complete, so that the processes which have 
+  # memory-mapped the previous version of the file are not affected.
+  tmp_path = path + '.' + str(os.getpid())
+  with open(tmp_path, 'wb') as outfile:
+    outfile.write(BIN_MAGIC)
+    outfile.write(struct.pack('<Q', len(data)))
+    outfile.write(data)
+    for (name, array) in arrays:
+      padding = start + header['arrays'][name]['offset'] - outfile.tell()
+      outfile.write('\0' * padding)
+      outfile.write(array.tobytes(order = 'A'))
+  os.rename(tmp_path, path)
+
+def read_binary_kb(path, kb):
+  """
+  Memory-maps the binary knowledge base file path and sets the corresponding 
+  attributes of the KnowledgeBase object kb. Returns False if the file does not 
+  exist or has an unsupported version.
+  """
+  if not os.path.exists(path):
+    return False
+  with open(path, 'rb') as infile:
+    if infile.read(len(BIN_MAGIC)) != BIN_MAGIC:
+      return False
+    size = struct.unpack('<Q', infile.read(8))[0]
+    header = json.loads(infile.read(size))
+  if header['version'] != BIN_VERSION:
+    return False
+  start = align(len(BIN_MAGIC) + 8 + size)
+  arrays = {}
+  for (name, info) in header['arrays'].items():
+    if 0 in info['shape']:
+      arrays[name] = numpy.zeros(info['shape'], dtype = info['dtype'])
+      continue
+    arrays[name] = numpy.memmap(
+      path, dtype = info['dtype'], mode = 'r', offset = start + info['offset'], 
+      shape = tuple(info['shape']), 
+      order = 'F' if info['fortran_order'] else 'C'
+    )
+  kb.instances = header['instances']
+  kb.feature_names = header['feature_names']
+  kb.solvers = header['solvers']
+  kb.lims = header['lims']
+  kb.features = arrays['features']
+  kb.runtimes = arrays['runtimes']
+  kb.status = arrays['status']
+  kb.raw_runtimes = arrays['raw_runtimes']
+  kb.raw_features = arrays['raw_features']
+  kb.cost_names = header['cost_names']
+  kb.costs = arrays['costs']
+  kb.training = header['training']
+  kb.solver_index = dict((s, j) for (j, s) in enumerate(kb.solvers))
+  return True
+
+def align(offset):
+  """
+  Returns the smallest multiple of BIN_ALIGN not smaller than offset.
+  """
+  return (offset + BIN_ALIGN - 1) // BIN_ALIGN * BIN_ALIGN
@@ -0,0 +1,249 @@
+'''
+Module for searching the neighbours of the feature vectors in a knowledge base.
+
+The search method is given as a string METHOD, which is one of:
+
+  exact
+    Exact search: the k-d tree of the knowledge base is used if it exists (see
+    kd_tree module), otherwise all the distances are computed (brute force).
+
+  lsh[:<TABLES>[,<HASHES>]]
+    Approximate search with Locality-Sensitive Hashing for the Euclidean
+    distance. Each one of the TABLES hash tables maps an instance to a bucket,
+    identified by HASHES random projections of its features. The neighbours of
+    a vector are searched only among the instances sharing a bucket with it,
+    so the more tables (and the less hashes) the more accurate but slower is
+    the search. If less than k instances are found, the exact search is used.
+    By default, TABLES = 16 and HASHES = 4.
+
+All the methods return the neighbours sorted by increasing distance, breaking
+ties in favour of the smallest index, and compute the distances in the same way
+(so the approximate neighbourhoods may only miss some of the exact neighbours).
+'''
+
+import numpy
+
+# Maximum number of feature vectors whose distances are computed at once.
+BLOCK_SIZE = 256
+
+# Default number of tables and hashes per table of LSH.
+LSH_TABLES = 16
+LSH_HASHES = 4
+# The width of the projections is LSH_WIDTH times the average distance between
+# a sample of LSH_SAMPLE instances and their k-th nearest neighbour.
+LSH_WIDTH = 2.0
+LSH_SAMPLE = 64
+# Seed of the random projections, so that the search is deterministic.
+LSH_SEED = 0
+
+def get_neighbours(feat_vectors, selected_features, kb, k, method = 'exact'):
+  """
+  Returns, for each feature vector in feat_vectors, the list of the indexes of
+  the k instances of the knowledge base kb closer to it, sorted by increasing
+  distance. Each vector of feat_vectors only contains the selected_features.
+  The neighbours are searched according to method (see module documentation).
+  """
+  queries = numpy.array(feat_vectors, dtype = numpy.float64).reshape(
+    (len(feat_vectors), len(selected_features))
+  )
+  name, params = parse_method(method)
+  return NEIGHBOUR_METHODS[name](queries, selected_features, kb, k, *params)
+
+def parse_method(method):
+  """
+  Returns the pair (name, params) of the search method, raising ValueError if
+  method is not valid.
+  """
+  name, _, params = method.partition(':')
+  if name not in NEIGHBOUR_METHODS.keys():
+    raise ValueError('Unknown neighbours search method ' + name)
+  if not params:
+    return name, ()
+  try:
+    params = tuple(int(x) for x in params.split(','))
+  except ValueError:
+    raise ValueError('Not acceptable parameters ' + params)
+  if name == 'exact' or len(params) > 2 or min(params) < 1:
+    raise ValueError('Not acceptable parameters ' + method)
+  return name, params
+
+
+def exact_neighbours(queries, selected_features, kb, k):
+  """
+  Exact search of the neighbours of the rows of queries (see get_neighbours).
+  The tree of kb (if any) is used when built on the same selected_features.
+  """
+  if kb.tree is not None and kb.tree.selected_features == selected_features:
+    return [kb.tree.query(q, k) for q in queries]
+  neighbours = []
+  # Queries are processed in blocks, to bound the size of the distance matrix.
+  for i in range(0, len(queries), BLOCK_SIZE):
+    distances = euclidean_distances(
+      queries[i : i + BLOCK_SIZE], kb.features, selected_features
+    )
+    neighbours += [nearest(d, k) for d in distances]
+  return neighbours
+
+
+def lsh_neighbours(
+  queries, selected_features, kb, k, tables = LSH_TABLES, hashes = LSH_HASHES
+):
+  """
+  Approximate search of the neighbours of the rows of queries with LSH (see
+  get_neighbours). The index is built at the first search and kept in kb.
+  """
+  if len(kb.features) <= k:
+    # All the instances are neighbours.
+    return exact_neighbours(queries, selected_features, kb, k)
+  key = ('lsh', tuple(selected_features), k, tables, hashes)
+  if key not in kb.indexes.keys():
+    kb.indexes[key] = LSHIndex(
+      kb.features, selected_features, k, tables, hashes
+    )
+  index = kb.indexes[key]
+  neighbours = []
+  buckets = index.get_buckets(queries)
+  for i in range(0, len(queries)):
+    candidates = index.get_candidates(buckets[i])
+    if len(candidates) < k:
+      neighbours += exact_neighbours(
+        queries[i : i + 1], selected_features, kb, k
+      )
+      continue
+    distances = euclidean_distances(
+      queries[i : i + 1], index.points[candidates], range(0, len(queries[i]))
+    )[0]
+    neighbours.append(candidates[nearest(distances, k)].tolist())
+  return neighbours
+
+
+class LSHIndex(object):
+  '''
+  LSH index of the matrix features (instances x features) restricted to the
+  columns selected_features. The j-th hash of the table t of a vector x is
+  floor((a[t, j] * x + b[t, j]) / width), where a[t, j] is a random gaussian
+  vector and b[t, j] is random in [0, width). The hashes of a table are combined
+  in a single integer key. For each table t:
+
+    keys[t]     sorted array of the keys of the non-empty buckets
+    starts[t]   starts[t][i] is the position in order[t] of the first instance
+                of the bucket keys[t][i] (the last element is the number of
+                instances)
+    order[t]    the instances, sorted by key
+  '''
+
+  def __init__(self, features, selected_features, k, tables, hashes):
+    self.points = numpy.array(
+      features[:, selected_features], dtype = numpy.float64
+    )
+    n, d = self.points.shape
+    random = numpy.random.RandomState(LSH_SEED)
+    self.a = random.normal(size = (d, tables * hashes))
+    self.width = LSH_WIDTH * self.get_radius(k, random)
+    self.b = random.uniform(0, self.width, tables * hashes)
+    # Random multipliers combining the hashes of a table in a single key.
+    # Colliding keys only merge some buckets, giving more candidates.
+    self.mult = random.randint(1, 2 ** 31, hashes).astype(numpy.int64)
+    self.tables = tables
+    self.hashes = hashes
+    self.keys = []
+    self.starts = []
+    self.order = []
+    point_keys = self.get_keys(self.points)
+    for t in range(0, tables):
+      order = numpy.argsort(point_keys[:, t], kind = 'mergesort')
+      keys, starts = numpy.unique(point_keys[order, t], return_index = True)
+      self.keys.append(keys)
+      self.starts.append(numpy.append(starts, n))
+      self.order.append(order)
+
+  def get_radius(self, k, random):
+    """
+    Returns the average distance between a sample of the instances and their
+    k-th nearest neighbour.
+    """
+    n, d = self.points.shape
+    if n <= 1:
+      return 1.0
+    sample = random.choice(n, min(n, LSH_SAMPLE), replace = False)
+    distances = euclidean_distances(
+      self.points[sample], self.points, range(0, d)
+    )
+    # The 0-th neighbour of an instance of the sample is the instance itself.
+    kth = min(k, n - 1)
+    radius = numpy.partition(distances, kth, axis = 1)[:, kth].mean()
+    return radius if radius > 0 else 1.0
+
+  def get_keys(self, vectors):
+    """
+    Returns the matrix (vectors x tables) of the keys of vectors.
+    """
+    h = numpy.floor((numpy.dot(vectors, self.a) + self.b) / self.width)
+    h = h.astype(numpy.int64).reshape((len(vectors), self.tables, self.hashes))
+    # Integer overflows are harmless (they just wrap around).
+    with numpy.errstate(over = 'ignore'):
+      return (h * self.mult).sum(axis = 2)
+
+  def get_buckets(self, queries):
+    """
+    Returns the list of the buckets of each query, where a bucket is a pair
+    (t, i) meaning the i-th bucket of the table t.
+    """
+    query_keys = self.get_keys(queries)
+    buckets = [[] for q in queries]
+    for t in range(0, self.tables):
+      pos = numpy.searchsorted(self.keys[t], query_keys[:, t])
+      pos = numpy.minimum(pos, len(self.keys[t]) - 1)
+      for i in numpy.flatnonzero(self.keys[t][pos] == query_keys[:, t]):
+        buckets[i].append((t, pos[i]))
+    return buckets
+
+  def get_candidates(self, buckets):
+    """
+    Returns the sorted array of the instances belonging to buckets.
+    """
+    if not buckets:
+      return numpy.zeros(0, dtype = int)
+    return numpy.unique(numpy.concatenate([
+      self.order[t][self.starts[t][i] : self.starts[t][i + 1]]
+      for (t, i) in buckets
+    ]))
+
+
+def euclidean_distances(queries, features, selected_features):
+  """
+  Computes the matrix of the Euclidean distances between each row of queries
+  and each row of features (restricted to selected_features columns).
+  """
+  assert queries.shape[1] == len(selected_features)
+  squares = numpy.zeros((len(queries), len(features)))
+  # Summing column by column gives the same distances of a sequential sum.
+  for j in range(0, len(selected_features)):
+    d = features[:, selected_features[j]] - queries[:, j, numpy.newaxis]
+    squares += d * d
+  return numpy.sqrt(squares)
+
+
+def nearest(distances, k):
+  """
+  Returns the indexes of the k smallest distances, sorted by increasing
+  distance. Ties are broken in favour of the smallest index.
+  """
+  if k <= 0:
+    return []
+  if k < len(distances):
+    # Partial selection of the k-th smallest distance: all the elements not
+    # farther than it are kept, so that ties can be broken by index.
+    kth = distances[numpy.argpartition(distances, k - 1)[k - 1]]
+    candidates = numpy.flatnonzero(distances <= kth)
+  else:
+    candidates = numpy.arange(len(distances))
+  order = numpy.argsort(distances[candidates], kind = 'mergesort')
+  return candidates[order[0 : k]].tolist()
+
+
+# Neighbours search methods, see the module documentation.
+NEIGHBOUR_METHODS = {
+  'exact': exact_neighbours,
+  'lsh': lsh_neighbours,
+}
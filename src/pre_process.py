@@ -10,7 +10,9 @@ the supervised attribute filter:
 
   weka.filters.supervised.attribute.AttributeSelection
 
-which allows various search and evaluation methods to be combined.
+which allows various search and evaluation methods to be combined. The most 
+common combinations can also be computed natively, without WEKA (see --native 
+option and feature_selection module).
 
 Options
 =======
@@ -40,18 +42,48 @@ Options
   Sets the attribute/subset evaluator and its options, e.g.:
     -E "weka.attributeSelection.CfsSubsetEval -L"
   This option is allowed only in conjunction with -S option.
+
+--wrapper <DIRECTION>
+  Selects the features with a wrapper method, i.e., by evaluating the candidate
+  subsets of features with the PAR10 of SUNNY in an internal cross-validation on
+  the knowledge base (see wrapper_selection module). DIRECTION is "forward" (the
+  features are added one at a time) or "backward" (the features are removed one
+  at a time). This option is not allowed in conjunction with -E and -S options.
+
+--wrapper-steps
+  The wrapper method adds or removes whole feature steps instead of single 
+  features. Unset by default.
+
+--wrapper-folds <N>
+  Number of folds of the cross-validation of the wrapper method. By default, it
+  is set to 5.
+
+--jobs <N>
+  Number of worker processes evaluating the candidate subsets of the wrapper 
+  method. By default, it is set to 1.
+
+--native
+  Performs feature selection natively (i.e., without WEKA) if the given 
+  evaluator and search method are supported by feature_selection module, and 
+  with WEKA otherwise. Note that the selected features may differ from the ones 
+  of WEKA (see compare_selection). Unset by default.
   
 --help
   Prints this message.
 '''
 
 import os
-import csv
 import sys
 import json
 import getopt
 import shutil
+import numpy
 from subprocess import Popen
+from feature_selection import get_method
+from wrapper_selection import get_units, select_units
+from kd_tree import write_tree
+from knowledge_base import KnowledgeBase
+from arff import ArffReader, format_attribute, format_row, format_value
 
 in_path = os.path.realpath(__file__).split('/')[:-2]
 CLASSPATH = '/'.join(in_path) + '/weka.jar'
@@ -63,7 +95,9 @@ def parse_arguments(args):
   '''
   try:
     opts, args = getopt.getopt(
-      args, 'S:E:', ['help', 'static-schedule', 'filter-portfolio', 'kb-path=']
+      args, 'S:E:', 
+      ['help', 'static-schedule', 'filter-portfolio', 'kb-path=', 'native', 
+        'wrapper=', 'wrapper-steps', 'wrapper-folds=', 'jobs=']
     )
   except getopt.GetoptError as msg:
     print >> sys.stderr, msg
@@ -93,6 +127,11 @@ def parse_arguments(args):
   search = ''
   static_schedule = False
   filter_portfolio = False
+  native = False
+  wrapper = None
+  wrapper_steps = False
+  wrapper_folds = 5
+  jobs = 1
   kb_path = scenario
   kb_name = 'kb_' + scenario.split('/')[-2]
 
@@ -109,6 +148,28 @@ def parse_arguments(args):
       static_schedule = True
     elif o == '--filter-portfolio':
       filter_portfolio = True
+    elif o == '--native':
+      native = True
+    elif o == '--wrapper':
+      if a not in ['forward', 'backward']:
+        print >> sys.stderr, 'Error! Unknown wrapper direction ' + a
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      wrapper = a
+    elif o == '--wrapper-steps':
+      wrapper_steps = True
+    elif o == '--wrapper-folds':
+      wrapper_folds = int(a)
+      if wrapper_folds < 2:
+        print >> sys.stderr, 'Error! Not acceptable number of folds'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+    elif o == '--jobs':
+      jobs = int(a)
+      if jobs < 1:
+        print >> sys.stderr, 'Error! Not acceptable number of jobs'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
     elif o == '--kb-path':
       if not os.path.exists(a):
         print >> sys.stderr, 'Error! Directory ' + a + ' not exists.'
@@ -119,11 +180,15 @@ def parse_arguments(args):
       else:
         kb_path = a
   
-  kb_name = kb_path.split('/')[-2]
-  args_file = kb_path + '/kb_' + kb_name + '.args'
-  info_file = kb_path + '/kb_' + kb_name + '.info'
-  return args_file, info_file, scenario, evaluator, search, static_schedule, \
-    filter_portfolio
+  if wrapper and (evaluator or search):
+    print >> sys.stderr, 'Error! Option --wrapper is not allowed with -E and -S'
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+  
+  kb_dir = kb_path + '/'
+  kb_name = 'kb_' + kb_path.split('/')[-2]
+  return kb_dir, kb_name, scenario, evaluator, search, static_schedule, \
+    filter_portfolio, native, wrapper, wrapper_steps, wrapper_folds, jobs
 
 def remove_exp(x):
   if 'e-' in x or 'E-' in x:
@@ -131,63 +196,44 @@ def remove_exp(x):
   else:
     return x
 
-def select_features(args, info_file, scenario, evaluator, search, filter_pf):
-  in_path = info_file[:info_file.rfind('/')] + '/feat_in.arff'
-  in_file = open(in_path, 'w')
-  
-  reader = csv.reader(open(info_file), delimiter = '|')
-  best = {}
-  for row in reader:
-    best_solvers = [
-      (float(it['time']), s) 
-      for s, it in eval(row[2]).items() 
-      if it['info'] == 'ok'
-    ]
-    if not best_solvers:
-      continue
-    best_solver = min(best_solvers)[1]
-    best[row[0]] = best_solver
+def select_features(
+  args, kb, kb_dir, scenario, evaluator, search, filter_pf, native = False
+):
+  best = dict(kb.get_best_solvers())
   
   if filter_pf:
     args['portfolio'] = list(set(best.values()))
   
-  reader = csv.reader(open(scenario + 'feature_values.arff'), delimiter = ',')
-  pfolio = ','.join(args['portfolio'])
-  for row in reader:
-    if row:
-      if 'instance_id' in row[0] or 'repetition' in row[0]:
-	continue
-      elif row and row[0].strip().upper() == '@DATA':
-	in_file.write('@ATTRIBUTE best_solver {' + pfolio + '}\n\n')
-	in_file.write('@DATA\n')
-	break
-      else:
-	in_file.write(','.join(row) + '\n')
-  for row in reader:
-    if row[0] not in best.keys():
-      continue
-    label = best[row[0]]
-    new_vector = [remove_exp(x) for x in row[2:]] + [label]
-    in_file.write(','.join(new_vector) + '\n')
-    
-  in_file.close()  
-  out_path = info_file[:info_file.rfind('/')] + '/feat_out.arff'
-  weka_cmd = [
-    'java', '-cp', CLASSPATH, 
-    'weka.filters.supervised.attribute.AttributeSelection', 
-    '-E', evaluator, '-S', search, '-i', in_path, '-o', out_path
+  # Values are not typed, so that they are passed to WEKA as they are.
+  reader = ArffReader(scenario + 'feature_values.arff', typed = False)
+  rows = [
+    [remove_exp(x) for x in row[2:]] + [best[row[0]]]
+    for row in reader if row[0] in best
   ]
-  proc = Popen(weka_cmd)
-  proc.communicate()
-  
-  new_features = []
-  reader = csv.reader(open(out_path), delimiter = ' ')
-  for row in reader:
-    if row:
-      if row[0] == '@attribute' and row[1] != 'best_solver':
-	new_features.append(row[1])
-      elif row[0] == '@data':
-	break
+  names = [
+    name for (name, t) in reader.attributes 
+    if name not in ['instance_id', 'repetition']
+  ]
+  method = get_method(evaluator, search) if native else None
+  if method:
+    values = numpy.array(
+      [[float('nan') if x == '?' else float(x) for x in row[:-1]] 
+        for row in rows],
+      dtype = float
+    ).reshape(len(rows), len(names))
+    classes = numpy.array(
+      [args['portfolio'].index(row[-1]) for row in rows], dtype = int
+    )
+    new_features = [names[i] for i in method(values, classes)]
+  else:
+    new_features = select_weka(args, kb_dir, reader, rows, evaluator, search)
+  return filter_features(args, new_features)
+
+def filter_features(args, new_features):
+  '''
+  Returns the pair (selected_features, feature_steps) of args restricted to the
+  features in new_features.
+  '''
   selected_features = dict(
     (feature, index) 
     for (feature, index) in args['selected_features'].items() 
@@ -199,6 +245,37 @@ def select_features(args, info_file, scenario, evaluator, search, filter_pf):
     if set(features).intersection(new_features)
   )
   return selected_features, feature_steps
+
+def select_weka(args, kb_dir, reader, rows, evaluator, search):
+  '''
+  Runs the WEKA attribute selection filter on the given rows, and returns the 
+  names of the selected features.
+  '''
+  in_path = kb_dir + 'feat_in.arff'
+  in_file = open(in_path, 'w')
+  in_file.write('@RELATION ' + format_value(reader.relation) + '\n\n')
+  for (name, t) in reader.attributes:
+    if name not in ['instance_id', 'repetition']:
+      in_file.write(format_attribute(name, t) + '\n')
+  in_file.write(format_attribute('best_solver', args['portfolio']) + '\n\n')
+  in_file.write('@DATA\n')
+  for row in rows:
+    in_file.write(format_row(row) + '\n')
+    
+  in_file.close()  
+  out_path = kb_dir + 'feat_out.arff'
+  weka_cmd = [
+    'java', '-cp', CLASSPATH, 
+    'weka.filters.supervised.attribute.AttributeSelection', 
+    '-E', evaluator, '-S', search, '-i', in_path, '-o', out_path
+  ]
+  proc = Popen(weka_cmd)
+  proc.communicate()
+  
+  return [
+    name for (name, t) in ArffReader(out_path).attributes 
+    if name != 'best_solver'
+  ]
   
 
 def compute_schedule(args, max_time = 10):	
@@ -207,40 +284,51 @@ def compute_schedule(args, max_time = 10):
   return [(solver, min(time, max_time))]
 
 def main(args):
-  args_file, info_file, scenario, evaluator, search, static_schedule, \
-    filter_portfolio = parse_arguments(args)
-  with open(args_file) as infile:
-    args = json.load(infile)
-  infile.close()
+  kb_dir, kb_name, scenario, evaluator, search, static_schedule, \
+    filter_portfolio, native, wrapper, wrapper_steps, wrapper_folds, jobs = \
+      parse_arguments(args)
+  kb = KnowledgeBase(kb_dir, kb_name)
+  args = kb.args
   
   # Feature selection.
   if evaluator and search:
     selected_features, feature_steps = select_features(
-      args, info_file, scenario, evaluator, search, filter_portfolio
+      args, kb, kb_dir, scenario, evaluator, search, filter_portfolio, 
+      native
     )
     args['selected_features'] = selected_features
     args['feature_steps'] = feature_steps
-  elif filter_portfolio:
-    reader = csv.reader(open(info_file), delimiter = '|')
-    portfolio = set([])
-    for row in reader:
-      best_solvers = [
-        (float(it['time']), s) 
-        for s, it in eval(row[2]).items() 
-        if it['info'] == 'ok'
-      ]
-      if not best_solvers:
-        continue
-      portfolio.add(min(best_solvers)[1])
-    args['portfolio'] = list(portfolio)
+  else:
+    if filter_portfolio:
+      portfolio = set(solver for (inst, solver) in kb.get_best_solvers())
+      args['portfolio'] = list(portfolio)
+    if static_schedule:
+      # The wrapper method evaluates the features with the static schedule.
+      args['static_schedule'] = compute_schedule(args)
+    if wrapper:
+      units = get_units(
+        args['selected_features'], args['feature_steps'], wrapper_steps
+      )
+      selected, _ = select_units(kb, args, units, wrapper, wrapper_folds, jobs)
+      new_features = set(
+        f for (f, i) in args['selected_features'].items() 
+        if any(i in units[u] for u in selected)
+      )
+      selected_features, feature_steps = filter_features(args, new_features)
+      args['selected_features'] = selected_features
+      args['feature_steps'] = feature_steps
   
   # Static schedule.
   if static_schedule:
     static_schedule = compute_schedule(args)
     args['static_schedule'] = static_schedule
     
-  with open(args_file, 'w') as outfile:
+  with open(kb_dir + kb_name + '.args', 'w') as outfile:
     json.dump(args, outfile)
+  # The tree of the knowledge base is built on the new selected features.
+  write_tree(
+    kb_dir + kb_name + '.tree', kb.features, args['selected_features'].values()
+  )
     
 if __name__ == '__main__':
   main(sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,126 @@
+'''
+Helper module for profiling the SUNNY prediction.
+
+A Profile object collects the time spent in each stage of the prediction and
+some counters (e.g., the number of the subsets evaluated by the sub-portfolio
+search), both in total and for each instance. The profile is written in JSON
+format as a dict containing:
+
+  stages     the total time (in seconds) of each stage
+  counters   the total value of each counter
+  latency    the mean, the max and some percentiles of the time per instance
+  instances  the list of the records of the instances, i.e., of the dicts
+             containing the instance name, its time and its counters
+
+or in CSV format as a table having a row for each instance and a final row
+(with instance TOTAL) containing the stages and the counters.
+
+When the schedules are computed in parallel, the time of the stages is summed
+over all the worker processes (so it can be greater than the elapsed time).
+'''
+
+import csv
+import json
+import time
+
+# Percentiles of the latency.
+PERCENTILES = [50, 90, 99]
+
+class Profile(object):
+  '''
+  Timings and counters of the prediction: stages[s] is the total time of the
+  stage s, counters[c] is the total value of the counter c and instances is the
+  list of the records of the instances, in input order.
+  '''
+
+  def __init__(self):
+    self.stages = {}
+    self.counters = {}
+    self.instances = []
+
+  def add_time(self, stage, start):
+    '''
+    Adds to stage the time elapsed from start, and returns the current time.
+    '''
+    now = time.time()
+    self.stages[stage] = self.stages.get(stage, 0.0) + now - start
+    return now
+
+  def count(self, counter, value = 1):
+    '''
+    Adds value to counter.
+    '''
+    self.counters[counter] = self.counters.get(counter, 0) + value
+
+  def add_instance(self, record):
+    '''
+    Adds the record of an instance, i.e., a dict containing its time and its
+    counters (also added to the total counters).
+    '''
+    for (counter, value) in record.items():
+      if counter != 'time':
+        self.count(counter, value)
+    self.instances.append(record)
+
+  def merge(self, profile):
+    '''
+    Adds the stages, the counters and the instances of profile to this one.
+    '''
+    for (stage, seconds) in profile.stages.items():
+      self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+    for (counter, value) in profile.counters.items():
+      self.count(counter, value)
+    self.instances += profile.instances
+
+  def get_latency(self):
+    '''
+    Returns a dict containing the mean, the max and the PERCENTILES of the time
+    per instance (empty if there are no instances).
+    '''
+    times = sorted(record['time'] for record in self.instances)
+    if not times:
+      return {}
+    latency = {
+      'mean': sum(times) / len(times),
+      'max': times[-1],
+    }
+    for p in PERCENTILES:
+      # Nearest-rank percentile.
+      latency['p' + str(p)] = times[max(0, -(-p * len(times) // 100) - 1)]
+    return latency
+
+  def write(self, path):
+    '''
+    Writes the profile in path, in CSV format if path ends with .csv and in
+    JSON format otherwise.
+    '''
+    if path.lower().endswith('.csv'):
+      self.write_csv(path)
+      return
+    with open(path, 'w') as outfile:
+      json.dump({
+        'stages': self.stages,
+        'counters': self.counters,
+        'latency': self.get_latency(),
+        'instances': self.instances,
+      }, outfile, indent = 1, sort_keys = True)
+
+  def write_csv(self, path):
+    '''
+    Writes the profile in CSV format in path.
+    '''
+    record_keys = set([])
+    for record in self.instances:
+      record_keys.update(record.keys())
+    record_keys.discard('instance')
+    total_keys = set(self.stages.keys()).union(self.counters.keys())
+    keys = ['time'] + sorted(record_keys.union(total_keys) - set(['time']))
+    writer = csv.writer(open(path, 'w'), delimiter = ',')
+    writer.writerow(['instance'] + keys)
+    for record in self.instances:
+      writer.writerow(
+        [record.get('instance', '')] + [record.get(key, '') for key in keys]
+      )
+    totals = dict(self.counters)
+    totals.update(self.stages)
+    writer.writerow(['TOTAL'] + [totals.get(key, '') for key in keys])
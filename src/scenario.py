@@ -0,0 +1,226 @@
+'''
+Helper module for loading an ASlib scenario in memory.
+
+Since the same scenario is usually loaded many times (e.g., by the training, 
+pre-processing and test phases), the parsed scenario is cached in the file 
+CACHE_FILE of the scenario folder, which is used until one of the scenario 
+files is modified.
+'''
+
+import os
+import csv
+import numpy
+import cPickle
+from arff import ArffReader
+
+# Files of the scenario, and name and version of the parsed scenario cache.
+SCENARIO_FILES = [
+  'description.txt', 'feature_values.arff', 'feature_costs.arff', 
+  'algorithm_runs.arff', 'cv.arff'
+]
+CACHE_FILE = '.scenario.cache'
+CACHE_VERSION = 2
+
+class Scenario(object):
+  '''
+  In-memory copy of the ASlib scenario contained in path. The scenario files are
+  parsed only once, when the object is created, and the missing files are set
+  to None:
+
+    path            path of the scenario (ending with '/')
+    algorithms      list of the algorithms of the scenario
+    timeout         runtime limit for the scenario
+    num_features    number of features used in the scenario
+    feature_steps   dict containing the features belonging to each step
+    feature_names   list of the features of feature_values.arff
+    feature_values  list of the data rows of feature_values.arff
+    cost_names      list of the feature steps of feature_costs.arff
+    feature_costs   list of the data rows of feature_costs.arff
+    cost_matrix     matrix (rows of feature_costs x cost_names) of the feature
+                    costs, where missing costs are NaN
+    algorithm_runs  list of the data rows of algorithm_runs.arff
+    cv              cv[i][j] is the set of the test instances of the fold j of
+                    the repetition i (see cv.arff)
+
+  The data rows are typed as in the arff module (i.e., numeric values are float
+  and missing values are None) and kept in the same order of the files, so that
+  the train and test sets can be selected without copying the scenario (see 
+  select_rows).
+  '''
+
+  def __init__(self, path, use_cache = True):
+    if path[-1] != '/':
+      path += '/'
+    key = get_cache_key(path)
+    self.path = path
+    if use_cache and self.load_cache(path + CACHE_FILE, key):
+      return
+    self.algorithms = None
+    self.timeout = None
+    self.num_features = None
+    self.feature_steps = None
+    if os.path.exists(path + 'description.txt'):
+      self.algorithms, self.timeout, self.num_features, self.feature_steps = \
+        parse_description(path)
+    self.feature_names, self.feature_values = \
+      parse_arff(path + 'feature_values.arff')
+    self.cost_names, self.feature_costs = \
+      parse_arff(path + 'feature_costs.arff')
+    self.cost_matrix = None
+    if self.feature_costs is not None:
+      self.cost_matrix = get_cost_matrix(self.feature_costs, self.cost_names)
+    self.algorithm_runs = parse_arff(path + 'algorithm_runs.arff')[1]
+    self.cv = None
+    cv_rows = parse_arff(path + 'cv.arff')[1]
+    if cv_rows is not None:
+      self.cv = {}
+      for row in cv_rows:
+        rep = int(row[1])
+        fold = int(row[2])
+        if rep not in self.cv.keys():
+          self.cv[rep] = {}
+        if fold not in self.cv[rep].keys():
+          self.cv[rep][fold] = set([])
+        self.cv[rep][fold].add(row[0])
+    if use_cache:
+      self.save_cache(path + CACHE_FILE, key)
+
+  def load_cache(self, cache_file, key):
+    '''
+    Loads the scenario from cache_file, returning False if it does not exist or
+    if it does not match key (i.e., the scenario has been modified).
+    '''
+    try:
+      with open(cache_file, 'rb') as infile:
+        cache = cPickle.load(infile)
+    except (IOError, EOFError, cPickle.UnpicklingError):
+      return False
+    if cache['key'] != key:
+      return False
+    scenario = cache['scenario']
+    # The scenario folder could have been moved.
+    scenario['path'] = self.path
+    self.__dict__.update(scenario)
+    return True
+
+  def save_cache(self, cache_file, key):
+    '''
+    Saves the scenario in cache_file. The cache is not saved if the scenario 
+    folder is not writable.
+    '''
+    # The file is renamed only when complete, so that concurrent processes never
+    # read a partial cache.
+    tmp_file = cache_file + '.' + str(os.getpid())
+    try:
+      with open(tmp_file, 'wb') as outfile:
+        cPickle.dump(
+          {'key': key, 'scenario': self.__dict__}, outfile, 
+          cPickle.HIGHEST_PROTOCOL
+        )
+      os.rename(tmp_file, cache_file)
+    except (IOError, OSError):
+      if os.path.exists(tmp_file):
+        os.remove(tmp_file)
+
+  def get_instances(self):
+    '''
+    Returns the set of the instances of the scenario.
+    '''
+    instances = set([])
+    for rows in [self.feature_values, self.feature_costs, self.algorithm_runs]:
+      if rows is not None:
+        instances.update(row[0] for row in rows)
+    return instances
+
+  def folds(self):
+    '''
+    Yields a tuple (i, j, train, test) for each fold j of each repetition i of
+    the cross validation, where train and test are the sets of the training and
+    test instances of the fold.
+    '''
+    instances = self.get_instances()
+    for i in sorted(self.cv.keys()):
+      for j in sorted(self.cv[i].keys()):
+        test = self.cv[i][j]
+        yield i, j, instances - test, test
+
+
+def select_rows(rows, instances):
+  '''
+  Returns the rows whose first column (i.e., the instance) belongs to instances,
+  or all the rows if instances is None.
+  '''
+  if instances is None:
+    return rows
+  return [row for row in rows if row[0] in instances]
+
+def get_cost_matrix(rows, cost_names):
+  '''
+  Returns the matrix (rows x cost_names) of the feature costs of the data rows
+  of feature_costs.arff, where missing costs (None) are NaN.
+  '''
+  return numpy.array(
+    [row[2:] for row in rows], dtype = numpy.float64
+  ).reshape((len(rows), len(cost_names)))
+
+def get_step_costs(costs, cost_names, feature_steps):
+  '''
+  Returns the array containing, for each row of the matrix costs (rows x 
+  cost_names), the total cost of the feature steps in feature_steps. Missing
+  costs (NaN) are not counted.
+  '''
+  columns = [j for (j, step) in enumerate(cost_names) if step in feature_steps]
+  return numpy.nansum(costs[:, columns], axis = 1)
+
+def parse_description(path):
+  '''
+  Parse the file description.txt of the scenario contained in path. It returns:
+    - the list of the algorithms of the scenario;
+    - the runtime limit for the scenario;
+    - the number of features used in the scenario.
+    - the features belonging to each step of the scenario
+  '''
+  reader = csv.reader(open(path + 'description.txt'), delimiter = ':')
+  num_features = 0
+  pfolio = []
+  feature_steps = {}
+  for row in reader:
+    key = row[0]
+    if key == 'algorithm_cutoff_time':
+      timeout = float(row[1])
+    elif key in ['algorithms_deterministic', 'algorithms_stochastic']:
+      pfolio += [x.strip() for x in row[1].split(',') if x.strip()]
+    elif key in ['features_deterministic', 'features_stochastic']:
+      num_features += len([x for x in row[1].split(',') if x.strip()])
+    elif 'feature_step ' in key:
+      step = key.split(' ')[1]
+      feature_steps[step] = [x.strip() for x in row[1].split(',') if x.strip()]
+  return pfolio, timeout, num_features, feature_steps
+
+def parse_arff(arff_file):
+  '''
+  Parse the arff file and returns the pair (attributes, rows) where attributes
+  is the list of its attributes, except instance_id and repetition, and rows is
+  the list of its (typed) data rows. If the file does not exist, returns the 
+  pair (None, None).
+  '''
+  if not os.path.exists(arff_file):
+    return None, None
+  reader = ArffReader(arff_file)
+  attributes = [
+    name for (name, t) in reader.attributes 
+    if name not in ['instance_id', 'repetition']
+  ]
+  return attributes, list(reader)
+
+def get_cache_key(path):
+  '''
+  Returns the key identifying the current version of the files of the scenario
+  in path, i.e., their size and modification time.
+  '''
+  key = [CACHE_VERSION]
+  for name in SCENARIO_FILES:
+    if os.path.exists(path + name):
+      stat = os.stat(path + name)
+      key.append((name, stat.st_size, stat.st_mtime))
+  return key
@@ -0,0 +1,176 @@
+'''
+Module for selecting the best SUNNY sub-portfolio, i.e., the one that solves
+more instances of the neighbourhood and, in case of ties, has the minimum total
+runtime on it.
+
+In the following, solved[j] is the bitmask of the neighbours solved by the j-th
+solver of the portfolio (the i-th bit is set iff the i-th neighbour is solved)
+and times[j] is its total runtime on the neighbourhood. All the search methods
+return the same pair (sub_pfolio, num_solved), where sub_pfolio is the sorted
+list of the indexes of the selected solvers and num_solved is the number of
+neighbours that they solve. The subsets of cardinality i = 1, ..., max_size are
+considered in lexicographic order, but only the first binom(max_size, i) of
+them, and the search stops as soon as a cardinality does not improve the best
+sub-portfolio found so far. If the optional argument stats is a dictionary, the
+number of subsets actually evaluated is added to stats['evaluated_subsets'].
+'''
+
+from itertools import islice
+from combinations import binom, get_subsets
+
+# Relative tolerance of the lower bounds of the branch and bound, which are not
+# computed in the same order of the actual sums.
+EPSILON = 1e-9
+
+def popcount(mask):
+  """
+  Returns the number of bits set in the (non-negative) integer mask.
+  """
+  return bin(mask).count('1')
+
+
+def brute_force(solved, times, max_size, stats = None):
+  """
+  Selects the best sub-portfolio by enumerating all the subsets.
+  """
+  max_solved = 0
+  min_time = float('+inf')
+  best_pfolio = []
+  m = max_size
+  for i in range(1, m + 1):
+    old_pfolio = best_pfolio
+    # prefix_solved[h] and prefix_time[h] are the instances solved and the
+    # total time of the first h solvers of the current subset of cardinality i.
+    prefix_solved = [0] * (i + 1)
+    prefix_time = [0] * (i + 1)
+    # Only the first binom(m, i) subsets of cardinality i are enumerated.
+    subsets = islice(get_subsets(len(solved), i), binom(m, i))
+    for (sub_pfolio, p) in subsets:
+      # Only the solvers from the p-th position onwards have changed.
+      for h in range(p, i):
+        solver = sub_pfolio[h]
+        prefix_solved[h + 1] = prefix_solved[h] | solved[solver]
+        prefix_time[h + 1] = prefix_time[h] + times[solver]
+      num_solved = popcount(prefix_solved[i])
+      solving_time = prefix_time[i]
+
+      if num_solved >  max_solved or \
+        (num_solved == max_solved and solving_time < min_time):
+          min_time = solving_time
+          max_solved = num_solved
+          best_pfolio = list(sub_pfolio)
+
+    if stats is not None:
+      stats['evaluated_subsets'] = stats.get('evaluated_subsets', 0) + \
+        min(binom(len(solved), i), binom(m, i))
+    if old_pfolio == best_pfolio:
+      break
+  return best_pfolio, max_solved
+
+
+def remove_dominated(solved, times):
+  """
+  Returns the sorted list of the indexes of the solvers not dominated by another
+  solver, i.e., by a solver that solves all the instances they solve in less
+  time (or in the same time, but coming first in the portfolio). In particular,
+  only the first one of a group of duplicate solvers is kept.
+
+  A dominated solver never belongs to the best sub-portfolio, so it can be 
+  removed before the search if all the subsets are enumerated (i.e., if 
+  max_size is the portfolio size).
+  """
+  kept = []
+  for x in range(0, len(solved)):
+    dominated = False
+    for y in range(0, len(solved)):
+      if y != x and solved[x] & ~solved[y] == 0 and \
+      (times[x] > times[y] or (times[x] == times[y] and y < x)):
+        dominated = True
+        break
+    if not dominated:
+      kept.append(x)
+  return kept
+
+
+def branch_and_bound(solved, times, max_size, stats = None):
+  """
+  Selects the best sub-portfolio with a depth-first branch and bound, which
+  visits the subsets of each cardinality in lexicographic order but prunes the
+  ones that cannot improve the best sub-portfolio found so far.
+  """
+  n = len(solved)
+  # suffix_solved[j] is the union of the instances solved by the solvers j, j +
+  # 1, ..., n - 1 and suffix_times[j][r] is the total time of the fastest r
+  # solvers among them.
+  suffix_solved = [0] * (n + 1)
+  suffix_times = [[0.0]]
+  for j in range(n - 1, -1, -1):
+    suffix_solved[j] = suffix_solved[j + 1] | solved[j]
+    bounds = [0.0]
+    for t in sorted(times[j:]):
+      bounds.append(bounds[-1] + t)
+    suffix_times.insert(0, bounds)
+
+  def visit(state, sub_pfolio, prefix_solved, prefix_time, size):
+    """
+    Visits all the subsets of cardinality size having sub_pfolio as prefix.
+    """
+    r = size - len(sub_pfolio)
+    if r == 0:
+      state['rank'] += 1
+      state['evaluated'] += 1
+      num_solved = popcount(prefix_solved)
+      if num_solved >  state['solved'] or \
+        (num_solved == state['solved'] and prefix_time < state['time']):
+          state['time'] = prefix_time
+          state['solved'] = num_solved
+          state['pfolio'] = list(sub_pfolio)
+      return
+    if sub_pfolio:
+      start = sub_pfolio[-1] + 1
+    else:
+      start = 0
+    for j in range(start, n - r + 1):
+      if state['rank'] >= state['limit']:
+        return
+      # Number of subsets of cardinality size having sub_pfolio + [j] as prefix.
+      count = binom(n - j - 1, r - 1)
+      union = prefix_solved | solved[j]
+      time = prefix_time + times[j]
+      # Upper bound of the solved instances, lower bound of the total time.
+      max_solved = popcount(union | suffix_solved[j + 1])
+      min_time = (time + suffix_times[j + 1][r - 1]) * (1 - EPSILON)
+      key = (j, r, union)
+      if max_solved < state['solved'] or \
+        (max_solved == state['solved'] and min_time >= state['time']) or \
+        (key in state['seen'] and state['seen'][key] <= time):
+          # The subsets with this prefix cannot improve the best one, or they
+          # are dominated by the ones of a (lexicographically smaller) prefix
+          # already visited, solving the same instances in less time.
+          state['rank'] += count
+          continue
+      state['seen'][key] = time
+      sub_pfolio.append(j)
+      visit(state, sub_pfolio, union, time, size)
+      sub_pfolio.pop()
+
+  state = {'solved': 0, 'time': float('+inf'), 'pfolio': [], 'evaluated': 0}
+  for i in range(1, max_size + 1):
+    old_pfolio = state['pfolio']
+    state['rank'] = 0
+    state['limit'] = binom(max_size, i)
+    state['seen'] = {}
+    visit(state, [], 0, 0, i)
+    if old_pfolio == state['pfolio']:
+      break
+  if stats is not None:
+    stats['evaluated_subsets'] = stats.get('evaluated_subsets', 0) + \
+      state['evaluated']
+  return state['pfolio'], state['solved']
+
+
+# Available search methods.
+SEARCH_METHODS = {
+  'brute-force': brute_force,
+  'bnb': branch_and_bound,
+}
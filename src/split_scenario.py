@@ -28,9 +28,9 @@ Options
 
 import os
 import sys
-import csv
 import getopt
 import shutil
+from arff import ArffReader, format_row
 
 def parse_arguments(args):
   '''
@@ -96,15 +96,8 @@ def parse_arguments(args):
 
 def main(args):
   scenario, cv_dir, random = parse_arguments(args)
-  reader = csv.reader(open(scenario + 'cv.arff'), delimiter = ',')
-  for row in reader:
-    if row and row[0].strip().upper() == '@DATA':
-      # Iterates until preamble ends.
-      break
   cv = {}
-  for row in reader:
-    if len(row) < 3:
-      continue
+  for row in ArffReader(scenario + 'cv.arff', typed = False):
     rep = row[1]
     fold = row[2]
     if rep not in cv.keys():
@@ -131,22 +124,20 @@ def main(args):
       for infile in [
         'algorithm_runs.arff', 'feature_values.arff', 'feature_costs.arff'
       ]:
-	if not os.path.exists(scenario + infile):
-	  continue
-        reader = csv.reader(open(scenario + infile), delimiter = ',')
-        writer_train = csv.writer(open(train_dir + infile, 'w'))
-        writer_test = csv.writer(open(test_dir + infile, 'w'))
-        for row in reader:
-	  writer_train.writerow(row)
-          writer_test.writerow(row)
-          if row and row[0].strip().upper() == '@DATA':
-            # Iterates until preamble ends.
-            break
+        if not os.path.exists(scenario + infile):
+          continue
+        reader = ArffReader(scenario + infile, typed = False)
+        train_file = open(train_dir + infile, 'w')
+        test_file = open(test_dir + infile, 'w')
+        train_file.writelines(reader.header)
+        test_file.writelines(reader.header)
         for row in reader:
           if row[0] in cv[i][j]:
-            writer_test.writerow(row)
+            test_file.write(format_row(row) + '\n')
           else:
-            writer_train.writerow(row)
+            train_file.write(format_row(row) + '\n')
+        train_file.close()
+        test_file.close()
 
 if __name__ == '__main__':
   main(sys.argv[1:])
\ No newline at end of file
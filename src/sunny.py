@@ -2,127 +2,115 @@
 Helper module for computing the SUNNY schedule.
 '''
 
-import csv
-import json
-from math import sqrt
-from combinations import binom, get_subset
+import time
+import numpy
+import multiprocessing
+from math import ceil, fsum
+from collections import OrderedDict
+from search import popcount, remove_dominated, SEARCH_METHODS
+from neighbours import get_neighbours
+from profiling import Profile
 
-def normalize(feat_vector, selected_features, lims, inf, sup, def_feat_value):
-  """
-  Normalizes the feature vector in input in the range [inf, sup]
-  """
-  norm_vector = []
-  for i in selected_features:
-    lb = lims[str(i)][0]
-    ub = lims[str(i)][1]
-    f = feat_vector[i]
-    if f == '?':
-      f = def_feat_value
-    else:
-      f = float(f)
-      if f < lb:
-        f = inf
-      elif f > ub:
-        f = sup
-      else:
-	if ub - lb != 0:
-          x = (f - lb) / (ub - lb)
-          f = inf + (sup - inf) * x
-        else:
-	  f = def_feat_value
-        assert inf <= f <= sup
-    norm_vector.append(f)
-  return norm_vector
-
-
-def get_neighbours(feat_vector, selected_features, kb, k):
-  """
-  Returns a dictionary (inst_name, inst_info) of the k instances closer to the 
-  feat_vector in the knowledge base kb.
-  """
-  reader = csv.reader(open(kb, 'r'), delimiter = '|')
-  infos = {}
-  distances = []
-  for row in reader:
-    inst = row[0]
-    ori_vector = map(float, row[1][1 : -1].split(','))
-    d = euclidean_distance(
-      feat_vector, [ori_vector[i] for i in selected_features]
-    )
-    distances.append((d, inst))
-    infos[inst] = row[2]
-  distances.sort(key = lambda x : x[0])
-  return dict((inst, infos[inst]) for (d, inst) in distances[0 : k])
+# Number of chunks per worker process in get_parallel_sunny_schedules.
+CHUNKS_PER_JOB = 4
+
+# Statistics of get_schedule, also recorded for each instance when profiling.
+SCHEDULE_STATS = [
+  'schedules', 'solvers', 'kept_solvers', 'subsets', 'kept_subsets',
+  'evaluated_subsets'
+]
 
+# Arguments of get_sunny_schedules inherited by the forked worker processes, 
+# and the schedule cache of the worker process.
+worker_args = None
+worker_cache = None
 
-def euclidean_distance(fv1, fv2):
+def normalize(feat_vectors, selected_features, lims, inf, sup, def_feat_value):
   """
-  Computes the Euclidean distance between two feature vectors fv1 and fv2.
+  Normalizes the feature vectors in input in the range [inf, sup], and returns 
+  the matrix having a normalized vector (of the selected_features) per row. 
+  Missing feature values are None or '?'.
   """
-  assert len(fv1) == len(fv2)
-  distance = 0.0
-  for i in range(0, len(fv1)):
-    d = fv1[i] - fv2[i]
-    distance += d * d
-  return sqrt(distance)
+  values = numpy.array([
+    [
+      float('nan') if v[i] is None or v[i] == '?' else float(v[i]) 
+      for i in selected_features
+    ]
+    for v in feat_vectors
+  ], dtype = numpy.float64).reshape((len(feat_vectors), len(selected_features)))
+  lbs = numpy.array([lims[str(i)][0] for i in selected_features], dtype = float)
+  ubs = numpy.array([lims[str(i)][1] for i in selected_features], dtype = float)
+  with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+    x = (values - lbs) / (ubs - lbs)
+    norm_vectors = inf + (sup - inf) * x
+    # The latest conditions have the priority: missing, out of range and 
+    # constant features are not scaled.
+    norm_vectors[:, ubs - lbs == 0] = def_feat_value
+    norm_vectors[values > ubs] = sup
+    norm_vectors[values < lbs] = inf
+  norm_vectors[numpy.isnan(values)] = def_feat_value
+  return norm_vectors
 
 
-def get_schedule(neighbours, timeout, portfolio, k, backup, max_size):
+def get_schedule(
+  neighbours, timeout, portfolio, k, backup, max_size, search = 'brute-force',
+  stats = None
+):
   """
-  Returns the corresponding SUNNY schedule.
+  Returns the corresponding SUNNY schedule. The neighbours matrix contains the 
+  runtimes of the solvers of portfolio (columns) on the neighbourhood (rows), 
+  while search is the name of the method used for selecting the sub-portfolio 
+  (see search.SEARCH_METHODS). If stats is a dictionary, the number of solvers 
+  and of subsets to be enumerated before and after the removal of the dominated
+  solvers, and the number of subsets evaluated by the search, are added to it.
   """
  
-  # Dictionaries for keeping track of the instances solved and the runtimes. 
-  solved = {}
-  times  = {}
-  for solver in portfolio:
-    solved[solver] = set([])
-    times[solver]  = 0.0
-  for inst, item in neighbours.items():
-    item = eval(item)
-    for solver in portfolio:
-      time = item[solver]['time']
-      if time < timeout:
-        solved[solver].add(inst)
-      times[solver] += time
+  # Lists for keeping track of the instances solved and the runtimes: the i-th 
+  # bit of solved[j] is set iff the solver portfolio[j] solves the i-th 
+  # neighbour, and times[j] is its total runtime on the neighbourhood.
+  solved = []
+  times  = []
+  for j in range(0, len(portfolio)):
+    column = neighbours[:, j].tolist()
+    mask = 0
+    for i in range(0, len(column)):
+      if column[i] < timeout:
+        mask |= 1 << i
+    solved.append(mask)
+    # fsum makes the total independent of the order of the neighbours.
+    times.append(fsum(column))
+  num_solved_by = [popcount(mask) for mask in solved]
+  # Remove the dominated solvers, unless max_size limits the enumerated subsets
+  # (in that case the positions of the solvers matter).
+  if max_size >= len(portfolio):
+    solvers = remove_dominated(solved, times)
+    m = len(solvers)
+  else:
+    solvers = range(0, len(portfolio))
+    m = max_size
+  if stats is not None:
+    stats['schedules'] = stats.get('schedules', 0) + 1
+    stats['solvers'] = stats.get('solvers', 0) + len(portfolio)
+    stats['kept_solvers'] = stats.get('kept_solvers', 0) + len(solvers)
+    stats['subsets'] = stats.get('subsets', 0) + 2 ** max_size - 1
+    stats['kept_subsets'] = stats.get('kept_subsets', 0) + 2 ** m - 1
   # Select the best sub-portfolio, i.e., the one that allows to solve more 
   # instances in the neighborhood.
-  max_solved = 0
-  min_time = float('+inf')
-  best_pfolio = []
-  m = max_size
-  for i in range(1, m + 1):
-    old_pfolio = best_pfolio
-    
-    for j in range(0, binom(m, i)):
-      solved_instances = set([])
-      solving_time = 0
-      # get the (j + 1)-th subset of cardinality i
-      sub_pfolio = get_subset(j, i, portfolio)
-      for solver in sub_pfolio:
-        solved_instances.update(solved[solver])
-        solving_time += times[solver]
-      num_solved = len(solved_instances)
-      
-      if num_solved >  max_solved or \
-        (num_solved == max_solved and solving_time < min_time):
-          min_time = solving_time
-          max_solved = num_solved
-          best_pfolio = sub_pfolio
-          
-    if old_pfolio == best_pfolio:
-      break
+  sub_pfolio, max_solved = SEARCH_METHODS[search](
+    [solved[j] for j in solvers], [times[j] for j in solvers], m, stats
+  )
+  best_pfolio = [solvers[j] for j in sub_pfolio]
     
   # n is the number of instances solved by each solver plus the instances 
   # that no solver can solver.
-  n = sum([len(solved[s]) for s in best_pfolio]) + (k - max_solved)
+  n = sum([num_solved_by[s] for s in best_pfolio]) + (k - max_solved)
   schedule = {}
   # Compute the schedule and sort it by number of solved instances.
-  for solver in best_pfolio:
-    ns = len(solved[solver])
+  for s in best_pfolio:
+    ns = num_solved_by[s]
     if ns == 0 or round(timeout / n * ns) == 0:
       continue
-    schedule[solver] = timeout / n * ns
+    schedule[portfolio[s]] = timeout / n * ns
   
   tot_time = sum(schedule.values())
   # Allocate to the backup solver the (eventual) remaining time.
@@ -131,25 +119,222 @@ def get_schedule(neighbours, timeout, portfolio, k, backup, max_size):
       schedule[backup] += timeout - tot_time
     else:
       schedule[backup]  = timeout - tot_time
-  sorted_schedule = sorted(schedule.items(), key = lambda x: times[x[0]])
+  solver_time = dict(zip(portfolio, times))
+  sorted_schedule = sorted(schedule.items(), key = lambda x: solver_time[x[0]])
   #assert sum(t for (s, t) in sorted_schedule) - timeout < 0.001
   return sorted_schedule
 
+class ScheduleCache(object):
+  """
+  LRU cache of the schedules computed by get_schedule. Since a SUNNY schedule 
+  only depends on the set of the neighbours (and not on their order), 
+  schedules are keyed by the sorted neighbours and by the other parameters of 
+  get_schedule. The number of cache hits and misses is kept in hits and misses.
+  """
+
+  def __init__(self, capacity):
+    self.capacity = capacity
+    self.hits = 0
+    self.misses = 0
+    self.schedules = OrderedDict()
+
+  def get(self, key):
+    """
+    Returns a copy of the schedule cached for key, or None if not present.
+    """
+    if key not in self.schedules:
+      self.misses += 1
+      return None
+    self.hits += 1
+    # Mark the schedule as the most recently used.
+    schedule = self.schedules.pop(key)
+    self.schedules[key] = schedule
+    return list(schedule)
+
+  def put(self, key, schedule):
+    """
+    Caches the schedule for key, evicting the least recently used schedule if 
+    the cache is full.
+    """
+    if self.capacity <= 0:
+      return
+    self.schedules[key] = list(schedule)
+    if len(self.schedules) > self.capacity:
+      self.schedules.popitem(last = False)
+
 def get_sunny_schedule(
-  lb, ub, def_feat_value, kb_path, kb_name, static_schedule, timeout, k, \
-  portfolio, backup, selected_features, feat_vector, feat_cost, max_size
+  lb, ub, def_feat_value, kb, static_schedule, timeout, k, portfolio, backup, \
+  selected_features, feat_vector, feat_cost, max_size, search = 'brute-force',
+  stats = None, cache = None, neigh_search = 'exact', profile = None
+):
+  """
+  Returns the SUNNY schedule for feat_vector, where kb is the KnowledgeBase 
+  object containing the (already loaded) knowledge base. If cache is a 
+  ScheduleCache object, the schedules of the already seen neighbourhoods are 
+  taken from it.
+  """
+  return get_sunny_schedules(
+    lb, ub, def_feat_value, kb, static_schedule, timeout, k, portfolio, backup,
+    selected_features, [feat_vector], [feat_cost], max_size, search, stats,
+    cache, neigh_search, profile
+  )[0]
+
+def get_sunny_schedules(
+  lb, ub, def_feat_value, kb, static_schedule, timeout, k, portfolio, backup, \
+  selected_features, feat_vectors, feat_costs, max_size, search = 'brute-force',
+  stats = None, cache = None, neigh_search = 'exact', profile = None
 ):
+  """
+  Returns the list of the SUNNY schedules for the feature vectors of the batch 
+  feat_vectors (in the same order), where feat_costs[i] is the feature cost of 
+  feat_vectors[i]. The batch is normalized and its neighbourhoods are computed 
+  at once, as matrix operations, according to the neigh_search method (see
+  neighbours module).
+
+  If profile is a Profile object, the time of the normalize, neighbours and 
+  schedule stages is added to it, together with a record per feature vector 
+  containing its time (i.e., the time of its schedule plus its share of the 
+  batch stages), whether its schedule was cached, the size of its schedule and
+  the SCHEDULE_STATS of get_schedule.
+  """
+  if profile is not None:
+    batch_start = start = time.time()
   selected_features = sorted(selected_features.values())
-  with open(kb_path + kb_name + '.lims') as infile:
-    lims = json.load(infile)
-  
-  norm_vector = normalize(
-    feat_vector, selected_features, lims, lb, ub, def_feat_value
+  norm_vectors = normalize(
+    feat_vectors, selected_features, kb.lims, lb, ub, def_feat_value
   )
-  kb = kb_path + kb_name + '.info'
-  neighbours = get_neighbours(norm_vector, selected_features, kb, k)
-  timeout -= feat_cost + sum(t for (s, t) in static_schedule)
-  if timeout > 0: 
-    return get_schedule(neighbours, timeout, portfolio, k, backup, max_size)
-  else:
-    return []
\ No newline at end of file
+  if profile is not None:
+    start = profile.add_time('normalize', start)
+  neighbourhoods = get_neighbours(
+    norm_vectors, selected_features, kb, k, neigh_search
+  )
+  if profile is not None:
+    start = profile.add_time('neighbours', start)
+    shared_time = (start - batch_start) / max(1, len(feat_vectors))
+  static_time = sum(t for (s, t) in static_schedule)
+  schedules = []
+  for i in range(0, len(neighbourhoods)):
+    neighbours = neighbourhoods[i]
+    time_left = timeout - (feat_costs[i] + static_time)
+    schedule = []
+    cached = False
+    # When profiling, the statistics of each instance are kept apart.
+    inst_stats = {} if profile is not None else stats
+    if time_left > 0:
+      if cache is not None:
+        key = (
+          tuple(sorted(neighbours)), time_left, tuple(portfolio), backup, k,
+          max_size
+        )
+        schedule = cache.get(key)
+        cached = schedule is not None
+      if not cached:
+        runtimes = kb.get_runtimes(neighbours, portfolio)
+        schedule = get_schedule(
+          runtimes, time_left, portfolio, k, backup, max_size, search, 
+          inst_stats
+        )
+        if cache is not None:
+          cache.put(key, schedule)
+    schedules.append(schedule)
+    if profile is not None:
+      end = profile.add_time('schedule', start)
+      record = dict.fromkeys(SCHEDULE_STATS, 0)
+      record.update(inst_stats)
+      record['time'] = end - start + shared_time
+      record['cached'] = int(cached)
+      record['schedule_size'] = len(schedule)
+      profile.add_instance(record)
+      if stats is not None:
+        for (name, value) in inst_stats.items():
+          stats[name] = stats.get(name, 0) + value
+      start = end
+  return schedules
+
+
+def get_parallel_sunny_schedules(
+  lb, ub, def_feat_value, kb, static_schedule, timeout, k, portfolio, backup, \
+  selected_features, feat_vectors, feat_costs, max_size, search = 'brute-force',
+  stats = None, cache = None, jobs = 1, neigh_search = 'exact', profile = None
+):
+  """
+  Same as get_sunny_schedules, but the batch is split into chunks which are 
+  scheduled by jobs worker processes. The workers are forked, so they share the
+  knowledge base kb with this process (copy-on-write, or memory-mapped if kb 
+  comes from a binary file). Every worker keeps its own cache with the capacity
+  of cache, and the statistics and the cache hits/misses of all the workers are
+  summed into stats and cache. Similarly, the profiles of the workers (if any)
+  are merged into profile, in input order.
+  """
+  global worker_args
+  if jobs <= 1 or len(feat_vectors) <= 1:
+    return get_sunny_schedules(
+      lb, ub, def_feat_value, kb, static_schedule, timeout, k, portfolio, 
+      backup, selected_features, feat_vectors, feat_costs, max_size, search,
+      stats, cache, neigh_search, profile
+    )
+  n = len(feat_vectors)
+  size = int(ceil(n / float(jobs * CHUNKS_PER_JOB)))
+  chunks = [(i, min(i + size, n)) for i in range(0, n, size)]
+  worker_args = (
+    lb, ub, def_feat_value, kb, static_schedule, timeout, k, portfolio, backup,
+    selected_features, feat_vectors, feat_costs, max_size, search, 
+    stats is not None, cache.capacity if cache is not None else None,
+    neigh_search, profile is not None
+  )
+  # The neighbours search index (if any) is built before forking the workers,
+  # so that they share it.
+  if profile is not None:
+    start = time.time()
+  get_neighbours([], sorted(selected_features.values()), kb, k, neigh_search)
+  if profile is not None:
+    profile.add_time('index', start)
+  pool = multiprocessing.Pool(min(jobs, len(chunks)))
+  try:
+    # The chunks are returned in input order.
+    results = pool.map(schedule_chunk, chunks, 1)
+  finally:
+    pool.close()
+    pool.join()
+    worker_args = None
+  schedules = []
+  for (chunk_schedules, chunk_stats, hits, misses, chunk_profile) in results:
+    schedules += chunk_schedules
+    if profile is not None:
+      profile.merge(chunk_profile)
+    if stats is not None:
+      for (key, value) in chunk_stats.items():
+        stats[key] = stats.get(key, 0) + value
+    if cache is not None:
+      cache.hits += hits
+      cache.misses += misses
+  return schedules
+
+def schedule_chunk(chunk):
+  """
+  Worker of get_parallel_sunny_schedules: returns the schedules of the feature
+  vectors of worker_args in the range chunk, the corresponding statistics, the 
+  cache hits and misses and the profile (None if not profiling).
+  """
+  global worker_cache
+  lb, ub, def_feat_value, kb, static_schedule, timeout, k, portfolio, backup, \
+    selected_features, feat_vectors, feat_costs, max_size, search, use_stats, \
+      cache_size, neigh_search, use_profile = worker_args
+  if worker_cache is None and cache_size is not None:
+    worker_cache = ScheduleCache(cache_size)
+  stats = {} if use_stats else None
+  profile = Profile() if use_profile else None
+  hits = misses = 0
+  if worker_cache is not None:
+    hits = worker_cache.hits
+    misses = worker_cache.misses
+  (start, end) = chunk
+  schedules = get_sunny_schedules(
+    lb, ub, def_feat_value, kb, static_schedule, timeout, k, portfolio, backup,
+    selected_features, feat_vectors[start : end], feat_costs[start : end], 
+    max_size, search, stats, worker_cache, neigh_search, profile
+  )
+  if worker_cache is not None:
+    hits = worker_cache.hits - hits
+    misses = worker_cache.misses - misses
+  return schedules, stats, hits, misses, profile
@@ -0,0 +1,251 @@
+#! /usr/bin/env python
+
+'''
+sunny_server [OPTIONS] <KB_DIR> [<KB_DIR> ...]
+
+Starts a SUNNY prediction server. The knowledge bases in <KB_DIR> are loaded
+only once, at startup, and then the server reads the prediction requests from
+standard input (or from a local socket, see --socket option). Each request is
+a JSON object on a single line:
+
+  {"kb": <KB>, "instance": <ID>, "features": [f_1, ..., f_n], "cost": <COST>}
+
+where <KB> is the name of the knowledge base to be used (i.e., the name of the
+folder <KB_DIR>, it can be omitted if only one knowledge base is loaded), <ID>
+is the instance name, f_1, ..., f_n are the (not normalized) feature values of
+the instance, "?" or null for missing features, and <COST> is the feature
+extraction cost (0 by default). For each request, a JSON object is written on
+a single line:
+
+  {"instance": <ID>, "schedule": [<ROW_1>, ..., <ROW_k>]}
+
+where each <ROW_i> is in the AS standard form instanceID,runID,solver,timeLimit
+or {"error": <MESSAGE>} if the request is not valid (i.e., <ID> is not a string,
+the features are not numbers, "?" or null, or <COST> is not a non-negative
+number) or if its prediction fails. In any case, the server keeps answering the
+following requests.
+
+Options
+=======
+  --socket <PATH>
+   Listens on the Unix domain socket <PATH> instead of reading standard input.
+   Each connection can send any number of requests, and the connections are
+   served concurrently (each one by its own thread).
+  --search <METHOD>
+   Method used for selecting the best sub-portfolio ("brute-force" or "bnb").
+   By default, it is set to brute-force.
+  --neighbours <METHOD>
+   Method used for searching the neighbours: "exact" or "lsh" (approximate, 
+   see neighbours module for its parameters). By default, it is set to exact.
+  --cache <SIZE>
+   Maximum number of schedules kept in the cache of each knowledge base, 0
+   disables the cache. By default, it is set to 1024.
+  --print-static
+   Prints also the static schedule before the dynamic one computed by SUNNY.
+   This options is unset by default.
+  --help
+   Prints this message.
+'''
+
+import os
+import sys
+import json
+import getopt
+import threading
+import SocketServer
+from sunny import get_sunny_schedule, ScheduleCache
+from search import SEARCH_METHODS
+from neighbours import get_neighbours, parse_method
+from knowledge_base import KnowledgeBase
+
+def parse_arguments(args):
+  '''
+  Parse the options specified by the user and returns the corresponding
+  arguments properly set.
+  '''
+  try:
+    long_options = [
+      'help', 'socket=', 'search=', 'neighbours=', 'cache=', 'print-static'
+    ]
+    opts, args = getopt.getopt(args, None, long_options)
+  except getopt.GetoptError as msg:
+    print >> sys.stderr, msg
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  if not args:
+    if not opts:
+      print >> sys.stderr, 'Error! No arguments given.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    else:
+      print __doc__
+      sys.exit(0)
+
+  # Initialize variables with default values.
+  socket_path = None
+  search = 'brute-force'
+  neigh_search = 'exact'
+  cache_size = 1024
+  print_static = False
+
+  # Options parsing.
+  for o, a in opts:
+    if o == '--help':
+      print __doc__
+      sys.exit(0)
+    elif o == '--socket':
+      socket_path = a
+    elif o == '--search':
+      if a not in SEARCH_METHODS.keys():
+        print >> sys.stderr, 'Error! Unknown search method ' + a
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      search = a
+    elif o == '--neighbours':
+      try:
+        parse_method(a)
+      except ValueError as msg:
+        print >> sys.stderr, 'Error! ' + str(msg)
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      neigh_search = a
+    elif o == '--cache':
+      cache_size = int(a)
+    elif o == '--print-static':
+      print_static = True
+
+  kbs = {}
+  for kb_path in args:
+    if kb_path[-1] != '/':
+      kb_path += '/'
+    kb_name = kb_path.split('/')[-2]
+    if not os.path.exists(kb_path + kb_name + '.args'):
+      print >> sys.stderr, 'Error: ' + kb_path + ' is not a knowledge base.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+    kb = KnowledgeBase(kb_path, kb_name)
+    # The neighbours search index (if any) is built at startup.
+    get_neighbours(
+      [], sorted(kb.args['selected_features'].values()), kb, 
+      kb.args['neigh_size'], neigh_search
+    )
+    kbs[kb_name] = (kb, LockedScheduleCache(cache_size))
+
+  return kbs, socket_path, search, neigh_search, print_static
+
+class LockedScheduleCache(ScheduleCache):
+  '''
+  Schedule cache shared by the threads serving the connections.
+  '''
+
+  def __init__(self, capacity):
+    ScheduleCache.__init__(self, capacity)
+    self.lock = threading.Lock()
+
+  def get(self, key):
+    with self.lock:
+      return ScheduleCache.get(self, key)
+
+  def put(self, key, schedule):
+    with self.lock:
+      ScheduleCache.put(self, key, schedule)
+
+class ThreadingUnixStreamServer(
+  SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer
+):
+  '''
+  Unix stream server handling each connection in a new thread, so that an idle
+  client does not block the other ones.
+  '''
+  daemon_threads = True
+
+def predict(kbs, request, search, neigh_search, print_static):
+  '''
+  Returns the response (a dictionary) to the request (a JSON string).
+  '''
+  try:
+    request = json.loads(request)
+    if 'kb' in request:
+      kb, cache = kbs[request['kb']]
+    elif len(kbs) == 1:
+      kb, cache = kbs.values()[0]
+    else:
+      return {'error': 'No knowledge base specified'}
+    inst = request['instance']
+    feat_vector = list(request['features'])
+    feat_cost = request.get('cost', 0)
+  except (ValueError, KeyError, TypeError) as e:
+    return {'error': 'Invalid request: ' + repr(e)}
+  if not isinstance(inst, basestring):
+    return {'error': 'Invalid request: the instance must be a string'}
+  if not all(v is None or v == '?' or is_number(v) for v in feat_vector):
+    return {'error': 'Invalid request: the features must be numbers or "?"'}
+  if not is_number(feat_cost) or feat_cost < 0:
+    return {'error': 'Invalid request: the cost must be a non-negative number'}
+
+  args = kb.args
+  if len(feat_vector) <= max([-1] + args['selected_features'].values()):
+    return {'error': 'Invalid request: too few features'}
+  static_schedule = args['static_schedule']
+  schedule = get_sunny_schedule(
+    args['lb'], args['ub'], args['feat_def'], kb, static_schedule,
+    args['timeout'], args['neigh_size'], args['portfolio'], args['backup'],
+    args['selected_features'], feat_vector, feat_cost, 
+    args.get('max_size', len(args['portfolio'])), search, None, cache, 
+    neigh_search
+  )
+  i = 1
+  if print_static:
+    schedule = static_schedule + schedule
+    i = 0
+  rows = []
+  for (s, t) in schedule:
+    rows.append(inst + ',' + str(i) + ',' + s + ',' + str(t))
+    i += 1
+  return {'instance': inst, 'schedule': rows}
+
+def is_number(value):
+  '''
+  Returns True if value (a decoded JSON value) is a number.
+  '''
+  return isinstance(value, (int, long, float)) and not isinstance(value, bool)
+
+def serve(kbs, infile, outfile, search, neigh_search, print_static):
+  '''
+  Answers all the requests read from infile, writing the responses on outfile.
+  The errors of a request are answered, without stopping the server.
+  '''
+  for line in iter(infile.readline, ''):
+    if not line.strip():
+      continue
+    try:
+      response = predict(kbs, line, search, neigh_search, print_static)
+    except Exception as e:
+      response = {'error': 'Prediction failed: ' + repr(e)}
+    outfile.write(json.dumps(response) + '\n')
+    outfile.flush()
+
+def main(args):
+  kbs, socket_path, search, neigh_search, print_static = parse_arguments(args)
+  if not socket_path:
+    serve(kbs, sys.stdin, sys.stdout, search, neigh_search, print_static)
+    return
+
+  class RequestHandler(SocketServer.StreamRequestHandler):
+    def handle(self):
+      serve(kbs, self.rfile, self.wfile, search, neigh_search, print_static)
+
+  if os.path.exists(socket_path):
+    os.remove(socket_path)
+  server = ThreadingUnixStreamServer(socket_path, RequestHandler)
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    os.remove(socket_path)
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
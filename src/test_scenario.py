@@ -21,7 +21,7 @@ Options
    meaning that solver s_i has to run for t_i seconds. By default it is empty.
   -k <NEIGH.SIZE>
    The neighbourhood size of SUNNY algorithm. By default, it is set to sqrt(n) 
-   where n is the size of the knowledge base.
+   where n is the size of the knowledge base (or to the one set by tune_kb).
   -P <s_1,...,s_k>
    The portfolio used by SUNNY. By default, it contains all the algorithms of 
    the scenario.
@@ -37,19 +37,55 @@ Options
    Specifies the features to be used for solvers prediction. By default, all the 
    features resulting from the training phase (possibly pre-processed) are used.
   -m <MAX-SIZE>
-   Maximum sub-portfolio size. By default, it is set to the portfolio size.
+   Maximum sub-portfolio size. By default, it is set to the portfolio size (or
+   to the one set by tune_kb).
+  --search <METHOD>
+   Method used for selecting the best sub-portfolio: "brute-force" enumerates 
+   all the subsets, while "bnb" performs a branch and bound (suggested for big 
+   portfolios). Both the methods return the same schedules. By default, it is 
+   set to brute-force.
+  --neighbours <METHOD>
+   Method used for searching the neighbours: "exact" finds the exact SUNNY 
+   neighbourhoods, while "lsh[:<TABLES>[,<HASHES>]]" performs an approximate
+   search with Locality-Sensitive Hashing, which is faster for big knowledge 
+   bases (see neighbours module). By default, it is set to exact.
   --print-static
    Prints also the static schedule before the dynamic one computed by SUNNY.
    This options is unset by default.
+  --stats
+   Prints on standard error some statistics about the computed schedules, e.g., 
+   how much the removal of the dominated solvers reduces the search space. 
+   This options is unset by default.
+  --cache <SIZE>
+   Maximum number of schedules kept in the cache of the already computed 
+   neighbourhoods, 0 disables the cache. By default, it is set to 1024.
+  --jobs <N>
+   Number of worker processes used for computing the schedules. The instances
+   are split into chunks, and the schedules are printed in the same order of 
+   the sequential mode. By default, it is set to 1.
+  --profile <FILE>
+   Writes to <FILE> the time spent in each stage of the prediction (loading of
+   the knowledge base, parsing of the scenario, feature costs, normalization,
+   neighbours search, schedules and output) and some counters (e.g., the cache 
+   hits and the evaluated subsets), both in total and for each instance. The 
+   profile is written in CSV format if <FILE> ends with .csv, and in JSON 
+   format otherwise (see profiling module). By default, nothing is profiled.
   --help
    Prints this message.
 '''
 
 import os
+import csv
 import sys
 import json
+import time
 import getopt
 from sunny import *
+from search import SEARCH_METHODS
+from neighbours import parse_method
+from profiling import Profile
+from knowledge_base import KnowledgeBase
+from scenario import Scenario, select_rows, get_step_costs
 
 def parse_arguments(args):
   '''
@@ -57,7 +93,8 @@ def parse_arguments(args):
   arguments properly set.
   '''
   try:
-    long_options = ['help', 'print-static']
+    long_options = ['help', 'print-static', 'search=', 'stats', 'cache=', 
+                    'jobs=', 'neighbours=', 'profile=']
     opts, args = getopt.getopt(args, 'K:s:k:P:b:T:o:h:f:m:', long_options)
   except getopt.GetoptError as msg:
     print >> sys.stderr, msg
@@ -102,11 +139,19 @@ def parse_arguments(args):
     print >> sys.stderr, 'Error: ' + args_file + ' does not exists.'
     print >> sys.stderr, 'For help use --help'
     sys.exit(2)
-  with open(args_file, 'r') as infile:
-    args = json.load(infile)
+  # The knowledge base is loaded only once, and shared by all the instances.
+  start = time.time()
+  kb = KnowledgeBase(kb_path, kb_name)
+  kb_load_time = time.time() - start
+  args = kb.args
   out_file = None
   new_features = None
   print_static = False
+  stats = None
+  cache_size = 1024
+  jobs = 1
+  profile = None
+  profile_file = None
   
   lb = args['lb']
   ub = args['ub']
@@ -119,7 +164,9 @@ def parse_arguments(args):
   static_schedule = args['static_schedule']
   selected_features = args['selected_features']
 
-  max_size = len(portfolio)
+  max_size = args.get('max_size', len(portfolio))
+  search = 'brute-force'
+  neigh_search = 'exact'
   
   # Options parsing.
   for o, a in opts:
@@ -131,12 +178,12 @@ def parse_arguments(args):
       static_schedule = []
       for i in range(0, len(s) / 2):
         solver = s[2 * i]
-        time = float(s[2 * i + 1])
-        if time < 0:
+        solver_time = float(s[2 * i + 1])
+        if solver_time < 0:
           print >> sys.stderr, 'Error! Not acceptable negative time'
           print >> sys.stderr, 'For help use --help'
           sys.exit(2)
-        static_schedule.append((solver, time))
+        static_schedule.append((solver, solver_time))
     elif o == '-k':
       k = int(a)
     elif o == '-P':
@@ -157,6 +204,34 @@ def parse_arguments(args):
         sys.exit(2)
     elif o == '--print-static':
       print_static = True
+    elif o == '--search':
+      if a not in SEARCH_METHODS.keys():
+        print >> sys.stderr, 'Error! Unknown search method ' + a
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      search = a
+    elif o == '--neighbours':
+      try:
+        parse_method(a)
+      except ValueError as msg:
+        print >> sys.stderr, 'Error! ' + str(msg)
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      neigh_search = a
+    elif o == '--stats':
+      stats = {}
+    elif o == '--cache':
+      cache_size = int(a)
+    elif o == '--jobs':
+      jobs = int(a)
+      if jobs < 1:
+        print >> sys.stderr, 'Error! Not acceptable number of jobs'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+    elif o == '--profile':
+      profile = Profile()
+      profile.stages['kb_load'] = kb_load_time
+      profile_file = a
         
   if new_features:
     selected_features = dict(
@@ -170,79 +245,136 @@ def parse_arguments(args):
       if set(features).intersection(new_features)
     )
     
-    args_file = kb_path + kb_name + '.args'
-    with open(args_file, 'r') as infile:
-      args = json.load(infile)
-    infile.close()
     args['selected_features'] = selected_features
     args['feature_steps'] = feature_steps
     with open(args_file, 'w') as outfile:
       json.dump(args, outfile)
 
-  return k, lb, ub, feat_def, kb_path, kb_name, static_schedule, timeout,      \
-    portfolio, backup, out_file, scenario, print_static, selected_features,    \
-      feature_steps, max_size
+  return k, lb, ub, feat_def, kb, static_schedule, timeout, portfolio, backup, \
+    out_file, scenario, print_static, selected_features, feature_steps,        \
+      max_size, search, stats, ScheduleCache(cache_size), jobs, neigh_search, \
+        profile, profile_file
   
+def get_feature_costs(scenario, feature_steps):
+  '''
+  Returns a dict containing, for each instance of the scenario (a Scenario 
+  object), the cost of the feature steps in feature_steps. If the scenario has
+  no feature costs, the dict is empty.
+  '''
+  if scenario.feature_costs is None:
+    return {}
+  costs = get_step_costs(
+    scenario.cost_matrix, scenario.cost_names, feature_steps
+  ).tolist()
+  return dict(
+    (row[0], cost) for (row, cost) in zip(scenario.feature_costs, costs)
+  )
+
 def main(args):
-  k, lb, ub, feat_def, kb_path, kb_name, static_schedule, timeout, portfolio,  \
-    backup, out_file, scenario, print_static, selected_features, feature_steps,\
-      max_size = parse_arguments(args)
-  
-  cost_file = scenario + 'feature_costs.arff'
-  feature_costs = {}
-  if os.path.exists(cost_file):
-    reader = csv.reader(open(cost_file), delimiter = ',')
-    for row in reader:
-      steps = set([])
-      i = 2
-      if row and '@ATTRIBUTE' in row[0].strip().upper()  \
-      and 'instance_id' not in row[0] and 'repetition' not in row[0]:
-	if row[0].strip().split(' ')[1] in feature_steps.keys():
-	  steps.add(i)
-	i += 1
-      elif row and row[0].strip().upper() == '@DATA':
-	# Iterates until preamble ends.
-	break
-    for row in reader:
-      feature_costs[row[0]] = 0
-      for i in steps:
-	if row[i] != '?':
-	  feature_costs[row[0]] += float(row[i])
+  k, lb, ub, feat_def, kb, static_schedule, timeout, portfolio, backup,        \
+    out_file, scenario, print_static, selected_features, feature_steps,        \
+      max_size, search, stats, cache, jobs, neigh_search, profile,             \
+        profile_file = parse_arguments(args)
   
-  reader = csv.reader(open(scenario + 'feature_values.arff'), delimiter = ',')
-  for row in reader:
-    if row and row[0].strip().upper() == '@DATA':
-      # Iterates until preamble ends.
-      break
+  start = time.time()
+  scenario = Scenario(scenario)
+  if profile is not None:
+    start = profile.add_time('parse', start)
+  # Get the schedules computed by SUNNY algorithm for the whole scenario.
+  instances, schedules = test(
+    scenario, None, lb, ub, feat_def, kb, static_schedule, timeout, k, 
+    portfolio, backup, selected_features, feature_steps, max_size, search, 
+    stats, cache, jobs, neigh_search, profile
+  )
+  if profile is not None:
+    start = time.time()
+  rows = get_rows(instances, schedules, static_schedule, print_static)
+
   header = 'instanceID,runID,solver,timeLimit'
   if out_file:
     writer = csv.writer(open(out_file, 'w'), delimiter = ',')
     writer.writerow(header.split(','))
+    writer.writerows(rows)
   else:
     print header
-  for row in reader:
-    inst = row[0]
-    feat_vector = row[2:]
-    if feature_costs:
-      feat_cost = feature_costs[inst]
-    else:
-      feat_cost = 0
-    # Get the schedule computed by SUNNY algorithm.
-    schedule = get_sunny_schedule(
-      lb, ub, feat_def, kb_path, kb_name, static_schedule, timeout, k, \
-      portfolio, backup, selected_features, feat_vector, feat_cost, max_size
-    )
+    for row in rows:
+      print ','.join(row)
+  if stats is not None:
+    print_stats(stats, cache)
+  if profile is not None:
+    profile.add_time('output', start)
+    profile.write(profile_file)
+
+def test(
+  scenario, instances, lb, ub, feat_def, kb, static_schedule, timeout, k, 
+  portfolio, backup, selected_features, feature_steps, max_size, search, stats,
+  cache, jobs, neigh_search = 'exact', profile = None, feature_costs = None
+):
+  '''
+  Returns the pair (test_instances, schedules) where test_instances is the list 
+  of the test instances of the scenario (a Scenario object) belonging to 
+  instances, or all the instances of the scenario if instances is None, and 
+  schedules is the list of the corresponding SUNNY schedules. If profile is a
+  Profile object, the stages of the prediction are profiled in it. The dict
+  feature_costs (see get_feature_costs) is computed if not given.
+  '''
+  start = time.time()
+  if feature_costs is None:
+    feature_costs = get_feature_costs(scenario, feature_steps)
+  if profile is not None:
+    start = profile.add_time('feature_costs', start)
+    first_record = len(profile.instances)
+  test_instances = []
+  feat_vectors = []
+  feat_costs = []
+  for row in select_rows(scenario.feature_values, instances):
+    test_instances.append(row[0])
+    feat_vectors.append(row[2:])
+    feat_costs.append(feature_costs.get(row[0], 0))
+  schedules = get_parallel_sunny_schedules(
+    lb, ub, feat_def, kb, static_schedule, timeout, k, portfolio, backup, \
+    selected_features, feat_vectors, feat_costs, max_size, search, stats,
+    cache, jobs, neigh_search, profile
+  )
+  if profile is not None:
+    profile.add_time('predict', start)
+    for (record, inst) in zip(profile.instances[first_record:], test_instances):
+      record['instance'] = inst
+  return test_instances, schedules
+
+def get_rows(instances, schedules, static_schedule, print_static):
+  '''
+  Returns the list of the rows [instanceID, runID, solver, timeLimit] of the 
+  schedules of the instances (preceded by the static schedule if print_static 
+  is set).
+  '''
+  rows = []
+  for (inst, schedule) in zip(instances, schedules):
     i = 1
     if print_static:
       schedule = static_schedule + schedule
       i = 0
     for (s, t) in schedule:
-      row = inst + ',' + str(i) + ',' + s + ',' + str(t)
-      if out_file:
-        writer.writerow(row.split(','))
-      else:
-        print row
+      rows.append([inst, str(i), s, str(t)])
       i += 1
+  return rows
+
+def print_stats(stats, cache):
+  '''
+  Prints on standard error the statistics collected by get_sunny_schedules.
+  '''
+  print >> sys.stderr, 'Cache hits:', cache.hits, 'misses:', cache.misses
+  n = stats.get('schedules', 0)
+  if not n:
+    return
+  print >> sys.stderr, 'Computed schedules (not cached):', n
+  print >> sys.stderr, 'Avg. portfolio size:', stats['solvers'] / float(n), \
+    '(' + str(stats['kept_solvers'] / float(n)), 'after dominance removal)'
+  print >> sys.stderr, 'Avg. search space:', stats['subsets'] / float(n), \
+    'subsets (' + str(stats['kept_subsets'] / float(n)),                    \
+      'after dominance removal)'
+  print >> sys.stderr, 'Avg. evaluated subsets:', \
+    stats.get('evaluated_subsets', 0) / float(n)
       
 if __name__ == '__main__':
   main(sys.argv[1:])
\ No newline at end of file
@@ -4,14 +4,30 @@
 train_scenario [OPTIONS] <SCENARIO_PATH>
 
 Creates a SUNNY knowledge base corresponding to the ASlib scenario contained in 
-<SCENARIO_PATH>. A knowledge base <KB> is basically a folder containing 3 files:
+<SCENARIO_PATH>. A knowledge base <KB> is basically a folder containing 4 files:
 
-  <KB>.infos  csv file containing the runtimes and the feature vectors 
+  <KB>.info   csv file containing the feature vectors of the instances
+  
+  <KB>.runs   binary NumPy (npz) file containing the solvers, the matrix of the
+              runtimes (where the failed runs take the timeout), the bitmap of
+              the successful runs and the matrix of the actual runtimes of the
+              instances (in the same order of <KB>.info)
   
   <KB>.lims   python dict containing the lower/upper bounds for each feature
   
+  <KB>.bin    binary copy of the three files above, which is memory-mapped by 
+              the SUNNY prediction (see knowledge_base module), together with
+              the unscaled features, the feature costs and the information 
+              needed for updating the knowledge base with new instances (see 
+              update_kb)
+  
   <KB>.args   python dict containing the arguments needed by SUNNY algorithm
 
+and possibly the file <KB>.tree, i.e., the k-d tree of the selected features 
+used for searching the neighbours of big knowledge bases (see kd_tree module),
+and the file <KB>.loo, i.e., the leave-one-out neighbours of the instances 
+computed by tune_kb.
+
 
 Options
 =======
@@ -41,8 +57,12 @@ import os
 import csv
 import sys
 import json
+import numpy
 import getopt
-from math import isnan, sqrt
+from math import sqrt
+from kd_tree import write_tree
+from knowledge_base import write_binary_kb
+from scenario import Scenario, select_rows, get_cost_matrix
 
 def parse_arguments(args):
   '''
@@ -116,36 +136,27 @@ def parse_arguments(args):
   return scenario, lb, ub, feat_def, feat_timeout, discard, kb_path, kb_name
 
 
-def parse_description(path):
-  '''
-  Parse the file description.txt of the scenario contained in path. It returns:
-    - the list of the algorithms of the scenario;
-    - the runtime limit for the scenario;
-    - the number of features used in the scenario.
-    - the features belonging to each step of the scenario
-  '''
-  reader = csv.reader(open(path + 'description.txt'), delimiter = ':')
-  num_features = 0
-  pfolio = []
-  feature_steps = {}
-  for row in reader:
-    key = row[0]
-    if key == 'algorithm_cutoff_time':
-      timeout = float(row[1])
-    elif key in ['algorithms_deterministic', 'algorithms_stochastic']:
-      pfolio += [x.strip() for x in row[1].split(',') if x.strip()]
-    elif key in ['features_deterministic', 'features_stochastic']:
-      num_features += len([x for x in row[1].split(',') if x.strip()])
-    elif 'feature_step ' in key:
-      step = key.split(' ')[1]
-      feature_steps[step] = [x.strip() for x in row[1].split(',') if x.strip()]
-  return pfolio, timeout, num_features, feature_steps
-
 def main(args):
   # Setting variables.
   scenario, lb, ub, feat_def, feat_timeout, discard, kb_path, kb_name = \
     parse_arguments(args)
-  pfolio, timeout, num_features, feature_steps = parse_description(scenario)
+  train(
+    Scenario(scenario), None, lb, ub, feat_def, feat_timeout, discard, kb_path, 
+    kb_name
+  )
+
+def train(
+  scenario, instances, lb, ub, feat_def, feat_timeout, discard, kb_path, kb_name
+):
+  '''
+  Creates the SUNNY knowledge base kb_path/kb_name of the scenario (a Scenario
+  object) by only using the training instances in instances, or all the 
+  instances of the scenario if instances is None.
+  '''
+  pfolio = scenario.algorithms
+  timeout = scenario.timeout
+  num_features = scenario.num_features
+  feature_steps = dict(scenario.feature_steps)
   if feat_timeout < 0:
     feat_timeout = timeout / 2
   kb_dir = kb_path + '/' + kb_name + '/'
@@ -154,126 +165,119 @@ def main(args):
   else:
     print >> sys.stderr, 'Warning! Directory ' + kb_dir + ' already exists.'
 
-  # Creating <KB>.info
-  writer = csv.writer(open(kb_dir  + kb_name + '.info', 'w'), delimiter = '|')
-  # Processing runtimes.
-  reader = csv.reader(open(scenario + 'algorithm_runs.arff'), delimiter = ',')
-  for row in reader:
-    if row and row[0].strip().upper() == '@DATA':
-      # Iterates until preamble ends.
-      break
-  kb = {}
-  solved = dict((s, [0, 0.0]) for s in pfolio)
-  for row in reader:
-    inst   = row[0]
-    solver = row[2]
-    info   = row[4]
-    if info != 'ok':
-      time = timeout
-    else:
-      time = float(row[3])
-      solved[solver][0] += 1
-    solved[solver][1] += time
-    
-    if inst not in kb.keys():
-      kb[inst] = {}
-    kb[inst][solver] = {'info': info, 'time': time}
-  # Backup solver.
-  backup = min((-solved[s][0], solved[s][1], s) for s in solved.keys())[2]
+  # Processing runtimes. Each run is a column entry: run_instances[r] is the
+  # instance of the r-th run, and so on.
+  runs = select_rows(scenario.algorithm_runs, instances)
+  solver_index = dict((s, j) for (j, s) in enumerate(pfolio))
+  run_solvers = numpy.array([solver_index[row[2]] for row in runs], dtype = int)
+  run_ok = numpy.array([row[4] == 'ok' for row in runs], dtype = bool)
+  raw_times = numpy.array([row[3] for row in runs], dtype = numpy.float64)
+  run_times = numpy.where(run_ok, raw_times, timeout)
+  run_names, run_instances = numpy.unique(
+    numpy.array([row[0] for row in runs], dtype = object), return_inverse = True
+  )
+  # Backup solver. The weighted bincount sums the times in the order of the runs,
+  # like a sequential sum.
+  num_solved = numpy.bincount(run_solvers[run_ok], minlength = len(pfolio))
+  total_time = numpy.bincount(
+    run_solvers, weights = run_times, minlength = len(pfolio)
+  )
+  backup = min(
+    (-num_solved[j], total_time[j], pfolio[j]) for j in range(0, len(pfolio))
+  )[2]
+  # Runtimes and status of the runs of each instance (the last one for each 
+  # solver, if repeated). An additional row is used for instances with no runs.
+  num_runs = len(run_names)
+  last = run_instances * len(pfolio) + run_solvers
+  last = len(last) - 1 - numpy.unique(last[::-1], return_index = True)[1]
+  all_runtimes = numpy.empty((num_runs + 1, len(pfolio)))
+  all_runtimes.fill(numpy.nan)
+  all_runtimes[run_instances[last], run_solvers[last]] = run_times[last]
+  all_status = numpy.zeros((num_runs + 1, len(pfolio)), dtype = bool)
+  all_status[run_instances[last], run_solvers[last]] = run_ok[last]
+  all_raw_runtimes = numpy.empty((num_runs + 1, len(pfolio)))
+  all_raw_runtimes.fill(numpy.nan)
+  all_raw_runtimes[run_instances[last], run_solvers[last]] = raw_times[last]
+  run_index = dict((inst, i) for (i, inst) in enumerate(run_names))
   
   # Processing features.
-  cost_file = scenario + 'feature_costs.arff'
-  if os.path.exists(cost_file):
-    reader = csv.reader(open(scenario + 'feature_costs.arff'), delimiter = ',')
-    i = 0
+  if scenario.feature_costs is not None:
     # fn[i] is the name of the i-th feature step.
-    fn = {}
-    for row in reader:
-      if row and '@ATTRIBUTE' in row[0].strip().upper()  \
-      and 'instance_id' not in row[0] and 'repetition' not in row[0]:
-	fn[i] = row[0].strip().split(' ')[1]
-	i += 1
-      elif row and row[0].strip().upper() == '@DATA':
-	# Iterates until preamble ends.
-	break
-    for row in reader:
-      i = 0
-      for cost in row[2:]:
-	if cost != '?' and float(cost) > feat_timeout and \
-	fn[i] in feature_steps.keys():
-	  del feature_steps[fn[i]]
-	i += 1
-    selected_features = []
-    for fs in feature_steps.values():
-      selected_features += fs
+    fn = scenario.cost_names
+    cost_rows = select_rows(scenario.feature_costs, instances)
+    costs = get_cost_matrix(cost_rows, fn)
+    with numpy.errstate(invalid = 'ignore'):
+      expensive = (costs > feat_timeout).any(axis = 0)
+    for i in numpy.flatnonzero(expensive):
+      if fn[i] in feature_steps.keys():
+        del feature_steps[fn[i]]
   
-  reader = csv.reader(open(scenario + 'feature_values.arff'), delimiter = ',')
-  i = 0
   # fn[i] is now the name of the i-th feature.
-  fn = {}
-  for row in reader:
-    if row and '@ATTRIBUTE' in row[0].strip().upper()  \
-    and 'instance_id' not in row[0] and 'repetition' not in row[0]:
-      fn[i] = row[0].strip().split(' ')[1]
-      i += 1
-    elif row and row[0].strip().upper() == '@DATA':
-      # Iterates until preamble ends.
-      break
-  features = {}
+  fn = scenario.feature_names
+  rows = select_rows(scenario.feature_values, instances)
+  # Missing values (None) are converted to NaN.
+  values = numpy.array(
+    [row[2:] for row in rows], dtype = numpy.float64
+  ).reshape((len(rows), len(fn)))
+  assert not rows or len(fn) == num_features
+  # Computing min/max value for each feature.
   lims = {}
-  instances = set([])
-  for row in reader:
-    inst = row[0]
-    if inst not in instances:
-      instances.add(inst)
-    nan = float("nan")
-    feat_vector = []
-    for f in row[2:]:
-      if f == '?':
-        feat_vector.append(float("nan"))
-      else:
-        feat_vector.append(float(f))
-    if not lims:
-      for k in range(0, len(feat_vector)):
-        lims[k] = [float('+inf'), float('-inf')]
-    # Computing min/max value for each feature.
-    for k in range(0, len(feat_vector)):
-      if not isnan(feat_vector[k]):
-        if feat_vector[k] < lims[k][0]:
-          lims[k][0] = feat_vector[k]
-        if feat_vector[k] > lims[k][1]:
-          lims[k][1] = feat_vector[k]
-    features[inst] = feat_vector
-    assert len(feat_vector) == num_features
-  # Scaling features.
-  for (inst, feat_vector) in features.items():
-    if discard and not [s for s, it in kb[inst].items() if it['info'] == 'ok']:
-      # Instance not solvable by any solver.
-      continue
-    new_feat_vector = []
-    for k in range(0, len(feat_vector)):
-      # Constant or not numeric feature.
-      if lims[k][0] == lims[k][1] or isnan(feat_vector[k]):
-        new_val = feat_def
-      else:
-        min_val = lims[k][0]
-        max_val = lims[k][1]
-        # Scale feature value in [lb, ub].
-        x = (feat_vector[k] - min_val) / (max_val - min_val)
-        new_val = lb + (ub - lb) * x
-      assert lb <= new_val <= ub
-      new_feat_vector.append(new_val)
-    assert nan not in new_feat_vector
-    kb_row = [inst, new_feat_vector, kb[inst]]
-    writer.writerow(kb_row)
-
-  # Creating <KB>.lims
-  lim_file = kb_dir + kb_name + '.lims'
-  with open(lim_file, 'w') as outfile:
-    json.dump(lims, outfile)
-  outfile.close()
+  if rows:
+    min_vals, max_vals = get_bounds(values)
+    lims = get_lims(min_vals, max_vals)
+  # features[inst] is the row of the (last) feature vector of inst. The 
+  # instances of the knowledge base follow the iteration order of this dict,
+  # as in the previous versions (the order matters for ties between neighbours).
+  features = {}
+  for (i, row) in enumerate(rows):
+    features[row[0]] = i
+  feat_instances = features.keys()
+  feat_rows = numpy.array(features.values(), dtype = int)
+  run_rows = numpy.array(
+    [run_index.get(inst, num_runs) for inst in feat_instances], dtype = int
+  )
+  kb_instances = feat_instances
+  discarded = None
+  if discard:
+    # Discards the instances not solvable by any solver.
+    solvable = all_status[run_rows].any(axis = 1)
+    kb_instances = [feat_instances[i] for i in numpy.flatnonzero(solvable)]
+    discarded = [feat_instances[i] for i in numpy.flatnonzero(~solvable)]
+    feat_rows = feat_rows[solvable]
+    run_rows = run_rows[solvable]
+  raw_features = values[feat_rows]
+  runtimes = all_runtimes[run_rows]
+  status = all_status[run_rows]
+  raw_runtimes = all_raw_runtimes[run_rows]
+  # Feature costs of the (last) cost row of each instance, NaN if missing.
+  cost_names = []
+  kb_costs = numpy.zeros((len(kb_instances), 0))
+  if scenario.feature_costs is not None:
+    cost_names = scenario.cost_names
+    cost_index = dict((row[0], i) for (i, row) in enumerate(cost_rows))
+    nan_row = numpy.empty((1, len(cost_names))) + numpy.nan
+    all_costs = numpy.vstack([costs, nan_row])
+    kb_costs = all_costs[
+      [cost_index.get(inst, len(cost_rows)) for inst in kb_instances]
+    ]
+  # Scaling features in [lb, ub].
+  kb_features = raw_features
+  if lims:
+    kb_features = scale_features(
+      raw_features, min_vals, max_vals, lb, ub, feat_def
+    )
   
-  # Creating <KB>.args
+  # Information needed for updating the knowledge base (see update_kb).
+  training = {
+    'feat_timeout': feat_timeout,
+    'feature_costs': scenario.feature_costs is not None,
+    'feature_steps': feature_steps,
+    'discarded': discarded,
+    'solver_stats': dict(
+      (pfolio[j], [int(num_solved[j]), float(total_time[j])])
+      for j in range(0, len(pfolio))
+    ),
+  }
   args = {
     'lb': lb,
     'ub': ub,
@@ -281,21 +285,124 @@ def main(args):
     'backup': backup,
     'timeout': timeout,
     'portfolio': pfolio,
-    'neigh_size': int(round(sqrt(len(instances)))),
+    'neigh_size': int(round(sqrt(len(feat_instances)))),
     'static_schedule': [],
     # selected_features[F] is the index of feature F in the original feature 
     # space.
-    'selected_features': dict(
-      (fn[k], k)
-      for k, v in lims.items() 
-      if v[0] != v[1] and 
-      (not os.path.exists(cost_file) or fn[k] in selected_features)
-    ),
+    'selected_features': get_selected_features(fn, lims, training),
     # feature_steps[S] is the list of all the features belonging to step S.
     'feature_steps': feature_steps,
   }
-  args_file = kb_dir + kb_name + '.args'
-  with open(args_file, 'w') as outfile:
+  write_kb(
+    kb_dir, kb_name, kb_instances, fn, raw_features, kb_features, pfolio, 
+    runtimes, status, raw_runtimes, lims, args, training, kb_costs, cost_names
+  )
+
+def get_bounds(values):
+  '''
+  Returns the arrays of the min/max values of each feature (i.e., column) of the
+  matrix values, ignoring the missing values. The bounds of a feature with no 
+  values are +inf/-inf.
+  '''
+  missing = numpy.isnan(values)
+  min_vals = numpy.where(missing, float('+inf'), values).min(axis = 0)
+  max_vals = numpy.where(missing, float('-inf'), values).max(axis = 0)
+  return min_vals, max_vals
+
+def get_lims(min_vals, max_vals):
+  '''
+  Returns the dict of the lower/upper bounds of each feature (see <KB>.lims).
+  '''
+  lims = {}
+  for k in range(0, len(min_vals)):
+    lims[k] = [float(min_vals[k]), float(max_vals[k])]
+  return lims
+
+def get_selected_features(fn, lims, training):
+  '''
+  Returns the dict of the selected features (see <KB>.args), i.e., the non
+  constant features belonging to the feature steps of training (or all the non
+  constant features, if the scenario had no feature costs).
+  '''
+  step_features = set([])
+  for fs in training['feature_steps'].values():
+    step_features.update(fs)
+  return dict(
+    (fn[k], k)
+    for k, v in lims.items() 
+    if v[0] != v[1] and 
+    (not training['feature_costs'] or fn[k] in step_features)
+  )
+
+def scale_features(raw_features, min_vals, max_vals, lb, ub, feat_def):
+  '''
+  Returns the matrix raw_features with the features (i.e., the columns) scaled 
+  in [lb, ub] according to their min/max values. Missing values and constant 
+  features are set to feat_def.
+  '''
+  with numpy.errstate(divide = 'ignore', invalid = 'ignore'):
+    x = (raw_features - min_vals) / (max_vals - min_vals)
+    features = lb + (ub - lb) * x
+  features[get_defaults(raw_features, min_vals, max_vals)] = feat_def
+  assert ((lb <= features) & (features <= ub)).all()
+  return features
+
+def get_defaults(raw_features, min_vals, max_vals):
+  '''
+  Returns the boolean matrix of the values of raw_features that are set to the 
+  default value when scaled (see scale_features).
+  '''
+  return numpy.isnan(raw_features) | (min_vals == max_vals)
+
+def write_kb(
+  kb_dir, kb_name, instances, fn, raw_features, features, pfolio, runtimes, 
+  status, raw_runtimes, lims, args, training, costs, cost_names, first_row = 0
+):
+  '''
+  Writes the files of the knowledge base kb_dir/kb_name, where raw_runtimes is
+  the matrix of the runtimes where the failed runs are not replaced by the 
+  timeout and costs is the matrix (instances x cost_names) of the feature costs. If first_row is greater
+  than 0, the first first_row rows of <KB>.info are assumed to be unchanged and
+  only the following ones are appended.
+  '''
+  kb = kb_dir + kb_name
+
+  # Creating <KB>.info
+  info_features = features[first_row:].tolist()
+  if lims:
+    # Default values are written as given (e.g., -1 instead of -1.0).
+    bounds = numpy.array([lims[k] for k in range(0, len(lims))])
+    default = get_defaults(raw_features[first_row:], bounds[:, 0], bounds[:, 1])
+    for (i, k) in numpy.argwhere(default):
+      info_features[i][k] = args['feat_def']
+  mode = 'a' if first_row > 0 else 'w'
+  with open(kb + '.info', mode) as outfile:
+    writer = csv.writer(outfile, delimiter = '|')
+    for i in range(first_row, len(instances)):
+      writer.writerow([instances[i], info_features[i - first_row]])
+
+  # Creating <KB>.runs
+  with open(kb + '.runs', 'wb') as outfile:
+    numpy.savez(
+      outfile, solvers = numpy.array(pfolio, dtype = str), runtimes = runtimes,
+      status = numpy.packbits(status, axis = 1), raw_runtimes = raw_runtimes
+    )
+  
+  # Creating <KB>.bin
+  write_binary_kb(
+    kb + '.bin', instances, fn, features, pfolio, runtimes, status, 
+    raw_runtimes, lims, raw_features, training, costs, cost_names
+  )
+
+  # Creating <KB>.tree (if worth it)
+  write_tree(kb + '.tree', features, args['selected_features'].values())
+
+  # Creating <KB>.lims
+  with open(kb + '.lims', 'w') as outfile:
+    json.dump(lims, outfile)
+  
+  # Creating <KB>.args
+  with open(kb + '.args', 'w') as outfile:
     json.dump(args, outfile)
 
 if __name__ == '__main__':
@@ -0,0 +1,282 @@
+#! /usr/bin/env python
+
+'''
+tune_kb [OPTIONS] <KB_DIR>
+
+Tunes the neighbourhood size k and the maximum sub-portfolio size of SUNNY on
+the knowledge base <KB_DIR> (created by train_scenario and possibly
+pre-processed), by leave-one-out: each instance of the knowledge base is
+scheduled by SUNNY using the other instances as neighbours. For each pair
+(k, max size) of the grid, the rows
+
+  k,maxSize,par10,fsi
+
+are printed on standard output, where par10 is the average PAR10 score and fsi
+the fraction of solved instances of the knowledge base (computed as
+evaluate_scenarios does, including the static schedule and the feature costs
+stored in the knowledge base, and charging the unsuccessful runs the time they
+have actually taken). The best pair (i.e., the one with the minimum PAR10, and 
+the smallest k and max size in case of ties) is printed on standard error.
+
+Note that the backup solver, the static schedule and the feature bounds used 
+for scaling are computed on the whole knowledge base, including the instance 
+left out: the leave-one-out estimate is therefore slightly optimistic.
+
+The neighbours of each instance, sorted by increasing distance, are computed
+only once and stored in the NumPy (npz) file <KB>.loo, so that the
+neighbourhoods of any k are obtained by slicing them. The file is computed
+again only if the selected features or the feature vectors of the knowledge
+base have changed, or if it has less neighbours than the biggest k.
+
+Options
+=======
+  -k <VALUES>
+   Neighbourhood sizes of the grid, given as a comma separated list of values
+   or ranges, e.g., "1-10,15,20". By default, it is set to 1-100.
+  -m <VALUES>
+   Maximum sub-portfolio sizes of the grid, in the same format of -k. By
+   default, all the sizes from 1 to the portfolio size are tried.
+  --search <METHOD>
+   Method used for selecting the best sub-portfolio (see test_scenario). By
+   default, it is set to brute-force.
+  -o <FILE>
+   Prints the rows of the grid to <FILE> instead of std output.
+  --update
+   Sets the best k and max size as the neighbourhood size and the maximum
+   sub-portfolio size of the knowledge base, which are used by test_scenario
+   by default. Unset by default.
+  --help
+   Prints this message.
+'''
+
+import os
+import csv
+import sys
+import json
+import numpy
+import getopt
+import hashlib
+from sunny import get_schedule, ScheduleCache
+from search import SEARCH_METHODS
+from neighbours import BLOCK_SIZE, euclidean_distances
+from knowledge_base import KnowledgeBase
+from wrapper_selection import get_par10
+
+# Default neighbourhood sizes of the grid.
+DEFAULT_K = '1-100'
+
+def parse_arguments(args):
+  '''
+  Parse the options specified by the user and returns the corresponding
+  arguments properly set.
+  '''
+  try:
+    opts, args = getopt.getopt(args, 'k:m:o:', ['help', 'search=', 'update'])
+  except getopt.GetoptError as msg:
+    print >> sys.stderr, msg
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  for o, a in opts:
+    if o == '--help':
+      print __doc__
+      sys.exit(0)
+
+  if len(args) != 1:
+    print >> sys.stderr, 'Error! Wrong number of arguments.'
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  kb_dir = args[0]
+  if kb_dir[-1] != '/':
+    kb_dir += '/'
+  kb_name = kb_dir.split('/')[-2]
+  if not os.path.exists(kb_dir):
+    print >> sys.stderr, 'Error! Directory ' + kb_dir + ' not exists.'
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+  kb = KnowledgeBase(kb_dir, kb_name)
+
+  # Initialize variables with default values.
+  neigh_sizes = parse_values(DEFAULT_K)
+  max_sizes = range(1, len(kb.args['portfolio']) + 1)
+  search = 'brute-force'
+  out_file = None
+  update = False
+
+  # Options parsing.
+  for o, a in opts:
+    if o in ['-k', '-m']:
+      try:
+        values = parse_values(a)
+      except ValueError:
+        print >> sys.stderr, 'Error! Not acceptable values ' + a
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      if o == '-k':
+        neigh_sizes = values
+      elif max(values) > len(kb.args['portfolio']):
+        print >> sys.stderr, 'Error! Not acceptable size'
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      else:
+        max_sizes = values
+    elif o == '--search':
+      if a not in SEARCH_METHODS.keys():
+        print >> sys.stderr, 'Error! Unknown search method ' + a
+        print >> sys.stderr, 'For help use --help'
+        sys.exit(2)
+      search = a
+    elif o == '-o':
+      out_file = a
+    elif o == '--update':
+      update = True
+
+  # A neighbourhood cannot contain all the instances.
+  neigh_sizes = [k for k in neigh_sizes if k < len(kb.instances)]
+  if not neigh_sizes:
+    print >> sys.stderr, 'Error! The knowledge base is too small'
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+  return kb_dir, kb_name, kb, neigh_sizes, max_sizes, search, out_file, update
+
+def parse_values(values):
+  '''
+  Returns the sorted list of the positive integers of values, a comma separated
+  list of values or ranges, raising ValueError if values is not valid.
+  '''
+  result = set([])
+  for value in values.split(','):
+    if '-' in value:
+      first, last = value.split('-')
+      result.update(range(int(first), int(last) + 1))
+    else:
+      result.add(int(value))
+  if not result or min(result) < 1:
+    raise ValueError(values)
+  return sorted(result)
+
+def main(args):
+  kb_dir, kb_name, kb, neigh_sizes, max_sizes, search, out_file, update = \
+    parse_arguments(args)
+  selected_features = sorted(kb.args['selected_features'].values())
+  table = get_loo_table(
+    kb_dir + kb_name + '.loo', kb, selected_features, max(neigh_sizes)
+  )
+  results = evaluate_grid(kb, table, neigh_sizes, max_sizes, search)
+
+  header = ['k', 'maxSize', 'par10', 'fsi']
+  rows = [[k, m, par10, fsi] for ((k, m), (par10, fsi)) in results]
+  if out_file:
+    writer = csv.writer(open(out_file, 'w'), delimiter = ',')
+    writer.writerow(header)
+    writer.writerows(rows)
+  else:
+    print ','.join(header)
+    for row in rows:
+      print ','.join(str(x) for x in row)
+  par10, fsi, k, m = min(
+    (par10, -fsi, k, m) for ((k, m), (par10, fsi)) in results
+  )
+  print >> sys.stderr, 'Best k:', k, 'max size:', m, 'PAR10:', par10, \
+    'FSI:', -fsi
+  if update:
+    kb.args['neigh_size'] = k
+    kb.args['max_size'] = m
+    with open(kb_dir + kb_name + '.args', 'w') as outfile:
+      json.dump(kb.args, outfile)
+
+def get_loo_table(path, kb, selected_features, size):
+  '''
+  Returns the leave-one-out table of the knowledge base kb, i.e., the matrix
+  (instances x size) whose i-th row contains the indexes of the size instances
+  closer to the i-th one (the i-th one excluded) on the selected_features,
+  sorted by increasing distance. The table is read from the file path if valid,
+  otherwise it is computed and written to path.
+  '''
+  digest = hashlib.sha1(
+    numpy.ascontiguousarray(kb.features[:, selected_features]).tobytes()
+  ).hexdigest()
+  if os.path.exists(path):
+    with open(path, 'rb') as infile:
+      loo = numpy.load(infile)
+      if loo['selected_features'].tolist() == selected_features and \
+      str(loo['digest']) == digest and loo['table'].shape[1] >= size:
+        return loo['table'][:, 0 : size]
+  table = build_loo_table(kb.features, selected_features, size)
+  with open(path, 'wb') as outfile:
+    numpy.savez(
+      outfile, selected_features = numpy.array(selected_features, dtype = int),
+      digest = digest, table = table
+    )
+  return table
+
+def build_loo_table(features, selected_features, size):
+  '''
+  Computes the leave-one-out table of the matrix features (see get_loo_table).
+  The distances and the ties are computed as in the neighbours module, so the
+  first k neighbours of an instance are the ones SUNNY would find for it in the
+  knowledge base without the instance.
+  '''
+  n = len(features)
+  table = numpy.zeros((n, size), dtype = int)
+  queries = numpy.array(features[:, selected_features], dtype = numpy.float64)
+  # Instances are processed in blocks, to bound the size of the distance matrix.
+  for i in range(0, n, BLOCK_SIZE):
+    block = queries[i : i + BLOCK_SIZE]
+    distances = euclidean_distances(block, features, selected_features)
+    rows = numpy.arange(len(block))
+    distances[rows, i + rows] = float('+inf')
+    # Stable sort, so that ties are broken in favour of the smallest index.
+    order = numpy.argsort(distances, axis = 1, kind = 'mergesort')
+    table[i : i + BLOCK_SIZE] = order[:, 0 : size]
+  return table
+
+def evaluate_grid(kb, table, neigh_sizes, max_sizes, search = 'brute-force'):
+  '''
+  Returns the list of the pairs ((k, max_size), (par10, fsi)) for each k in
+  neigh_sizes and max_size in max_sizes, where par10 and fsi are the average
+  PAR10 and the fraction of solved instances of the knowledge base kb when each
+  instance is scheduled with its first k neighbours of table.
+  '''
+  args = kb.args
+  portfolio = args['portfolio']
+  timeout = args['timeout']
+  static_schedule = [(s, t) for (s, t) in args['static_schedule']]
+  static_time = sum(t for (s, t) in static_schedule)
+  feat_costs = kb.get_feature_costs(args['feature_steps']).tolist()
+  n = len(kb.instances)
+  results = []
+  for k in neigh_sizes:
+    # The neighbourhoods of k do not depend on max_size.
+    neighbourhoods = [sorted(row) for row in table[:, 0 : k].tolist()]
+    for m in max_sizes:
+      # Instances having the same neighbourhood (and feature cost) have the 
+      # same schedule.
+      cache = ScheduleCache(n)
+      par10 = 0.0
+      fsi = 0
+      for i in range(0, n):
+        neighbours = neighbourhoods[i]
+        time_left = timeout - (feat_costs[i] + static_time)
+        schedule = []
+        if time_left > 0:
+          key = (tuple(neighbours), time_left)
+          schedule = cache.get(key)
+          if schedule is None:
+            schedule = get_schedule(
+              kb.get_runtimes(neighbours, portfolio), time_left, portfolio, k,
+              args['backup'], m, search
+            )
+            cache.put(key, schedule)
+        score = get_par10(
+          static_schedule + schedule, kb, i, timeout, feat_costs[i]
+        )
+        par10 += score
+        if score < 10 * timeout:
+          fsi += 1
+      results.append(((k, m), (par10 / n, fsi / float(n))))
+  return results
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,261 @@
+#! /usr/bin/env python
+
+'''
+update_kb [OPTIONS] <KB_DIR> <DATA_PATH>
+
+Updates the SUNNY knowledge base <KB_DIR> (created by train_scenario) with the
+new instances contained in <DATA_PATH>, without training it again. <DATA_PATH>
+is a folder containing the files feature_values.arff, algorithm_runs.arff and
+(optionally) feature_costs.arff of the new instances, in the ASlib format. The
+features and the solvers must be the same of the knowledge base.
+
+The knowledge base is updated as train_scenario would do on all the instances:
+
+  - the new instances are appended to the knowledge base, while the features,
+    the feature costs and the runs of the instances already in the knowledge
+    base are replaced;
+  - the feature bounds are extended, and the features are scaled again only if
+    their bounds are changed;
+  - the feature steps exceeding the feature timeout are removed;
+  - the backup solver, the neighbourhood size and the selected features are
+    updated.
+
+The other arguments are reset as after the training, so pre_process has to be
+run again if needed. Note that the bounds are never narrowed, even if the
+replaced features were the only ones reaching them, and that the runs of the
+instances having no features (e.g., the ones discarded by --discard option) are
+ignored. The knowledge base must be created with the current version of
+train_scenario, since the features before scaling are needed.
+
+Options
+=======
+  --help
+   Prints this message.
+'''
+
+import os
+import sys
+import numpy
+import getopt
+from math import sqrt
+from scenario import Scenario
+from knowledge_base import KnowledgeBase
+from train_scenario import get_bounds, get_lims, get_selected_features, \
+  scale_features, write_kb
+
+def parse_arguments(args):
+  '''
+  Parse the options specified by the user and returns the corresponding
+  arguments properly set.
+  '''
+  try:
+    opts, args = getopt.getopt(args, None, ['help'])
+  except getopt.GetoptError as msg:
+    print >> sys.stderr, msg
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  for o, a in opts:
+    if o == '--help':
+      print __doc__
+      sys.exit(0)
+
+  if len(args) != 2:
+    print >> sys.stderr, 'Error! Wrong number of arguments.'
+    print >> sys.stderr, 'For help use --help'
+    sys.exit(2)
+
+  kb_dir = args[0]
+  if kb_dir[-1] != '/':
+    kb_dir += '/'
+  kb_name = kb_dir.split('/')[-2]
+  data_path = args[1]
+  for path in [kb_dir, data_path]:
+    if not os.path.exists(path):
+      print >> sys.stderr, 'Error! Directory ' + path + ' not exists.'
+      print >> sys.stderr, 'For help use --help'
+      sys.exit(2)
+  return kb_dir, kb_name, data_path
+
+def main(args):
+  kb_dir, kb_name, data_path = parse_arguments(args)
+  kb = KnowledgeBase(kb_dir, kb_name)
+  if kb.training is None:
+    print >> sys.stderr, 'Error! Knowledge base ' + kb_dir + ' cannot be ' \
+      'updated, train it again with train_scenario.'
+    sys.exit(2)
+  try:
+    update(kb, kb_dir, kb_name, Scenario(data_path, use_cache = False), None)
+  except ValueError as msg:
+    print >> sys.stderr, 'Error! ' + str(msg)
+    sys.exit(2)
+
+def update(kb, kb_dir, kb_name, scenario, instances):
+  '''
+  Updates the SUNNY knowledge base kb (a KnowledgeBase object) of the folder
+  kb_dir/kb_name with the instances of the scenario (a Scenario object) in
+  instances, or all the instances of the scenario if instances is None.
+  '''
+  args = kb.args
+  training = kb.training
+  pfolio = kb.solvers
+  fn = kb.feature_names
+  timeout = args['timeout']
+  if scenario.feature_names != fn:
+    raise ValueError('The features of the new instances do not match.')
+
+  # Processing runtimes. runs[inst][s] is the last run of solver s on inst.
+  solver_stats = training['solver_stats']
+  runs = {}
+  for row in select(scenario.algorithm_runs, instances):
+    inst   = row[0]
+    solver = row[2]
+    ok     = row[4] == 'ok'
+    if solver not in kb.solver_index.keys():
+      raise ValueError('Unknown solver ' + solver + '.')
+    time = row[3] if ok else timeout
+    if ok:
+      solver_stats[solver][0] += 1
+    solver_stats[solver][1] += time
+    if inst not in runs.keys():
+      runs[inst] = {}
+    runs[inst][solver] = (time, ok, row[3])
+
+  # Processing feature costs.
+  if training['feature_costs'] and scenario.feature_costs is not None:
+    if scenario.cost_names != kb.cost_names:
+      raise ValueError('The feature steps of the new instances do not match.')
+    feature_steps = training['feature_steps']
+    for row in select(scenario.feature_costs, instances):
+      for (step, cost) in zip(scenario.cost_names, row[2:]):
+        if cost is not None and cost > training['feat_timeout'] and \
+        step in feature_steps.keys():
+          del feature_steps[step]
+
+  # Processing features. The new instances are appended in the order of their
+  # first feature vector.
+  kb_instances = list(kb.instances)
+  index = dict((inst, i) for (i, inst) in enumerate(kb_instances))
+  raw_features = [numpy.array(kb.raw_features)]
+  features = [numpy.array(kb.features)]
+  runtimes = [numpy.array(kb.runtimes)]
+  status = [numpy.array(kb.status)]
+  raw_runtimes = [numpy.array(kb.raw_runtimes)]
+  new_rows = []
+  for row in select(scenario.feature_values, instances):
+    inst = row[0]
+    vector = numpy.array(row[2:], dtype = numpy.float64)
+    if inst not in index.keys():
+      index[inst] = len(kb_instances)
+      kb_instances.append(inst)
+      raw_features.append(vector.reshape((1, len(fn))))
+      features.append(numpy.zeros((1, len(fn))))
+      runtimes.append(numpy.empty((1, len(pfolio))) + numpy.nan)
+      status.append(numpy.zeros((1, len(pfolio)), dtype = bool))
+      raw_runtimes.append(numpy.empty((1, len(pfolio))) + numpy.nan)
+    elif index[inst] < len(kb.instances):
+      raw_features[0][index[inst]] = vector
+    else:
+      raw_features[index[inst] - len(kb.instances) + 1][0] = vector
+    new_rows.append(index[inst])
+  raw_features = numpy.vstack(raw_features)
+  features = numpy.vstack(features)
+  runtimes = numpy.vstack(runtimes)
+  status = numpy.vstack(status)
+  raw_runtimes = numpy.vstack(raw_runtimes)
+  new_rows = numpy.unique(numpy.array(new_rows, dtype = int))
+  for (inst, solver_runs) in runs.items():
+    if inst in index.keys():
+      for (solver, (time, ok, raw_time)) in solver_runs.items():
+        runtimes[index[inst], kb.solver_index[solver]] = time
+        status[index[inst], kb.solver_index[solver]] = ok
+        raw_runtimes[index[inst], kb.solver_index[solver]] = raw_time
+  # The costs of the new instances are NaN, unless given.
+  costs = numpy.empty((len(kb_instances), len(kb.cost_names))) + numpy.nan
+  costs[0 : len(kb.instances)] = kb.costs
+  if training['feature_costs'] and scenario.feature_costs is not None:
+    for row in select(scenario.feature_costs, instances):
+      if row[0] in index.keys():
+        costs[index[row[0]]] = numpy.array(row[2:], dtype = numpy.float64)
+
+  # Updating min/max values. The old bounds are kept unless extended.
+  num_old = len(kb.instances)
+  moved = []
+  min_vals = numpy.array([float('+inf')] * len(fn))
+  max_vals = numpy.array([float('-inf')] * len(fn))
+  if kb.lims:
+    min_vals = numpy.array([kb.lims[str(k)][0] for k in range(0, len(fn))])
+    max_vals = numpy.array([kb.lims[str(k)][1] for k in range(0, len(fn))])
+  if len(new_rows):
+    new_min, new_max = get_bounds(raw_features[new_rows])
+    moved = (new_min < min_vals) | (new_max > max_vals)
+    min_vals = numpy.minimum(min_vals, new_min)
+    max_vals = numpy.maximum(max_vals, new_max)
+    # Scaling the new features, and the old ones whose bounds are changed.
+    lb = args['lb']
+    ub = args['ub']
+    feat_def = args['feat_def']
+    features[new_rows] = scale_features(
+      raw_features[new_rows], min_vals, max_vals, lb, ub, feat_def
+    )
+    moved = numpy.flatnonzero(moved)
+    if len(moved):
+      features[:, moved] = scale_features(
+        raw_features[:, moved], min_vals[moved], max_vals[moved], lb, ub,
+        feat_def
+      )
+  lims = {}
+  if kb.lims or len(new_rows):
+    lims = get_lims(min_vals, max_vals)
+
+  # Discarding the instances not solvable by any solver.
+  discarded = training['discarded']
+  changed = len(new_rows) and (new_rows[0] < num_old or len(moved))
+  if discarded is not None:
+    discarded = set(discarded) - set(kb_instances)
+    solvable = status.any(axis = 1)
+    discarded.update(kb_instances[i] for i in numpy.flatnonzero(~solvable))
+    if not solvable.all():
+      changed = changed or not solvable[0 : num_old].all()
+      keep = numpy.flatnonzero(solvable)
+      kb_instances = [kb_instances[i] for i in keep]
+      raw_features = raw_features[keep]
+      features = features[keep]
+      runtimes = runtimes[keep]
+      status = status[keep]
+      raw_runtimes = raw_runtimes[keep]
+      costs = costs[keep]
+    training['discarded'] = sorted(discarded)
+    num_instances = len(kb_instances) + len(discarded)
+  else:
+    num_instances = len(kb_instances)
+
+  # Updating the arguments as train_scenario does.
+  args['backup'] = min(
+    (-solver_stats[s][0], solver_stats[s][1], s) for s in pfolio
+  )[2]
+  args['portfolio'] = pfolio
+  args['neigh_size'] = int(round(sqrt(num_instances)))
+  args['static_schedule'] = []
+  args.pop('max_size', None)
+  args['selected_features'] = get_selected_features(fn, lims, training)
+  args['feature_steps'] = training['feature_steps']
+  write_kb(
+    kb_dir, kb_name, kb_instances, fn, raw_features, features, pfolio, 
+    runtimes, status, raw_runtimes, lims, args, training, costs, kb.cost_names, 
+    0 if changed else num_old
+  )
+
+def select(rows, instances):
+  '''
+  Returns the rows whose first column (i.e., the instance) belongs to instances,
+  or all the rows if instances is None (no rows if rows is None).
+  '''
+  if rows is None:
+    return []
+  if instances is None:
+    return rows
+  return [row for row in rows if row[0] in instances]
+
+if __name__ == '__main__':
+  main(sys.argv[1:])
@@ -0,0 +1,240 @@
+'''
+Module for selecting the features of a knowledge base with a wrapper method,
+i.e., by evaluating each candidate subset of features with SUNNY itself.
+
+The instances of the knowledge base are split into folds (the i-th instance
+belongs to the fold i % folds) and each instance is scheduled by SUNNY by only
+using as neighbours the instances of the other folds, as in a cross-validation.
+The score of a subset of features is the total PAR10 of these schedules, which
+is computed on the runtimes of the knowledge base as tune_kb does: each schedule
+follows the static schedule of the knowledge base and the computation of the 
+features, whose cost is the one of the feature steps needed by the subset.
+
+The units of the search are either the features or the feature steps. The
+forward search starts from no unit and the backward search from all the units,
+and at each iteration the unit whose addition (or removal) gives the best score
+is added (or removed), until no unit improves the score. Ties are broken in
+favour of the first unit in alphabetical order.
+
+Since the units are evaluated many times, the evaluation of a candidate is kept
+fast as follows:
+
+  - the squared distances between the instances are computed once per
+    iteration, and the ones of a candidate are obtained by adding (or
+    subtracting) the squared distances of its unit only, i.e., in O(n^2) time
+    per feature of the unit (n is the number of instances);
+  - the schedules are cached by neighbourhood (and time left after the 
+    features and the static schedule), since different candidates mostly give
+    the same neighbourhoods;
+  - the candidates of an iteration are evaluated in parallel by worker
+    processes, each one keeping its own distances and cache.
+'''
+
+import numpy
+import multiprocessing
+from sunny import get_schedule, ScheduleCache
+from neighbours import nearest
+
+# Maximum number of schedules cached by each process.
+CACHE_SIZE = 100000
+
+# Arguments of the search inherited by the forked worker processes, and the
+# state (units, squared distances and cache) of the worker process.
+worker_args = None
+worker_state = None
+
+def get_units(selected_features, feature_steps, steps = False):
+  '''
+  Returns the dict mapping each unit of the search to the sorted list of the
+  indexes of its features, where selected_features and feature_steps are the
+  ones of the knowledge base arguments. If steps is True the units are the
+  feature steps (restricted to the selected features), otherwise the features.
+  '''
+  if not steps:
+    return dict(
+      (feature, [index]) for (feature, index) in selected_features.items()
+    )
+  units = {}
+  for (step, features) in feature_steps.items():
+    indexes = sorted(
+      selected_features[f] for f in features if f in selected_features
+    )
+    if indexes:
+      units[step] = indexes
+  return units
+
+def select_units(
+  kb, args, units, direction = 'forward', folds = 5, jobs = 1,
+  search = 'brute-force'
+):
+  '''
+  Returns the pair (selected, score) where selected is the sorted list of the
+  units (see get_units) selected by the search in the given direction (forward
+  or backward) and score is their total PAR10 on the knowledge base kb, with
+  the SUNNY arguments args. The candidates are evaluated by jobs processes.
+  '''
+  global worker_args, worker_state
+  names = sorted(units.keys())
+  n = len(kb.instances)
+  fold = numpy.arange(n) % folds
+  # The neighbours are always searched in the other folds.
+  k = min(args['neigh_size'], n - numpy.bincount(fold).max())
+  step_features = dict(
+    (step, set(
+      args['selected_features'][f] for f in features 
+      if f in args['selected_features']
+    ))
+    for (step, features) in args['feature_steps'].items()
+  )
+  # The feature steps needed by each unit.
+  unit_steps = [
+    set(s for (s, f) in step_features.items() if f.intersection(units[u]))
+    for u in names
+  ]
+  static_schedule = [(s, t) for (s, t) in args['static_schedule']]
+  worker_args = (
+    kb, [units[u] for u in names], unit_steps, fold[:, numpy.newaxis] == fold,
+    k, args['portfolio'], args['timeout'], args['backup'], 
+    args.get('max_size', len(args['portfolio'])), search, static_schedule
+  )
+  worker_state = None
+  if direction == 'forward':
+    current = set([])
+    best = float('+inf')
+  else:
+    current = set(range(0, len(names)))
+    best = evaluate_candidate((tuple(sorted(current)), None))
+  # The pool is created after the first evaluation, so that the workers share
+  # its state.
+  pool = None
+  if jobs > 1:
+    pool = multiprocessing.Pool(jobs)
+  try:
+    while True:
+      if direction == 'forward':
+        candidates = [u for u in range(0, len(names)) if u not in current]
+      elif len(current) > 1:
+        candidates = sorted(current)
+      else:
+        candidates = []
+      if not candidates:
+        break
+      tasks = [(tuple(sorted(current)), u) for u in candidates]
+      if pool is not None:
+        scores = pool.map(evaluate_candidate, tasks, 1)
+      else:
+        scores = map(evaluate_candidate, tasks)
+      score, u = min(zip(scores, candidates))
+      if score >= best:
+        break
+      best = score
+      current.symmetric_difference_update([u])
+  finally:
+    if pool is not None:
+      pool.close()
+      pool.join()
+    worker_args = None
+    worker_state = None
+  return [names[u] for u in sorted(current)], best
+
+def evaluate_candidate(task):
+  '''
+  Returns the score of the candidate task = (base, unit), i.e., of the units in
+  base plus the unit (minus the unit, if it belongs to base). If unit is None,
+  the score of base is returned.
+  '''
+  global worker_state
+  kb, columns, unit_steps, same_fold, k, portfolio, timeout, backup, max_size, \
+    search, static_schedule = worker_args
+  base, unit = task
+  if worker_state is None or worker_state['units'] != base:
+    # The distances of base are computed from scratch, so that they do not
+    # depend on the candidates previously evaluated by this process.
+    if worker_state is None:
+      cache = ScheduleCache(CACHE_SIZE)
+    else:
+      cache = worker_state['cache']
+    squares = numpy.zeros((len(kb.instances), len(kb.instances)))
+    for u in base:
+      add_squares(squares, kb.features, columns[u])
+    worker_state = {'units': base, 'squares': squares, 'cache': cache}
+  squares = worker_state['squares']
+  if unit is not None:
+    squares = squares.copy()
+    add_squares(squares, kb.features, columns[unit], -1 if unit in base else 1)
+  distances = numpy.sqrt(numpy.maximum(squares, 0))
+  distances[same_fold] = float('+inf')
+  neighbourhoods = get_neighbourhoods(distances, k)
+  candidate = set(base).symmetric_difference([] if unit is None else [unit])
+  feat_costs = kb.get_feature_costs(
+    set(s for u in candidate for s in unit_steps[u])
+  ).tolist()
+  static_time = sum(t for (s, t) in static_schedule)
+  cache = worker_state['cache']
+  score = 0.0
+  for i in range(0, len(neighbourhoods)):
+    neighbours = neighbourhoods[i]
+    time_left = timeout - (feat_costs[i] + static_time)
+    schedule = []
+    if time_left > 0:
+      key = (tuple(neighbours), time_left)
+      schedule = cache.get(key)
+      if schedule is None:
+        schedule = get_schedule(
+          kb.get_runtimes(neighbours, portfolio), time_left, portfolio, k, 
+          backup, max_size, search
+        )
+        cache.put(key, schedule)
+    score += get_par10(
+      static_schedule + schedule, kb, i, timeout, feat_costs[i]
+    )
+  return score
+
+def get_neighbourhoods(distances, k):
+  '''
+  Returns, for each row of distances, the sorted list of the indexes of its k
+  smallest distances, breaking ties by index as neighbours.nearest does. Since
+  a SUNNY schedule does not depend on the order of the neighbours, they are
+  not sorted by distance.
+  '''
+  rows = numpy.arange(len(distances))
+  nearest_k = numpy.argpartition(distances, k - 1, axis = 1)[:, 0 : k]
+  kth = distances[rows[:, numpy.newaxis], nearest_k].max(axis = 1)
+  # The partition is arbitrary only if other distances are equal to the k-th.
+  ties = (distances <= kth[:, numpy.newaxis]).sum(axis = 1) > k
+  neighbourhoods = numpy.sort(nearest_k, axis = 1).tolist()
+  for i in numpy.flatnonzero(ties):
+    neighbourhoods[i] = sorted(nearest(distances[i], k))
+  return neighbourhoods
+
+def add_squares(squares, features, columns, sign = 1):
+  '''
+  Adds (or subtracts, if sign is -1) to the matrix squares the squared
+  distances between the instances restricted to the given columns of features.
+  '''
+  for j in columns:
+    d = features[:, j] - features[:, j, numpy.newaxis]
+    if sign > 0:
+      squares += d * d
+    else:
+      squares -= d * d
+
+def get_par10(schedule, kb, i, timeout, start = 0.0):
+  '''
+  Returns the PAR10 score of the schedule on the i-th instance of the knowledge
+  base kb, as evaluate_scenarios computes it, when the schedule starts at time
+  start (e.g., after computing the features). As in evaluate_scenarios, an 
+  unsuccessful run is charged the time it has actually taken (not the timeout).
+  '''
+  time = start
+  for (solver, solver_time) in schedule:
+    j = kb.solver_index[solver]
+    runtime = kb.raw_runtimes[i, j]
+    if kb.status[i, j] and runtime <= solver_time:
+      if time + runtime >= timeout:
+        return 10 * timeout
+      return time + runtime
+    time += min(solver_time, runtime)
+    if time >= timeout:
+      return 10 * timeout
+  return 10 * timeout